@@ -0,0 +1,112 @@
+import os, threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+from .config import ARCHIVE_DIR
+
+# one little-endian fixed-width file per column; ts is written last so a torn append never counts
+COLUMNS = (("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("vol", "<f8"), ("ts", "<i8"))
+DTYPES = dict(COLUMNS)
+ITEMSIZE = 8
+
+_locks: Dict[Path, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+class CandleArchive:
+    """Append-only columnar candle store for one (symbol, tf).
+
+    Reads copy the requested rows out (np.fromfile at an offset); no mapping outlives a call, so the files
+    can always be rewritten. A write that lands before the last bar rewrites the tail into new files that
+    are swapped in with os.replace, never truncated under a reader.
+    """
+
+    def __init__(self, symbol: str, tf: str, root: Path = ARCHIVE_DIR):
+        self.symbol = symbol; self.tf = tf
+        self.path = Path(root) / symbol / tf
+        self._lock = _lock_for(self.path)  # orders readers and writers of this series in-process
+
+    def _file(self, col: str) -> Path:
+        return self.path / f"{col}.bin"
+
+    def __len__(self) -> int:
+        sizes = [self._file(c).stat().st_size // ITEMSIZE if self._file(c).exists() else 0 for c, _ in COLUMNS]
+        return min(sizes)
+
+    def _col(self, col: str, lo: int, hi: int) -> np.ndarray:
+        if hi <= lo: return np.empty(0, dtype=DTYPES[col])
+        return np.fromfile(self._file(col), dtype=DTYPES[col], count=hi - lo, offset=lo * ITEMSIZE)
+
+    def _search(self, n: int, ts: int) -> int:
+        """Index of the first bar at or after ts, through a mapping that is released before returning."""
+        m = np.memmap(self._file("ts"), dtype="<i8", mode="r", shape=(n,))
+        try: return int(np.searchsorted(m, ts, side="left"))
+        finally: del m
+
+    def ts(self) -> np.ndarray:
+        with self._lock:
+            return self._col("ts", 0, len(self))
+
+    def first_ts(self) -> Optional[int]:
+        with self._lock:
+            return int(self._col("ts", 0, 1)[0]) if len(self) else None
+
+    def last_ts(self) -> Optional[int]:
+        with self._lock:
+            n = len(self)
+            return int(self._col("ts", n - 1, n)[0]) if n else None
+
+    def read(self, since_ts: Optional[int] = None, last_n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        with self._lock:
+            n = len(self)
+            if not n:
+                return {c: np.empty(0, dtype=d) for c, d in COLUMNS}
+            lo = self._search(n, since_ts) if since_ts is not None else 0
+            if last_n: lo = max(lo, n - int(last_n))
+            return {c: self._col(c, lo, n) for c, _ in COLUMNS}
+
+    def write(self, cols: Dict[str, np.ndarray], replace: bool = False) -> int:
+        """Merge bars in. Pure appends hit the file ends; older bars rewrite the tail from the first touched ts.
+
+        Existing bars win on duplicate ts (INSERT OR IGNORE semantics) unless ``replace`` is set.
+        """
+        new = {c: np.asarray(cols[c], dtype=d) for c, d in COLUMNS}
+        if not len(new["ts"]): return 0
+        order = np.argsort(new["ts"], kind="mergesort")
+        new = {c: a[order] for c, a in new.items()}
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            n = len(self)
+            last = int(self._col("ts", n - 1, n)[0]) if n else None
+            if last is None or new["ts"][0] > last:
+                keep = np.r_[True, new["ts"][1:] != new["ts"][:-1]]
+                return self._append({c: a[keep] for c, a in new.items()}, n)
+
+            pos = self._search(n, int(new["ts"][0]))
+            old = {c: self._col(c, pos, n) for c, _ in COLUMNS}
+            first, second = (new, old) if replace else (old, new)
+            merged = {c: np.concatenate([first[c], second[c]]) for c, _ in COLUMNS}
+            _, idx = np.unique(merged["ts"], return_index=True)  # first occurrence wins, result sorted by ts
+            merged = {c: a[idx] for c, a in merged.items()}
+            self._rewrite(merged, pos)
+            return len(merged["ts"]) - len(old["ts"])
+
+    def _rewrite(self, cols: Dict[str, np.ndarray], pos: int):
+        """Columns = first ``pos`` rows + cols, each built in a temp file and swapped in (ts last, so a reader
+        between swaps sees at most the old row count)."""
+        for c, d in COLUMNS:
+            tmp = self._file(c).with_suffix(".tmp")
+            with open(self._file(c), "rb") as src, open(tmp, "wb") as dst:
+                dst.write(src.read(pos * ITEMSIZE))
+                cols[c].astype(d, copy=False).tofile(dst)
+            os.replace(tmp, self._file(c))
+
+    def _append(self, cols: Dict[str, np.ndarray], n: int) -> int:
+        for c, d in COLUMNS:
+            with open(self._file(c), "ab") as f:
+                if f.tell() > n * ITEMSIZE: f.truncate(n * ITEMSIZE)  # drop a torn tail from an interrupted append
+                cols[c].astype(d, copy=False).tofile(f)
+        return len(cols["ts"])
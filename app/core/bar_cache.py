@@ -0,0 +1,130 @@
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+
+COLS = ("ts", "open", "high", "low", "close", "vol")
+OHLCV = COLS[1:]
+
+class BarRing:
+    """The newest ``capacity`` bars of one series in preallocated arrays; appends are O(k), never a shift."""
+
+    def __init__(self, capacity: int):
+        self.cap = capacity
+        self.ts = np.empty(capacity, dtype=np.int64)
+        self.px = np.empty((len(OHLCV), capacity), dtype=np.float64)
+        self.head = 0; self.size = 0
+        self.complete = False  # holds the whole history, so short tails are still exact
+
+    @property
+    def nbytes(self) -> int: return self.ts.nbytes + self.px.nbytes
+
+    def last_ts(self) -> Optional[int]:
+        return int(self.ts[(self.head + self.size - 1) % self.cap]) if self.size else None
+
+    def _take(self, arr: np.ndarray, lo: int, n: int) -> np.ndarray:
+        start = (self.head + lo) % self.cap; end = start + n
+        if end <= self.cap: return arr[..., start:end].copy()
+        return np.concatenate([arr[..., start:], arr[..., :end - self.cap]], axis=-1)
+
+    def tail(self, n: int) -> Dict[str, np.ndarray]:
+        n = min(n, self.size); lo = self.size - n
+        px = self._take(self.px, lo, n)
+        out = {"ts": self._take(self.ts, lo, n)}
+        out.update({c: px[i] for i, c in enumerate(OHLCV)})
+        return out
+
+    def extend(self, ts: np.ndarray, px: np.ndarray):
+        """Append ascending bars newer than last_ts; the oldest fall off once full."""
+        k = len(ts)
+        if k >= self.cap:
+            self.ts[:] = ts[-self.cap:]; self.px[:] = px[:, -self.cap:]
+            self.head = 0; self.size = self.cap; return
+        start = (self.head + self.size) % self.cap
+        first = min(k, self.cap - start)
+        self.ts[start:start + first] = ts[:first]; self.px[:, start:start + first] = px[:, :first]
+        self.ts[:k - first] = ts[first:]; self.px[:, :k - first] = px[:, first:]
+        over = max(0, self.size + k - self.cap)
+        self.size = min(self.cap, self.size + k); self.head = (self.head + over) % self.cap
+
+    def merge(self, cols: Dict[str, np.ndarray], replace: bool = False) -> bool:
+        """Apply written bars with the archive's rules (existing bars win unless ``replace``).
+        Returns False when a bar lands inside the window at a ts the ring lacks; the ring must then be dropped."""
+        ts = np.asarray(cols["ts"], dtype=np.int64)
+        if not len(ts): return True
+        order = np.argsort(ts, kind="stable"); ts = ts[order]
+        px = np.vstack([np.asarray(cols[c], dtype=np.float64)[order] for c in OHLCV])
+        last = self.last_ts()
+        new = ts > last if last is not None else np.ones(len(ts), dtype=bool)
+        if not new.all():
+            have = self.tail(self.size)["ts"]
+            old_ts = ts[~new]
+            pos = np.searchsorted(have, old_ts)
+            found = (pos < len(have)) & (have[np.minimum(pos, len(have) - 1)] == old_ts)
+            inside = self.complete or (len(have) and old_ts >= have[0])
+            if np.any(~found & inside): return False
+            if replace and found.any():
+                phys = (self.head + pos[found]) % self.cap
+                self.px[:, phys] = px[:, ~new][:, found]
+        if new.any():
+            ts_new, first = np.unique(ts[new], return_index=True)
+            self.extend(ts_new, px[:, new][:, first])
+        return True
+
+class BarCache:
+    """Process-wide (symbol, tf) -> BarRing, filled through ``loader`` on a miss and kept current by the
+    ingest path. Least recently read series are evicted past ``max_bytes``."""
+
+    def __init__(self, loader: Callable[..., Dict[str, np.ndarray]], capacity: int = 1024, max_bytes: int = 64 << 20):
+        self.loader = loader; self.capacity = capacity; self.max_bytes = max_bytes
+        self._rings: "OrderedDict[Tuple[str, str], BarRing]" = OrderedDict()
+        self._lock = threading.Lock(); self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "bypass": 0, "evictions": 0, "appends": 0, "dropped": 0}
+
+    @property
+    def nbytes(self) -> int: return sum(r.nbytes for r in self._rings.values())
+
+    def get(self, symbol: str, tf: str, n: int) -> Dict[str, np.ndarray]:
+        """Last n bars (ascending columns, fewer if the history is shorter)."""
+        key = (symbol, tf)
+        if n > self.capacity:
+            self.stats["bypass"] += 1
+            return self.loader(symbol, tf, last_n=n)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is not None and (ring.size >= n or ring.complete):
+                self._rings.move_to_end(key); self.stats["hits"] += 1
+                return ring.tail(n)
+            self.stats["misses"] += 1; writes = self._writes
+        cols = self.loader(symbol, tf, last_n=self.capacity)
+        ring = BarRing(self.capacity)
+        ring.extend(np.asarray(cols["ts"], dtype=np.int64), np.vstack([np.asarray(cols[c], dtype=np.float64) for c in OHLCV]))
+        ring.complete = ring.size < self.capacity
+        with self._lock:
+            if writes == self._writes:  # nothing was ingested while loading, so the ring is current
+                self._rings[key] = ring; self._rings.move_to_end(key); self._evict()
+        return ring.tail(n)
+
+    def append(self, symbol: str, tf: str, cols: Dict[str, np.ndarray], replace: bool = False):
+        """Called by the ingest path after writing bars; only series already cached are touched."""
+        with self._lock:
+            self._writes += 1
+            ring = self._rings.get((symbol, tf))
+            if ring is None: return
+            self.stats["appends"] += 1
+            if not ring.merge(cols, replace=replace):
+                del self._rings[(symbol, tf)]; self.stats["dropped"] += 1
+
+    def warm(self, symbols: Sequence[str], tfs: Sequence[str] = ("1m",)):
+        for sym in symbols:
+            for tf in tfs: self.get(sym, tf, 1)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            self._writes += 1
+            for key in [k for k in self._rings if symbol is None or k[0] == symbol]: del self._rings[key]
+
+    def _evict(self):
+        while len(self._rings) > 1 and self.nbytes > self.max_bytes:
+            self._rings.popitem(last=False); self.stats["evictions"] += 1
@@ -24,8 +24,11 @@ if yaml and cfg_path.exists():
     except Exception:
         CFG = {}
 
-DB_PATH = ROOT / "db" / "app.sqlite"
-LOG_PATH = ROOT / "logs" / "app.log"
+DB_PATH = Path(os.getenv("STOCKBOT_DB") or ROOT / "db" / "app.sqlite")
+LOG_PATH = Path(os.getenv("STOCKBOT_LOG") or ROOT / "logs" / "app.log")
+ARCHIVE_DIR = Path(os.getenv("STOCKBOT_ARCHIVE") or DATA_DIR / "candles")
+JOURNAL_PATH = Path(os.getenv("STOCKBOT_JOURNAL") or DATA_DIR / "orders.jsonl")
+WF_CACHE_DIR = Path(os.getenv("STOCKBOT_WF_CACHE") or DATA_DIR / "walkforward")
 
 def get(key, default=None):
     return os.getenv(key) or CFG.get(key, default)
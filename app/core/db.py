@@ -3,6 +3,7 @@ from sqlalchemy import create_engine, Column, Integer, String, Float, BigInteger
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.types import DateTime
 from .config import DB_PATH
+from contextlib import contextmanager
 from datetime import datetime
 
 engine = create_engine(
@@ -56,6 +57,22 @@ class Candle(Base):
     vol = Column(Float)
     __table_args__ = (UniqueConstraint('symbol','tf','ts', name='uq_candle'),)
 
+class CandleArchiveMeta(Base):
+    __tablename__ = "candle_archives"
+    symbol = Column(String, primary_key=True)
+    tf = Column(String, primary_key=True)
+    rows = Column(BigInteger, default=0)
+    first_ts = Column(BigInteger)
+    last_ts = Column(BigInteger)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class IngestWatermark(Base):
+    __tablename__ = "ingest_watermarks"
+    symbol = Column(String, primary_key=True)
+    tf = Column(String, primary_key=True)
+    last_ts = Column(BigInteger)  # newest bar ingested, advanced in the same transaction as the bars
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class InvestorFlow(Base):
     __tablename__ = "investor_flows"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -81,6 +98,12 @@ class RationaleWeight(Base):
     weight = Column(Float)
     __table_args__ = (UniqueConstraint('profile','item_id', name='uq_profile_item'),)
 
+class ConditionPreset(Base):
+    __tablename__ = "condition_presets"
+    name = Column(String, primary_key=True)
+    expr = Column(Text)  # condition_dsl expression
+    note = Column(Text, default="")
+
 class Order(Base):
     __tablename__ = "orders"
     order_id = Column(String, primary_key=True)
@@ -111,3 +134,28 @@ def create_all():
 
 def get_session():
     return SessionLocal()
+
+BULK_CACHE_KB = 256000
+
+@contextmanager
+def raw_transaction(cur=None):
+    """DBAPI cursor inside one write transaction (BEGIN IMMEDIATE .. COMMIT) for bulk executemany loads.
+
+    The page cache is raised for the duration. Passing an open cursor joins its transaction instead.
+    """
+    if cur is not None:
+        yield cur; return
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"PRAGMA cache_size = -{BULK_CACHE_KB};")
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+            conn.commit()
+        except BaseException:
+            conn.rollback(); raise
+        finally:
+            cur.execute("PRAGMA cache_size = -64000;"); cur.close()
+    finally:
+        conn.close()
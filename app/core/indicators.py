@@ -10,10 +10,10 @@ def ema(s: pd.Series, n: int) -> pd.Series:
 
 def rsi(close: pd.Series, period: int = 14) -> pd.Series:
     delta = close.diff()
-    gain = np.where(delta > 0, delta, 0.0)
-    loss = np.where(delta < 0, -delta, 0.0)
-    roll_up = pd.Series(gain, index=close.index).rolling(period).mean()
-    roll_down = pd.Series(loss, index=close.index).rolling(period).mean()
+    gain = delta.where(delta > 0, 0.0)
+    loss = (-delta).where(delta < 0, 0.0)
+    roll_up = gain.rolling(period).mean()
+    roll_down = loss.rolling(period).mean()
     rs = roll_up / (roll_down + 1e-9)
     r = 100.0 - (100.0 / (1.0 + rs))
     return r
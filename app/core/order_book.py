@@ -0,0 +1,86 @@
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+DEPTH = 10   # KHOpenAPI "주식호가잔량" carries 10 levels a side
+ASK, BID = 0, 1
+Level = Tuple[int, int, float, float]  # side, level (0 = best), price, qty
+
+class OrderBooks:
+    """Depth for every subscribed symbol in one (symbols x 2 sides x depth) price/qty block, updated in place.
+
+    update() marks the levels whose price or qty changed; drain() hands a renderer only those levels, so any
+    number of updates between two frames costs one diff. Fed from the broker thread, drained from the UI timer.
+    """
+
+    def __init__(self, depth: int = DEPTH, capacity: int = 64):
+        self.depth = depth
+        self.symbols: List[str] = []; self.index: Dict[str, int] = {}
+        self.px = np.zeros((capacity, 2, depth)); self.qty = np.zeros((capacity, 2, depth))
+        self.dirty = np.zeros((capacity, 2, depth), dtype=bool)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+        self.stats = {"updates": 0, "unchanged": 0, "levels": 0, "drains": 0, "drained": 0}
+
+    def __contains__(self, symbol: str) -> bool: return symbol in self.index
+
+    def _row(self, symbol: str) -> int:
+        row = self.index.get(symbol)
+        if row is None:
+            if self._free:
+                row = self._free.pop(); self.symbols[row] = symbol
+            else:
+                row = len(self.symbols)
+                if row == len(self.ts):
+                    for name in ("px", "qty", "dirty", "ts"):
+                        arr = getattr(self, name); setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+                self.symbols.append(symbol)
+            self.index[symbol] = row
+        return row
+
+    def discard(self, symbol: str):
+        with self._lock:
+            row = self.index.pop(symbol, None)
+            if row is None: return
+            self.px[row] = 0.0; self.qty[row] = 0.0; self.dirty[row] = False; self.ts[row] = 0
+            self._free.append(row)
+
+    def update(self, symbol: str, px, qty, ts: int = 0) -> int:
+        """Replace a symbol's depth with (2, depth) price and qty arrays (ASK row, BID row; best level first).
+        Returns the number of levels that changed."""
+        with self._lock:
+            row = self._row(symbol)
+            changed = (self.px[row] != px) | (self.qty[row] != qty)
+            self.ts[row] = ts; self.stats["updates"] += 1
+            n = int(np.count_nonzero(changed))
+            if not n:
+                self.stats["unchanged"] += 1; return 0
+            self.px[row] = px; self.qty[row] = qty; self.dirty[row] |= changed
+            self.stats["levels"] += n
+            return n
+
+    def drain(self, symbols: Optional[Sequence[str]] = None, full: bool = False) -> Dict[str, List[Level]]:
+        """Levels changed since the last drain, per symbol (all levels with ``full``, e.g. for a fresh view).
+        Only the drained symbols are marked clean."""
+        with self._lock:
+            if symbols is None: rows = np.flatnonzero(self.dirty[:len(self.symbols)].any(axis=(1, 2))).tolist()
+            else: rows = [self.index[s] for s in symbols if s in self.index]
+            out: Dict[str, List[Level]] = {}
+            for row in rows:
+                side, lvl = np.nonzero(self.dirty[row]) if not full else np.indices((2, self.depth)).reshape(2, -1)
+                if not len(side): continue
+                out[self.symbols[row]] = list(zip(side.tolist(), lvl.tolist(),
+                                                  self.px[row, side, lvl].tolist(), self.qty[row, side, lvl].tolist()))
+                self.dirty[row] = False
+            self.stats["drains"] += 1; self.stats["drained"] += sum(len(v) for v in out.values())
+            return out
+
+    def snapshot(self, symbol: str) -> Dict:
+        """get_orderbook() shape: asks deepest first, bids best first."""
+        with self._lock:
+            row = self.index[symbol]; px = self.px[row].tolist(); qty = self.qty[row].tolist()
+        asks = list(zip(px[ASK], qty[ASK]))[::-1]; bids = list(zip(px[BID], qty[BID]))
+        mid = (px[ASK][0] + px[BID][0]) / 2.0 if px[ASK][0] and px[BID][0] else 0.0
+        return {"asks": asks, "bids": bids, "mid": round(mid, 2)}
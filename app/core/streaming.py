@@ -0,0 +1,220 @@
+
+import math, threading
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple
+
+# Bar-at-a-time counterparts of app.core.indicators. Each update() is O(1) (amortized for max/min)
+# and reproduces the batch value for the same bar, NaN while the batch version would be NaN.
+
+NAN = float("nan")
+
+class EMA:
+    def __init__(self, n: int):
+        self.alpha = 2.0 / (n + 1); self.value = NAN; self.old_wt = 1.0
+
+    def update(self, x: float) -> float:
+        if self.value != self.value:
+            if x == x: self.value = x
+            return self.value
+        # same operation order as pandas ewm(adjust=False, ignore_na=False): a NaN holds the value and decays its weight
+        a = self.alpha; self.old_wt *= 1.0 - a
+        if x == x:
+            if x != self.value: self.value = (self.old_wt * self.value + a * x) / (self.old_wt + a)
+            self.old_wt = 1.0
+        return self.value
+
+class RollingMean:
+    """Kahan-compensated running sum over the last n values; sma() uses min_periods=1.
+    NaNs occupy a slot but are left out of the sum and the count, as in Series.rolling."""
+    def __init__(self, n: int, min_periods: int = None):
+        self.n = n; self.min_periods = n if min_periods is None else min_periods
+        self.buf = deque(); self.k = 0; self.sum = 0.0; self.comp = 0.0; self.value = NAN
+
+    def _add(self, x: float):
+        y = x - self.comp; t = self.sum + y
+        self.comp = (t - self.sum) - y; self.sum = t
+
+    def update(self, x: float) -> float:
+        self.buf.append(x)
+        if x == x: self._add(x); self.k += 1
+        if len(self.buf) > self.n:
+            old = self.buf.popleft()
+            if old == old:
+                self.k -= 1
+                if self.k: self._add(-old)
+                else: self.sum = self.comp = 0.0
+        self.value = self.sum / self.k if self.k and self.k >= self.min_periods else NAN
+        return self.value
+
+class RollingStd:
+    """Sliding Welford mean/variance over the non-NaN values of the window, sample std (ddof=1) like
+    Series.rolling(n).std(), so NaN while a NaN is inside the window."""
+    def __init__(self, n: int, ddof: int = 1):
+        self.n = n; self.ddof = ddof
+        self.buf = deque(); self.k = 0; self.mean = 0.0; self.m2 = 0.0; self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.buf.append(x)
+        if x == x:
+            self.k += 1; d = x - self.mean; self.mean += d / self.k; self.m2 += d * (x - self.mean)
+        if len(self.buf) > self.n:
+            old = self.buf.popleft()
+            if old == old:
+                self.k -= 1
+                if self.k:
+                    d = old - self.mean; self.mean -= d / self.k; self.m2 -= d * (old - self.mean)
+                else:
+                    self.mean = self.m2 = 0.0
+        if self.k < self.n or self.k <= self.ddof:
+            self.value = NAN
+        else:
+            self.value = math.sqrt(max(self.m2, 0.0) / (self.k - self.ddof))
+        return self.value
+
+class _RollingExtreme:
+    """Monotonic deque of the window's candidates; NaN (min_periods=n) while a NaN is inside the window."""
+    def __init__(self, n: int, better):
+        self.n = n; self.better = better; self.i = 0; self.q = deque(); self.nans = deque(); self.value = NAN
+
+    def update(self, x: float) -> float:
+        q = self.q
+        if x == x:
+            while q and not self.better(q[-1][1], x): q.pop()
+            q.append((self.i, x))
+        else:
+            self.nans.append(self.i)
+        while q and q[0][0] <= self.i - self.n: q.popleft()
+        while self.nans and self.nans[0] <= self.i - self.n: self.nans.popleft()
+        self.i += 1
+        self.value = q[0][1] if self.i >= self.n and not self.nans else NAN
+        return self.value
+
+class RollingMax(_RollingExtreme):
+    def __init__(self, n: int): super().__init__(n, lambda kept, x: kept > x)
+
+class RollingMin(_RollingExtreme):
+    def __init__(self, n: int): super().__init__(n, lambda kept, x: kept < x)
+
+class RSI:
+    def __init__(self, period: int = 14):
+        self.up = RollingMean(period); self.down = RollingMean(period); self.prev = NAN; self.value = NAN
+
+    def update(self, close: float) -> float:
+        delta = close - self.prev; self.prev = close
+        up = self.up.update(delta if delta > 0 else 0.0)
+        down = self.down.update(-delta if delta < 0 else 0.0)
+        self.value = 100.0 - (100.0 / (1.0 + up / (down + 1e-9)))
+        return self.value
+
+class MACD:
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast); self.slow = EMA(slow); self.sig = EMA(signal); self.value = (NAN, NAN, NAN)
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        m = self.fast.update(close) - self.slow.update(close); s = self.sig.update(m)
+        self.value = (m, s, m - s)
+        return self.value
+
+class OBV:
+    def __init__(self):
+        self.prev = NAN; self.value = 0.0
+
+    def update(self, close: float, volume: float) -> float:
+        delta = close - self.prev; self.prev = close
+        step = (delta > 0) - (delta < 0) if delta == delta else 0
+        if step and volume == volume: self.value += step * volume
+        return self.value
+
+class VolumeSpike:
+    def __init__(self, window: int = 20, k: float = 2.0):
+        self.k = k; self.ma = RollingMean(window); self.sd = RollingStd(window); self.value = False
+
+    def update(self, vol: float) -> bool:
+        ma = self.ma.update(vol); sd = self.sd.update(vol)
+        self.value = bool(vol > ma + self.k * sd)
+        return self.value
+
+class IndicatorState:
+    """The indicator set the rationale evaluators read, advanced one closed bar at a time.
+
+    ``rows`` holds the last two bars as (candle, snapshot): the last value and one-bar shifts/diffs, which is
+    all the rationale evaluators look at on the newest bar.
+    """
+    def __init__(self):
+        self.ema5 = EMA(5); self.ema20 = EMA(20); self.sma20 = RollingMean(20, 1); self.sma50 = RollingMean(50, 1)
+        self.rsi = RSI(14); self.macd = MACD(); self.obv = OBV(); self.vol_spike = VolumeSpike(20, 2.0)
+        self.atr14 = RollingMean(14)
+        self.high390 = RollingMax(390); self.low390 = RollingMin(390)
+        self.high20 = RollingMax(20); self.low20 = RollingMin(20)
+        self.rows = deque(maxlen=2); self.last_ts = None
+
+    def update(self, ts: int, open_: float, high: float, low: float, close: float, vol: float) -> Dict[str, float]:
+        if self.last_ts is not None and ts <= self.last_ts: return self.snapshot()
+        self.last_ts = ts
+        self.ema5.update(close); self.ema20.update(close); self.sma20.update(close); self.sma50.update(close)
+        self.rsi.update(close); self.macd.update(close); self.obv.update(close, vol); self.vol_spike.update(vol)
+        self.atr14.update(high - low)
+        self.high390.update(high); self.low390.update(low); self.high20.update(high); self.low20.update(low)
+        snap = self.snapshot()
+        self.rows.append(((ts, open_, high, low, close, vol), snap))
+        return snap
+
+    def snapshot(self) -> Dict[str, float]:
+        m, s, h = self.macd.value
+        return {"ema5": self.ema5.value, "ema20": self.ema20.value, "sma20": self.sma20.value, "sma50": self.sma50.value,
+                "rsi": self.rsi.value, "macd": m, "macd_signal": s, "macd_hist": h, "obv": self.obv.value,
+                "volume_spike": self.vol_spike.value, "atr14": self.atr14.value,
+                "high390": self.high390.value, "low390": self.low390.value,
+                "high20": self.high20.value, "low20": self.low20.value}
+
+_STATES: Dict[Tuple[str, str], IndicatorState] = {}
+_LOCK = threading.RLock()  # on_bar runs on the tick thread, the scorers read on theirs
+
+def get_state(symbol: str, tf: str) -> IndicatorState:
+    with _LOCK:
+        st = _STATES.get((symbol, tf))
+        if st is None: st = _STATES[(symbol, tf)] = IndicatorState()
+        return st
+
+def warm(symbol: str, tf: str, cols: Dict) -> IndicatorState:
+    """Feed a history (dict of ts/open/high/low/close/vol arrays) into a fresh state."""
+    st = IndicatorState()
+    for row in zip(*(cols[c].tolist() for c in ("ts", "open", "high", "low", "close", "vol"))):
+        st.update(*row)
+    with _LOCK: _STATES[(symbol, tf)] = st
+    return st
+
+def on_bar(bar: Tuple) -> None:
+    """BarAggregator on_bar hook: a closed (symbol, tf, ts, o, h, l, c, v) bar advances that series' state.
+    Series nobody has scored yet have no state; current() warms them from the store when first asked."""
+    symbol, tf, ts, o, h, l, c, v = bar
+    with _LOCK:
+        st = _STATES.get((symbol, tf))
+        if st is not None: st.update(ts, o, h, l, c, v)
+
+def current(symbol: str, tf: str, load: Callable[..., Dict], warm_bars: int) -> Optional[IndicatorState]:
+    """The series' state, up to date with the newest stored bar (None without bars).
+
+    ``load(symbol, tf, last_n)`` returns stored columns. A state at or past the stored tail is used as is (the
+    aggregator runs ahead of the candle writer); one behind it is fed the bars it missed; one the store no
+    longer agrees with (a rewritten bar, a gap wider than warm_bars) is rebuilt from the last warm_bars.
+    """
+    with _LOCK:
+        tail = load(symbol, tf, last_n=1)
+        if not len(tail["ts"]): return None
+        last = int(tail["ts"][-1])
+        st = _STATES.get((symbol, tf))
+        if st is not None and st.rows and (st.last_ts > last or _same(st.rows[-1][0], tail, -1)): return st
+        cols = load(symbol, tf, last_n=warm_bars)
+        ts = cols["ts"].tolist()
+        i = bisect_left(ts, st.last_ts) if st is not None and st.rows else len(ts)
+        if i < len(ts) and ts[i] == st.last_ts and _same(st.rows[-1][0], cols, i):
+            for row in zip(*(cols[c][i + 1:].tolist() for c in ("ts", "open", "high", "low", "close", "vol"))):
+                st.update(*row)
+            return st
+        return warm(symbol, tf, cols)
+
+def _same(bar: Tuple, cols: Dict, i: int) -> bool:
+    """The state's last bar is the stored bar at i: same ts, close and volume."""
+    return bar[0] == int(cols["ts"][i]) and bar[4] == float(cols["close"][i]) and bar[5] == float(cols["vol"][i])
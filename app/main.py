@@ -3,9 +3,14 @@ from PyQt5 import QtWidgets
 import sys
 from app.ui.main_window import MainWindow
 from app.core.db import create_all
+from app.services.batch_scorer import universe_symbols
+from app.services.condition_engine import BAR_CACHE
+from app.services.condition_dsl import seed_presets
 
 def main():
     create_all()
+    seed_presets()
+    BAR_CACHE.warm(list(universe_symbols()))
     app = QtWidgets.QApplication(sys.argv)
     win = MainWindow()
     win.show()
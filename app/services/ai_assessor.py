@@ -1,4 +1,7 @@
 
+# placeholder market features until a live feature feed exists
+DEFAULT_FEATURES = {"volatility":0.02, "spread":0.15, "momentum":0.6, "trend":0.55}
+
 def ai_score(features: dict, human_score: float, mode: str = "Normal") -> float:
     r = max(0.0, min(1.0, human_score/100.0))
     vol = features.get("volatility", 0.02)
@@ -0,0 +1,183 @@
+
+import itertools, os, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from app.core.utils import get_logger
+from app.services.replay_engine import ReplayResult, _bars
+
+log = get_logger("backtester")
+
+FIELDS = ("open", "high", "low", "close", "final")  # final = decide()'s (human + ai) / 2
+DEFAULTS = dict(buy_th=70, sell_th=40, stop_pct=3.0, trail_pct=2.0, take_profits=((2.0, 0.3), (4.0, 0.3), (6.0, 0.4)))
+METRICS = ["return_pct", "pnl", "realized_pnl", "max_drawdown_pct", "trades", "round_trips", "hit_rate", "open_positions"]
+
+def param_grid(**axes: Sequence) -> List[Dict]:
+    """Every combination of the given axes, e.g. param_grid(stop_pct=[2, 3, None], take_profits=[((2, 0.5),), ()]).
+    Parameters not given keep their DEFAULTS."""
+    keys = list(axes)
+    return [dict(DEFAULTS, **dict(zip(keys, vals))) for vals in itertools.product(*(axes[k] for k in keys))]
+
+def tp_text(steps) -> str:
+    """TP ladder in the trading tab's "gain@ratio,..." form."""
+    return ",".join(f"{lvl:g}@{ratio:g}" for lvl, ratio in steps)
+
+def _pack(bars: pd.DataFrame, n_sym: int):
+    """Bars on a (field x ts x symbol) grid in one shared float64 block, NaN where a symbol has no bar.
+    Returns (shm, shape, ts)."""
+    ts, row = np.unique(bars["ts"].to_numpy(), return_inverse=True)
+    shape = (len(FIELDS), len(ts), n_sym)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))) * 8)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf); block[:] = np.nan
+        sym = bars["sym"].to_numpy(dtype=np.int64)
+        for i, name in enumerate(FIELDS[:4]): block[i, row, sym] = bars[name].to_numpy()
+        block[4, row, sym] = (bars["human"].to_numpy() + bars["ai"].to_numpy()) / 2.0
+        del block
+    except BaseException:
+        shm.close(); shm.unlink(); raise
+    return shm, shape, ts
+
+def _simulate(block: np.ndarray, combos: List[Dict], qty: int, capital: float, slippage_bps: float,
+              intrabar: bool) -> List[Dict]:
+    """TradeEngine's exit rules and replay_candles()' entry/exit decisions, stepped over time with every
+    (combination x symbol) position held in arrays. Expressions mirror apply_stop_loss / apply_trailing_stop /
+    apply_take_profits / _apply_fill so the same prices trigger the same fills."""
+    C, (_, T, S) = len(combos), block.shape
+    col = lambda k: np.array([np.nan if c[k] is None else abs(c[k]) for c in combos], dtype=np.float64)[:, None]
+    buy_th, sell_th = (np.array([c[k] for c in combos], dtype=np.float64)[:, None] for k in ("buy_th", "sell_th"))
+    stop, trail_pct = col("stop_pct"), col("trail_pct")
+    ladders = [sorted(c["take_profits"] or (), key=lambda x: x[0]) for c in combos]
+    L = max((len(l) for l in ladders), default=0)
+    tp_lvl = np.full((C, L, 1), np.inf); tp_ratio = np.zeros((C, L, 1))
+    for c, steps in enumerate(ladders):
+        for l, (lvl, ratio) in enumerate(steps): tp_lvl[c, l, 0] = lvl; tp_ratio[c, l, 0] = ratio
+    up, down = 1 + slippage_bps / 1e4, 1 - slippage_bps / 1e4
+
+    pos = np.zeros((C, S), dtype=np.int64); avg = np.zeros((C, S)); trail = np.full((C, S), np.nan)
+    sold = np.zeros((C, L, S), dtype=bool)
+    cash = np.zeros((C, S)); trip = np.zeros((C, S))  # per symbol, so sums don't depend on fill order
+    fills = np.zeros(C, dtype=np.int64); trips = np.zeros(C, dtype=np.int64); wins = np.zeros(C, dtype=np.int64)
+    realized = np.zeros(C); peak = np.full(C, -np.inf); mdd = np.zeros(C)
+    last = np.zeros(S)
+
+    def sell(m, q, px):
+        nonlocal pos, avg, trail
+        pnl = np.where(m, (px - avg) * q, 0.0)
+        realized[:] += pnl.sum(axis=1); trip[:] += pnl; cash[:] += np.where(m, q * px, 0.0)
+        pos = np.where(m, np.maximum(0, pos - q), pos); fills[:] += m.sum(axis=1)
+        closed = m & (pos == 0)
+        trips[:] += closed.sum(axis=1); wins[:] += (closed & (trip > 0)).sum(axis=1)
+        trip[closed] = 0.0; avg = np.where(closed, 0.0, avg); trail = np.where(closed, np.nan, trail)
+        sold[:] &= ~closed[:, None, :]
+
+    path = (0, 1, 2, 3) if intrabar else (3,)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for t in range(T):
+            for k in path:  # on_price
+                p = block[k, t]
+                live = (pos > 0) & ~np.isnan(p)
+                if not live.any(): continue
+                px = p * down
+                gain = (p - avg) / avg * 100.0
+                hit = live & (gain <= -stop)
+                tr = live & ~hit & ~np.isnan(trail_pct)
+                trail = np.where(tr & (np.isnan(trail) | (p > trail)), p, trail)
+                hit |= tr & ((p - trail) / trail * 100.0 <= -trail_pct)
+                if hit.any(): sell(hit, pos, px)
+                for l in range(L):
+                    m = live & (pos > 0) & (gain >= tp_lvl[:, l]) & ~sold[:, l]
+                    if not m.any(): continue
+                    sold[:, l] |= m
+                    sell(m, np.maximum(1, (pos * tp_ratio[:, l]).astype(np.int64)), px)
+            p, f = block[3, t], block[4, t]  # decide() on the bar's close
+            has = ~np.isnan(p)
+            buy = has & (f >= buy_th)
+            out = has & ~buy & (f <= sell_th) & (pos > 0)
+            if out.any(): sell(out, pos, p * down)
+            entry = buy & (pos == 0)
+            if entry.any():
+                px = p * up
+                avg = np.where(entry, px * qty / qty, avg); cash -= np.where(entry, qty * px, 0.0)
+                pos = np.where(entry, qty, pos); fills += entry.sum(axis=1)
+            last = np.where(has, p, last)
+            eq = capital + cash.sum(axis=1) + (pos * last).sum(axis=1)
+            peak = np.maximum(peak, eq); mdd = np.maximum(mdd, (peak - eq) / peak)
+
+    eq = capital + cash.sum(axis=1) + (pos * last).sum(axis=1) if T else np.full(C, capital)
+    return [dict(c, take_profits=tp_text(ladders[i]), return_pct=float((eq[i] / capital - 1) * 100),
+                 pnl=float(eq[i] - capital), realized_pnl=float(realized[i]), max_drawdown_pct=float(mdd[i] * 100),
+                 trades=int(fills[i]), round_trips=int(trips[i]),
+                 hit_rate=float(wins[i] / trips[i]) if trips[i] else float("nan"),
+                 open_positions=int((pos[i] > 0).sum()))
+            for i, c in enumerate(combos)]
+
+def _run_chunk(shm_name: str, shape: Tuple[int, int, int], combos: List[Dict], qty: int, capital: float,
+               slippage_bps: float, intrabar: bool) -> List[Dict]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        out = _simulate(block, combos, qty, capital, slippage_bps, intrabar)
+        del block
+        return out
+    finally:
+        shm.close()
+
+def backtest_grid(symbols: Sequence[str], grid: Sequence[Dict], tf: str = "1m", profile: str = "scalp",
+                  mode: str = "Normal", qty: int = 10, capital: float = 10_000_000.0, slippage_bps: float = 0.0,
+                  intrabar: bool = False, since_ts: Optional[int] = None, until_ts: Optional[int] = None,
+                  workers: Optional[int] = None, chunk: int = 64) -> pd.DataFrame:
+    """Vectorized replay_candles() for every parameter combination in ``grid`` (see param_grid), best return first.
+
+    Scores and prices are computed once into shared memory; worker processes each take up to ``chunk``
+    combinations and step them together over the bars. Fills, cash and equity follow replay_candles() on
+    the same arguments (ReplayBroker fills at the triggering price less slippage, equity sampled per ts).
+    """
+    combos = [dict(DEFAULTS, **g) for g in grid]
+    cols = list(DEFAULTS) + METRICS
+    if not combos or not symbols: return pd.DataFrame(columns=cols)
+    t0 = time.perf_counter()
+    bars = _bars(symbols, tf, profile, mode, since_ts, until_ts)
+    if bars.empty: return pd.DataFrame(columns=cols)  # no symbol has bars in the range
+    shm = None
+    try:
+        shm, shape, _ = _pack(bars, len(symbols)); del bars
+        t_load = time.perf_counter() - t0
+        workers = workers or os.cpu_count() or 1
+        n = min(len(combos), max(workers, -(-len(combos) // chunk)))
+        bounds = np.linspace(0, len(combos), n + 1).astype(int).tolist()
+        parts = [combos[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+        args = (shm.name, shape)
+        kw = (qty, capital, slippage_bps, intrabar)
+        if workers == 1:
+            results = [_run_chunk(*args, part, *kw) for part in parts]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, n)) as ex:
+                results = list(ex.map(_run_chunk, *zip(*[args + (part,) + kw for part in parts])))
+    finally:
+        if shm is not None: shm.close(); shm.unlink()
+
+    df = pd.DataFrame([r for part in results for r in part], columns=cols)
+    df = df.sort_values(["return_pct", "max_drawdown_pct"], ascending=[False, True]).reset_index(drop=True)
+    dt = time.perf_counter() - t0
+    log.info(f"Backtested {len(combos)} combinations over {shape[1]} timestamps x {shape[2]} symbols "
+             f"with {workers} worker(s) in {dt:.2f}s (load+score {t_load:.2f}s).")
+    return df
+
+def replay_metrics(res: ReplayResult, capital: float = 10_000_000.0) -> Dict:
+    """backtest_grid()'s metric columns for an event-driven replay_candles() result."""
+    trades = res.trades; val = res.equity["equity"].to_numpy()
+    held: Dict[str, int] = {}; trip: Dict[str, float] = {}; trips = wins = 0
+    for sym, q, pnl in zip(*(trades[c].tolist() for c in ("symbol", "qty", "pnl"))) if len(trades) else ():
+        held[sym] = max(0, held.get(sym, 0) + q); trip[sym] = trip.get(sym, 0.0) + pnl
+        if q < 0 and held[sym] == 0:
+            trips += 1; wins += trip[sym] > 0; trip[sym] = 0.0
+    final = float(val[-1]) if len(val) else capital
+    peak = np.maximum.accumulate(val) if len(val) else val
+    return {"return_pct": (final / capital - 1) * 100, "pnl": final - capital,
+            "realized_pnl": float(trades["pnl"].sum()) if len(trades) else 0.0,
+            "max_drawdown_pct": float(((peak - val) / peak).max() * 100) if len(val) else 0.0,
+            "trades": len(trades), "round_trips": trips, "hit_rate": wins / trips if trips else float("nan"),
+            "open_positions": len(res.positions)}
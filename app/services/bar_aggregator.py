@@ -0,0 +1,134 @@
+
+import queue, threading, time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.core.utils import get_logger
+from app.services.data_manager import bucket_start, upsert_bars
+
+log = get_logger("bar_aggregator")
+
+TFS = ("1m", "3m", "15m", "60m", "1d")
+Bar = Tuple[str, str, int, float, float, float, float, float]  # symbol, tf, ts, open, high, low, close, vol
+
+class CandleWriter(threading.Thread):
+    """Write-behind for closed bars: drains a queue and commits them in batched transactions.
+    put() never blocks the tick thread: with the queue full (the DB stalled) the bar is dropped and counted."""
+
+    def __init__(self, max_batch: int = 5000, flush_interval: float = 0.5, maxsize: int = 100_000,
+                 sink: Callable[[List[Bar]], int] = upsert_bars):
+        super().__init__(name="candle-writer", daemon=True)
+        self.q: "queue.Queue[Optional[Bar]]" = queue.Queue(maxsize=maxsize)
+        self.max_batch = max_batch; self.flush_interval = flush_interval; self.sink = sink
+        self.stats = {"batches": 0, "rows": 0, "errors": 0, "max_depth": 0, "dropped": 0}
+        self._stopping = threading.Event()
+
+    def put(self, bar: Bar):
+        try: self.q.put_nowait(bar)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] & (self.stats["dropped"] - 1) == 0:  # 1st, 2nd, 4th, ... drop
+                log.warning(f"Candle queue full ({self.q.maxsize}); dropped {self.stats['dropped']} bars so far.")
+            return
+        depth = self.q.qsize()
+        if depth > self.stats["max_depth"]: self.stats["max_depth"] = depth
+
+    def run(self):
+        batch: List[Bar] = []; deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.q.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None: break
+                batch.append(item)
+                if len(batch) < self.max_batch: continue
+            except queue.Empty:
+                pass
+            self._flush(batch); batch = []; deadline = time.monotonic() + self.flush_interval
+        while True:  # drain whatever arrived before the stop marker
+            try:
+                item = self.q.get_nowait()
+                if item is not None: batch.append(item)
+            except queue.Empty:
+                break
+        self._flush(batch)
+
+    def _flush(self, batch: List[Bar]):
+        if not batch: return
+        try:
+            self.sink(batch); self.stats["batches"] += 1; self.stats["rows"] += len(batch)
+        except Exception as e:
+            self.stats["errors"] += 1; log.error(f"Candle flush of {len(batch)} bars failed: {e}")
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._stopping.is_set(): return
+        self._stopping.set(); self.q.put(None); self.join(timeout)
+
+class BarAggregator:
+    """Rolls price/volume ticks into open bars for every tf; closed bars go to the writer.
+
+    Each tick touches one open bar per tf (O(len(tfs))). Call from a single thread (the Qt real-data
+    callback or a replay loop); persistence happens on the CandleWriter thread.
+
+    The first bar of a (symbol, tf) whose first tick came after its bucket start (a start mid-session) is missing
+    the ticks before it: it is never written nor passed to on_bar, so it cannot overwrite a complete stored bar.
+    """
+
+    def __init__(self, tfs: Sequence[str] = TFS, writer: Optional[CandleWriter] = None,
+                 on_bar: Optional[Callable[[Bar], None]] = None):
+        self.tfs = tuple(tfs)
+        self.writer = writer if writer is not None else CandleWriter()
+        self.on_bar = on_bar
+        self._open: Dict[Tuple[str, str], list] = {}
+        self._last_ts: Dict[str, int] = {}  # newest tick per symbol: an older one never sets a bar's close
+        self._partial: Set[Tuple[str, str]] = set()  # keys whose open bar is a first, partial bucket
+        self.stats = {"ticks": 0, "late": 0, "bars": 0, "partial": 0}
+        if not self.writer.is_alive(): self.writer.start()
+
+    def on_tick(self, symbol: str, ts: int, price: float, volume: float = 0.0):
+        self.stats["ticks"] += 1
+        newest = ts >= self._last_ts.get(symbol, ts)
+        if newest: self._last_ts[symbol] = ts
+        for tf in self.tfs:
+            start = bucket_start(ts, tf)
+            key = (symbol, tf); bar = self._open.get(key)
+            if bar is None or start > bar[0]:
+                if bar is not None: self._close(symbol, tf, bar)
+                elif ts > start: self._partial.add(key)
+                self._open[key] = [start, price, price, price, price, volume]
+            elif start < bar[0]:  # behind this tf's open bar only; the other tfs may still take it
+                self.stats["late"] += 1; continue
+            else:
+                if price > bar[2]: bar[2] = price
+                if price < bar[3]: bar[3] = price
+                if newest: bar[4] = price
+                bar[5] += volume
+
+    def _close(self, symbol: str, tf: str, bar: list):
+        if (symbol, tf) in self._partial:
+            self._partial.discard((symbol, tf)); self.stats["partial"] += 1
+            return
+        out = (symbol, tf, int(bar[0]), float(bar[1]), float(bar[2]), float(bar[3]), float(bar[4]), float(bar[5]))
+        self.stats["bars"] += 1
+        self.writer.put(out)
+        if self.on_bar: self.on_bar(out)
+
+    def open_bar(self, symbol: str, tf: str) -> Optional[Bar]:
+        bar = self._open.get((symbol, tf))
+        return (symbol, tf, *bar) if bar else None
+
+    def close_all(self, before_ts: Optional[int] = None):
+        """Close open bars (all, or those whose bucket ended by before_ts), e.g. at the session close."""
+        for (sym, tf), bar in list(self._open.items()):
+            if before_ts is None or bucket_start(before_ts, tf) > bar[0]:
+                self._close(sym, tf, bar); del self._open[(sym, tf)]
+
+    def stop(self):
+        self.close_all(); self.writer.stop()
+
+def replay_ticks(symbol: str, cols: Dict[str, np.ndarray], ticks_per_bar: int = 4) -> Iterator[Tuple[str, int, float, float]]:
+    """Local tick source from stored 1m candles: open, high, low, close (repeated to fill ticks_per_bar >= 4),
+    volume split evenly, so the ticks roll back up into the same bars."""
+    n = max(4, ticks_per_bar); step = 60_000 // n
+    for ts, o, h, l, c, v in zip(*(cols[k].tolist() for k in ("ts", "open", "high", "low", "close", "vol"))):
+        path = [o, h, l] + [c] * (n - 3)
+        share = v / len(path)
+        for i, p in enumerate(path): yield symbol, ts + i * step, p, share
@@ -0,0 +1,92 @@
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from app.core.db import get_session, Theme, ThemeSymbol
+from app.core.utils import get_logger
+from app.services.ai_assessor import ai_score, DEFAULT_FEATURES
+from app.services.condition_engine import load_arrays, CANDLE_COLS
+from app.services.features import FeatureFrame, required_lookback
+from app.services.rationale_service import ScoringPlan, get_plan, score_last
+
+log = get_logger("batch_scorer")
+
+PROFILES = ("scalp", "day", "mid")
+
+def universe_symbols() -> Dict[str, List[str]]:
+    """symbol -> theme names, over every Theme/ThemeSymbol row."""
+    with get_session() as s:
+        rows = s.execute(select(ThemeSymbol.symbol, Theme.theme_name)
+                         .join(Theme, Theme.theme_id==ThemeSymbol.theme_id)
+                         .order_by(ThemeSymbol.symbol)).all()
+    out: Dict[str, List[str]] = {}
+    for sym, theme in rows: out.setdefault(sym, []).append(theme)
+    return out
+
+def _pack(symbols: Sequence[str], tf: str, last_n: Optional[int]):
+    """Load every symbol's candles into one shared (6 x total_bars) float64 block; returns (shm, offsets)."""
+    cols = [load_arrays(sym, tf, last_n=last_n) for sym in symbols]
+    sizes = [len(c["ts"]) for c in cols]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(offsets[-1])) * len(CANDLE_COLS) * 8)
+    block = np.ndarray((len(CANDLE_COLS), int(offsets[-1])), dtype=np.float64, buffer=shm.buf)
+    for c, lo, hi in zip(cols, offsets[:-1], offsets[1:]):
+        for i, name in enumerate(CANDLE_COLS): block[i, lo:hi] = c[name]
+    del block
+    return shm, offsets.tolist()
+
+def _score_chunk(shm_name: str, n_total: int, tasks: List[Tuple[str, int, int]],
+                 plans: List[ScoringPlan], mode: str) -> List[Tuple]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((len(CANDLE_COLS), n_total), dtype=np.float64, buffer=shm.buf)
+        out = []; df = ff = None
+        for sym, lo, hi in tasks:
+            df = pd.DataFrame({name: block[i, lo:hi] for i, name in enumerate(CANDLE_COLS)})
+            df["ts"] = df["ts"].astype(np.int64)
+            ff = FeatureFrame(df)  # shared by all profiles of this symbol
+            for plan in plans:
+                human, _ = score_last(ff, plan)
+                ai = ai_score(DEFAULT_FEATURES, human_score=human, mode=mode)
+                out.append((sym, plan.profile, human, ai, round((human + ai) / 2.0, 2), int(df["ts"].iloc[-1])))
+        del block, df, ff
+        return out
+    finally:
+        shm.close()
+
+def score_universe(symbols: Optional[Sequence[str]] = None, tf: str = "1m", profiles: Sequence[str] = PROFILES,
+                   workers: Optional[int] = None, latest_only: bool = True, mode: str = "Normal") -> pd.DataFrame:
+    """Human/AI score for every symbol x profile, ranked by final score (best first)."""
+    themes = universe_symbols()
+    symbols = list(symbols) if symbols is not None else list(themes)
+    plans = [p for p in (get_plan(prof) for prof in profiles) if p.funcs]
+    cols = ["symbol", "profile", "human", "ai", "final", "ts"]
+    if not symbols or not plans:
+        return pd.DataFrame(columns=cols + ["themes", "rank"])
+
+    last_n = required_lookback([fn for p in plans for fn in p.funcs]) if latest_only else None
+    shm, offsets = _pack(symbols, tf, last_n)
+    try:
+        # symbols without stored bars (new listings, not yet loaded) are left out of the ranking
+        tasks = [(sym, offsets[i], offsets[i + 1]) for i, sym in enumerate(symbols) if offsets[i + 1] > offsets[i]]
+        workers = workers or os.cpu_count() or 1
+        chunks = [tasks[i::workers * 4] for i in range(min(len(tasks), workers * 4))]
+        args = (shm.name, offsets[-1])
+        if workers == 1 or not chunks:
+            results = [_score_chunk(*args, ch, plans, mode) for ch in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                results = list(ex.map(_score_chunk, *zip(*[args + (ch, plans, mode) for ch in chunks])))
+    finally:
+        shm.close(); shm.unlink()
+
+    df = pd.DataFrame([r for chunk in results for r in chunk], columns=cols)
+    df["themes"] = df["symbol"].map(lambda s: ",".join(themes.get(s, [])))
+    df = df.sort_values(["final", "human"], ascending=False).reset_index(drop=True)
+    df["rank"] = np.arange(1, len(df) + 1)
+    log.info(f"Scored {len(symbols)} symbols x {len(plans)} profiles with {workers} worker(s).")
+    return df
@@ -0,0 +1,277 @@
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+from sqlalchemy import select
+from app.core.db import get_session, ConditionPreset
+from app.core.indicators import ema, sma, rsi, macd, obv, volume_spike
+from app.services.condition_engine import load_df
+
+# Screens as text, e.g. "ema(close,5) crosses_above ema(close,20) and volume_spike(vol,20,2)".
+#
+#   expr  := or ;  or := and ("or" and)* ;  and := not ("and" not)* ;  not := "not" not | cmp
+#   cmp   := sum [(">"|"<"|">="|"<="|"=="|"!="|"crosses_above"|"crosses_below") sum]
+#   sum   := prod (("+"|"-") prod)* ;  prod := unary (("*"|"/") unary)* ;  unary := "-" unary | atom
+#   atom  := NUMBER | column | func "(" expr ("," expr)* ")" | "(" expr ")"
+#
+# Nodes are nested tuples, so equal subexpressions are equal keys: compiling several expressions
+# together yields one DAG where e.g. ema(close,20) or macd(close) is evaluated once.
+
+COLUMNS = ("open", "high", "low", "close", "vol")
+
+def _macd3(x): return macd(x)
+def _rolling(method):
+    return lambda x, n: getattr(x.rolling(int(n)), method)()
+
+# name -> (callable, number of series args, lookback(numeric args) in bars)
+FUNCS = {
+    "ema":           (lambda x, n: ema(x, int(n)),               1, lambda n: 5 * int(n)),
+    "sma":           (lambda x, n: sma(x, int(n)),               1, lambda n: int(n)),
+    "rsi":           (lambda x, n=14: rsi(x, int(n)),            1, lambda n=14: int(n) + 1),
+    "macd3":         (_macd3,                                    1, lambda: 200),
+    "obv":           (obv,                                       2, lambda: 2),
+    "volume_spike":  (lambda v, n=20, k=2.0: volume_spike(v, int(n), float(k)), 1, lambda n=20, k=2.0: int(n)),
+    "rolling_max":   (_rolling("max"),                           1, lambda n: int(n)),
+    "rolling_min":   (_rolling("min"),                           1, lambda n: int(n)),
+    "rolling_mean":  (_rolling("mean"),                          1, lambda n: int(n)),
+    "rolling_std":   (_rolling("std"),                           1, lambda n: int(n)),
+    "shift":         (lambda x, n=1: x.shift(int(n)),            1, lambda n=1: int(n) + 1),
+    "abs":           (lambda x: x.abs(),                         1, lambda: 1),
+}
+# sugar expanded at parse time so the MACD triple is shared between its three views
+MACD_VIEWS = {"macd": 0, "macd_signal": 1, "macd_hist": 2}
+
+BINOPS = {
+    "+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b, "/": lambda a, b: a / b,
+    ">": lambda a, b: a > b, "<": lambda a, b: a < b, ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b,
+    "==": lambda a, b: a == b, "!=": lambda a, b: a != b,
+    "and": lambda a, b: a.fillna(False) & b.fillna(False) if hasattr(a, "fillna") else a & b,
+    "or":  lambda a, b: a.fillna(False) | b.fillna(False) if hasattr(a, "fillna") else a | b,
+    "crosses_above": lambda a, b: ((a.shift(1) <= b.shift(1)) & (a > b)).fillna(False),
+    "crosses_below": lambda a, b: ((a.shift(1) >= b.shift(1)) & (a < b)).fillna(False),
+}
+_CMP = (">=", "<=", "==", "!=", ">", "<", "crosses_above", "crosses_below")
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?|\.\d+)|([A-Za-z_]\w*)|(>=|<=|==|!=|[()+\-*/<>,]))")
+
+def _tokenize(text: str) -> List[Tuple[str, object, int]]:
+    out, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Unexpected character at {pos}: {text[pos:pos+10]!r}")
+        num, name, op = m.groups()
+        if num is not None: out.append(("num", float(num), m.start(1)))
+        elif name is not None: out.append(("name", name.lower(), m.start(2)))
+        else: out.append(("op", op, m.start(3)))
+        pos = m.end()
+    out.append(("end", None, len(text)))
+    return out
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text; self.toks = _tokenize(text); self.i = 0
+
+    def peek(self): return self.toks[self.i]
+
+    def take(self, kind=None, val=None):
+        t = self.toks[self.i]
+        if (kind and t[0] != kind) or (val is not None and t[1] != val):
+            want = val if val is not None else kind
+            raise ValueError(f"Expected {want!r} at {t[2]} in {self.text!r}")
+        self.i += 1
+        return t
+
+    def at(self, *vals) -> bool:
+        t = self.peek(); return t[0] in ("op", "name") and t[1] in vals
+
+    def parse(self):
+        node = self.or_()
+        self.take("end")
+        return node
+
+    def or_(self):
+        node = self.and_()
+        while self.at("or"): self.take(); node = ("bin", "or", node, self.and_())
+        return node
+
+    def and_(self):
+        node = self.not_()
+        while self.at("and"): self.take(); node = ("bin", "and", node, self.not_())
+        return node
+
+    def not_(self):
+        if self.at("not"): self.take(); return ("not", self.not_())
+        return self.cmp()
+
+    def cmp(self):
+        node = self.sum()
+        if self.at(*_CMP): op = self.take()[1]; node = ("bin", op, node, self.sum())
+        return node
+
+    def sum(self):
+        node = self.prod()
+        while self.at("+", "-"): op = self.take()[1]; node = ("bin", op, node, self.prod())
+        return node
+
+    def prod(self):
+        node = self.unary()
+        while self.at("*", "/"): op = self.take()[1]; node = ("bin", op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.at("-"): self.take(); return ("bin", "-", ("num", 0.0), self.unary())
+        return self.atom()
+
+    def atom(self):
+        kind, val, pos = self.peek()
+        if kind == "num": self.take(); return ("num", val)
+        if kind == "op" and val == "(":
+            self.take(); node = self.or_(); self.take("op", ")"); return node
+        if kind != "name":
+            raise ValueError(f"Unexpected {'end of expression' if kind == 'end' else repr(val)} at {pos} in {self.text!r}")
+        self.take()
+        if not self.at("("):
+            if val not in COLUMNS: raise ValueError(f"Unknown column {val!r} at {pos}")
+            return ("col", val)
+        self.take()
+        args = [self.or_()]
+        while self.at(","): self.take(); args.append(self.or_())
+        self.take("op", ")")
+        if val in MACD_VIEWS:
+            return ("item", MACD_VIEWS[val], self._call("macd3", args, pos))
+        return self._call(val, args, pos)
+
+    def _call(self, name, args, pos):
+        if name not in FUNCS: raise ValueError(f"Unknown function {name!r} at {pos}")
+        n_series = FUNCS[name][1]
+        series, params = args[:n_series], args[n_series:]
+        if len(series) < n_series or any(p[0] != "num" for p in params):
+            raise ValueError(f"{name}() takes {n_series} series then numeric parameters (at {pos})")
+        try: FUNCS[name][2](*(p[1] for p in params))
+        except TypeError: raise ValueError(f"Wrong number of parameters for {name}() at {pos}") from None
+        return ("call", name, tuple(series), tuple(p[1] for p in params))
+
+def parse(text: str) -> tuple:
+    return _Parser(text).parse()
+
+class Program:
+    """Several expressions compiled into one topologically ordered, deduplicated step list."""
+
+    def __init__(self, exprs: Dict[str, str]):
+        self.slots: Dict[tuple, int] = {}; self.steps: List[tuple] = []; self.lookbacks: List[int] = []
+        self.outputs = {name: self._emit(parse(text)) for name, text in exprs.items()}
+        self.exprs = dict(exprs)
+
+    def _emit(self, node) -> int:
+        if node in self.slots: return self.slots[node]
+        kind = node[0]
+        if kind == "col": step, lb = (kind, node[1]), 1
+        elif kind == "num": step, lb = (kind, node[1]), 0
+        elif kind == "not":
+            a = self._emit(node[1]); step, lb = (kind, a), self.lookbacks[a]
+        elif kind == "item":
+            a = self._emit(node[2]); step, lb = (kind, node[1], a), self.lookbacks[a]
+        elif kind == "bin":
+            a, b = self._emit(node[2]), self._emit(node[3])
+            lb = max(self.lookbacks[a], self.lookbacks[b]) + (1 if node[1].startswith("crosses") else 0)
+            step = (kind, BINOPS[node[1]], a, b)
+        else:
+            fn, _, lookback = FUNCS[node[1]]
+            args = tuple(self._emit(a) for a in node[2])
+            lb = max(self.lookbacks[a] for a in args) + lookback(*node[3]) - 1
+            step = (kind, fn, args, node[3])
+        self.steps.append(step); self.lookbacks.append(lb)
+        slot = self.slots[node] = len(self.steps) - 1
+        return slot
+
+    @property
+    def lookback(self) -> int:
+        return max((self.lookbacks[s] for s in self.outputs.values()), default=1)
+
+    def run(self, frame) -> Dict[str, object]:
+        """``frame[col]`` may give Series (one symbol) or wide DataFrames (panel, one column per symbol)."""
+        vals: List[object] = []
+        for step in self.steps:
+            kind = step[0]
+            if kind == "col": vals.append(frame[step[1]])
+            elif kind == "num": vals.append(step[1])
+            elif kind == "not": vals.append(~vals[step[1]].fillna(False).astype(bool))
+            elif kind == "item": vals.append(vals[step[2]][step[1]])
+            elif kind == "bin": vals.append(step[1](vals[step[2]], vals[step[3]]))
+            else: vals.append(step[1](*(vals[a] for a in step[2]), *step[3]))
+        return {name: vals[slot] for name, slot in self.outputs.items()}
+
+_COMPILED: Dict[Tuple, Program] = {}
+
+def compile_exprs(exprs: Dict[str, str]) -> Program:
+    key = tuple(sorted(exprs.items()))
+    prog = _COMPILED.get(key)
+    if prog is None: prog = _COMPILED[key] = Program(exprs)
+    return prog
+
+def _as_signal(val, like) -> pd.Series:
+    if not hasattr(val, "fillna"):  # a bare constant
+        return pd.Series([bool(val)] * len(like), index=like.index)
+    return val.fillna(False).astype(bool)
+
+def evaluate_expr(symbol: str, tf: str, expr: str, latest_only: bool = False) -> pd.Series:
+    prog = compile_exprs({"out": expr})
+    df = load_df(symbol, tf, last_n=prog.lookback if latest_only else None, cached=latest_only)
+    if df.empty: return pd.Series([], dtype=bool)
+    return _as_signal(prog.run(df)["out"], df)
+
+def load_panel(symbols: Sequence[str], tf: str, last_n: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """column -> wide DataFrame (index ts, one column per symbol). Symbols are expected to share a bar grid."""
+    frames = {sym: load_df(sym, tf, last_n=last_n).set_index("ts") for sym in symbols}
+    return {c: pd.DataFrame({sym: f[c] for sym, f in frames.items()}) for c in COLUMNS}
+
+def evaluate_panel(symbols: Sequence[str], tf: str, expr: str, latest_only: bool = False) -> pd.DataFrame:
+    prog = compile_exprs({"out": expr})
+    panel = load_panel(symbols, tf, last_n=prog.lookback if latest_only else None)
+    out = prog.run(panel)["out"]
+    return out.fillna(False).astype(bool) if hasattr(out, "fillna") else out
+
+# ---------- presets stored in the DB ----------
+DEFAULT_PRESETS = {
+    "scalp": "volume_spike(vol, 20, 2) and ema(close, 5) crosses_above ema(close, 20)",
+    "day":   "sma(close, 10) crosses_above sma(close, 60)",
+    "mid":   "macd(close) > macd_signal(close)",
+}
+
+_PRESETS: Optional[Dict[str, str]] = None  # preset_exprs() cache, dropped by save_preset()
+
+def save_preset(name: str, expr: str, note: str = ""):
+    global _PRESETS
+    parse(expr)  # reject before storing
+    with get_session() as s:
+        s.merge(ConditionPreset(name=name, expr=expr, note=note)); s.commit()
+    _PRESETS = None
+
+def load_presets() -> Dict[str, str]:
+    with get_session() as s:
+        rows = s.execute(select(ConditionPreset.name, ConditionPreset.expr).order_by(ConditionPreset.name)).all()
+    return {name: expr for name, expr in rows}
+
+def seed_presets() -> Dict[str, str]:
+    """Store DEFAULT_PRESETS for any preset name not in the DB yet."""
+    have = load_presets()
+    for name, expr in DEFAULT_PRESETS.items():
+        if name not in have: save_preset(name, expr, note="default")
+    return load_presets()
+
+def preset_exprs() -> Dict[str, str]:
+    """Stored presets (DEFAULT_PRESETS while none are stored), read once until the next save_preset()."""
+    global _PRESETS
+    if _PRESETS is None: _PRESETS = load_presets() or dict(DEFAULT_PRESETS)
+    return _PRESETS
+
+def preset_lookback(preset: str) -> Optional[int]:
+    expr = preset_exprs().get(preset)
+    return compile_exprs({"out": expr}).lookback if expr is not None else None
+
+def evaluate_preset(symbol: str, tf: str, preset: str = "scalp", latest_only: bool = False) -> pd.Series:
+    exprs = preset_exprs()
+    if preset not in exprs: return pd.Series([], dtype=bool)
+    return evaluate_expr(symbol, tf, exprs[preset], latest_only=latest_only)
@@ -1,51 +1,75 @@
 
+import numpy as np
 import pandas as pd
-from typing import Dict, Callable
-from sqlalchemy import select
-from app.core.db import get_session, Candle
-from app.core.indicators import rsi, macd, obv, sma, ema, golden_cross, volume_spike
-
-ConditionFunc = Callable[[pd.DataFrame], pd.Series]
-
-def _to_df(rows):
-    df = pd.DataFrame([{
-        "ts": r.ts, "open": r.open, "high": r.high, "low": r.low, "close": r.close, "vol": r.vol
-    } for r in rows]).sort_values("ts").reset_index(drop=True)
-    return df
-
-def load_df(symbol: str, tf: str) -> pd.DataFrame:
-    with get_session() as s:
-        rows = s.execute(select(Candle).where(Candle.symbol==symbol, Candle.tf==tf).order_by(Candle.ts)).scalars().all()
-    return _to_df(rows)
-
-def cond_volume_spike(df: pd.DataFrame) -> pd.Series:
-    return volume_spike(df["vol"], 20, 2.0)
-
-def cond_short_golden(df: pd.DataFrame) -> pd.Series:
-    short = ema(df["close"], 5); long = ema(df["close"], 20)
-    return golden_cross(short, long)
-
-def cond_day_cross(df: pd.DataFrame) -> pd.Series:
-    short = sma(df["close"], 10); long = sma(df["close"], 60)
-    return golden_cross(short, long)
-
-def cond_mid_trend(df: pd.DataFrame) -> pd.Series:
-    m, s, _ = macd(df["close"])
-    return (m > s)
-
-def build_presets() -> Dict[str, Dict[str, ConditionFunc]]:
-    return {
-        "scalp": {"volume_spike": cond_volume_spike, "short_gc": cond_short_golden},
-        "day":   {"day_gc": cond_day_cross},
-        "mid":   {"mid_trend": cond_mid_trend},
-    }
-
-def evaluate(symbol: str, tf: str, preset: str = "scalp") -> pd.Series:
-    df = load_df(symbol, tf)
-    conds = build_presets().get(preset, {})
-    if df.empty or not conds: return pd.Series([], dtype=bool)
-    signals = None
-    for name, fn in conds.items():
-        s = fn(df).fillna(False)
-        signals = s if signals is None else (signals & s)
-    return signals if signals is not None else pd.Series([False]*len(df))
+from typing import Dict, Optional
+from app.core.db import engine
+from app.core.archive import CandleArchive
+from app.core.bar_cache import BarCache
+from app.core.config import get
+
+CANDLE_COLS = ("ts", "open", "high", "low", "close", "vol")
+CANDLE_DTYPE = np.dtype([("ts", np.int64)] + [(c, np.float64) for c in CANDLE_COLS[1:]])
+
+def load_arrays(symbol: str, tf: str, since_ts: Optional[int] = None, last_n: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Columnar candle read: archive first, then any bars still only in SQLite (newer than the archive, or
+    older history a write has not yet backfilled)."""
+    arc = CandleArchive(symbol, tf)
+    first, last = arc.first_ts(), arc.last_ts()
+    if last is None:
+        return _load_sqlite(symbol, tf, since_ts, last_n)
+    cols = arc.read(since_ts, last_n)
+    tail = _load_sqlite(symbol, tf, max(last + 1, since_ts or 0), last_n)
+    need = int(last_n) - len(cols["ts"]) - len(tail["ts"]) if last_n else None
+    head = _load_sqlite(symbol, tf, since_ts, need, until_ts=first - 1) if need is None or need > 0 else None
+    parts = [p for p in (head, cols, tail) if p is not None and len(p["ts"])]
+    if len(parts) > 1:
+        cols = {c: np.concatenate([p[c] for p in parts]) for c in CANDLE_COLS}
+        if last_n: cols = {c: a[-int(last_n):] for c, a in cols.items()}
+    return cols
+
+def _load_sqlite(symbol: str, tf: str, since_ts: Optional[int] = None, last_n: Optional[int] = None,
+                 until_ts: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Straight off the DBAPI cursor, ascending by ts (served by uq_candle)."""
+    sql = "SELECT ts, open, high, low, close, vol FROM candles WHERE symbol=? AND tf=?"
+    params = [symbol, tf]
+    if since_ts is not None:
+        sql += " AND ts>=?"; params.append(int(since_ts))
+    if until_ts is not None:
+        sql += " AND ts<=?"; params.append(int(until_ts))
+    if last_n:
+        sql += " ORDER BY ts DESC LIMIT ?"; params.append(int(last_n))
+    else:
+        sql += " ORDER BY ts"
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor(); cur.execute(sql, params); rows = cur.fetchall(); cur.close()
+    finally:
+        conn.close()
+    rec = np.array(rows, dtype=CANDLE_DTYPE)
+    if last_n: rec = rec[::-1]
+    return {c: np.ascontiguousarray(rec[c]) for c in CANDLE_COLS}
+
+# Newest bars per (symbol, tf) shared by the trade engine, scorer and screener; data_manager appends on ingest.
+BAR_CACHE = BarCache(load_arrays, capacity=int(get("bar_cache_bars", 1024)),
+                     max_bytes=int(get("bar_cache_mb", 64)) << 20)
+
+def load_recent(symbol: str, tf: str, last_n: int) -> Dict[str, np.ndarray]:
+    return BAR_CACHE.get(symbol, tf, int(last_n))
+
+def load_df(symbol: str, tf: str, since_ts: Optional[int] = None, last_n: Optional[int] = None,
+            cached: bool = False) -> pd.DataFrame:
+    """``cached`` serves a plain last_n tail from BAR_CACHE."""
+    if cached and last_n and since_ts is None:
+        return pd.DataFrame(load_recent(symbol, tf, last_n), columns=list(CANDLE_COLS))
+    return pd.DataFrame(load_arrays(symbol, tf, since_ts=since_ts, last_n=last_n), columns=list(CANDLE_COLS))
+
+# Presets are condition_dsl expressions stored in condition_presets (edited on the Conditions tab). The DSL reads
+# candles through this module, so it is imported where used.
+def preset_lookback(preset: str) -> Optional[int]:
+    from app.services.condition_dsl import preset_lookback as lookback
+    return lookback(preset)
+
+def evaluate(symbol: str, tf: str, preset: str = "scalp", latest_only: bool = False) -> pd.Series:
+    """The preset's signal; ``latest_only`` evaluates just its lookback tail (only the last value is exact)."""
+    from app.services.condition_dsl import evaluate_preset
+    return evaluate_preset(symbol, tf, preset, latest_only=latest_only)
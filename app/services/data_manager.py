@@ -1,16 +1,35 @@
 
+import os, queue, threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from datetime import datetime
+from itertools import repeat
 import numpy as np
 import pandas as pd
-from typing import List
-from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy import select
-from app.core.db import get_session, Candle, InvestorFlow
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.core.db import raw_transaction
+from app.core.archive import CandleArchive
+from app.services.condition_engine import load_arrays, BAR_CACHE, CANDLE_COLS, CANDLE_DTYPE
+from app.services.features import note_write
+from app.core.config import get
 from app.core.utils import get_logger
 
 log = get_logger("data_manager")
 
+SQLITE_RECENT_BARS = int(get("sqlite_recent_bars", 5000) or 0)
+
 TF_MINUTES = {"1m":1, "3m":3, "15m":15, "60m":60, "1d": 60*24}
+KST_OFFSET_MS = 9*60*60*1000
+SESSION_OPEN_MS = 9*60*60*1000   # KRX regular session opens 09:00 KST
+DAY_MS = 24*60*60*1000
+
+def bucket_start(ts, tf: str):
+    """Start (epoch ms) of the tf bar containing ts. Intraday bars are anchored at the 09:00 KST open,
+    daily bars at KST midnight. Works elementwise on int64 arrays."""
+    day = (ts + KST_OFFSET_MS) // DAY_MS * DAY_MS - KST_OFFSET_MS
+    if tf == "1d": return day
+    step = TF_MINUTES[tf]*60*1000
+    open_ = day + SESSION_OPEN_MS
+    return open_ + (ts - open_) // step * step
 
 def _gen_dummy_ohlcv(start_ts: int, periods: int, tf: str, seed: int = 42):
     np.random.seed(seed)
@@ -26,57 +45,265 @@ def _gen_dummy_ohlcv(start_ts: int, periods: int, tf: str, seed: int = 42):
     df = pd.DataFrame({"ts": ts, "open":open_, "high":high, "low":low, "close":close, "vol":vol})
     return df
 
-def _bulk_upsert_candles(df: pd.DataFrame, symbol: str, tf: str, chunk: int = 20000):
+OHLCV = ("open","high","low","close","vol")
+CANDLE_INSERT = "INSERT OR IGNORE INTO candles (symbol, tf, ts, open, high, low, close, vol) VALUES (?,?,?,?,?,?,?,?)"
+CANDLE_UPSERT = (CANDLE_INSERT.replace("OR IGNORE ", "") + " ON CONFLICT(symbol, tf, ts) DO UPDATE SET "
+                 + ", ".join(f"{c}=excluded.{c}" for c in OHLCV))
+FLOW_INSERT = "INSERT OR IGNORE INTO investor_flows (symbol, ts, foreigner, institution, retail) VALUES (?,?,?,?,?)"
+META_UPSERT = ("INSERT INTO candle_archives (symbol, tf, rows, first_ts, last_ts, updated_at) VALUES (?,?,?,?,?,?) "
+               "ON CONFLICT(symbol, tf) DO UPDATE SET rows=excluded.rows, first_ts=excluded.first_ts, "
+               "last_ts=excluded.last_ts, updated_at=excluded.updated_at")
+WATERMARK_UPSERT = ("INSERT INTO ingest_watermarks (symbol, tf, last_ts, updated_at) VALUES (?,?,?,?) "
+                    "ON CONFLICT(symbol, tf) DO UPDATE SET last_ts=MAX(last_ts, excluded.last_ts), updated_at=excluded.updated_at")
+PRUNE = ("DELETE FROM candles WHERE symbol=? AND tf=? AND ts < ("
+         "SELECT ts FROM candles WHERE symbol=? AND tf=? ORDER BY ts DESC LIMIT 1 OFFSET ?)")
+
+def _candle_rows(symbol: str, tf: str, df: pd.DataFrame):
+    """Row tuples streamed straight from the column arrays (no per-row dicts)."""
+    ts = df["ts"].to_numpy(dtype=np.int64).tolist()
+    return zip(repeat(symbol), repeat(tf), ts, *(df[c].to_numpy(dtype=np.float64).tolist() for c in OHLCV))
+
+def _bulk_upsert_candles(df: pd.DataFrame, symbol: str, tf: str, replace: bool = False, cur=None):
+    """INSERT OR IGNORE by default; ``replace`` overwrites existing (symbol, tf, ts) bars (rollup buckets).
+    Runs in one raw transaction, or in the caller's when ``cur`` is given."""
     if df.empty: return 0
-    df = df.copy(); df["symbol"] = symbol; df["tf"] = tf
+    recent = df
+    if 0 < SQLITE_RECENT_BARS < len(df):  # older rows would be pruned right away; the archive keeps them
+        cutoff = np.partition(df["ts"].to_numpy(), len(df) - SQLITE_RECENT_BARS)[len(df) - SQLITE_RECENT_BARS]
+        recent = df[df["ts"].to_numpy() >= cutoff]
+    with raw_transaction(cur) as cur:
+        cur.executemany(CANDLE_UPSERT if replace else CANDLE_INSERT, _candle_rows(symbol, tf, recent))
+        _archive_candles(df, symbol, tf, replace=replace, cur=cur)
+        _advance_watermark(cur, symbol, tf, int(df["ts"].max()))
+    BAR_CACHE.append(symbol, tf, {c: df[c].to_numpy() for c in ("ts",) + OHLCV}, replace=replace)
+    note_write(symbol, tf)
+    return len(df)
+
+def upsert_bars(rows: Sequence[Tuple]) -> int:
+    """Insert closed bars (symbol, tf, ts, open, high, low, close, vol) for any mix of series in one transaction."""
+    if not rows: return 0
     keys = ["symbol","tf","ts","open","high","low","close","vol"]
-    total = 0
-    with get_session() as s:
-        for i in range(0, len(df), chunk):
-            part = df.iloc[i:i+chunk][keys]
-            stmt = sqlite_insert(Candle.__table__).values(part.to_dict("records")).prefix_with("OR IGNORE")
-            s.execute(stmt); s.commit(); total += len(part)
-    return total
-
-def initial_load(symbols: List[str], tfs: List[str] = ["1m","3m","15m","60m","1d"], years: int = 2):
+    df = pd.DataFrame(list(rows), columns=keys)
+    with raw_transaction() as cur:
+        cur.executemany(CANDLE_INSERT, rows)
+        for (sym, tf), part in df.groupby(["symbol","tf"], sort=False):
+            _archive_candles(part, sym, tf, cur=cur)
+            _advance_watermark(cur, sym, tf, int(part["ts"].max()))
+    for (sym, tf), part in df.groupby(["symbol","tf"], sort=False):
+        BAR_CACHE.append(sym, tf, {c: part[c].to_numpy() for c in ("ts",) + OHLCV})
+        note_write(sym, tf)
+    return len(df)
+
+def _now_str() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _advance_watermark(cur, symbol: str, tf: str, last_ts: int):
+    cur.execute(WATERMARK_UPSERT, (symbol, tf, last_ts, _now_str()))
+
+# (symbol, tf, newest ts) of series without a watermark row: candles series are found by stepping the uq_candle
+# index from one series to the next (a few seeks per series, not a scan of every bar), plus archive meta rows
+MISSING_WATERMARKS = (
+    "WITH RECURSIVE syms(symbol) AS ("
+    " SELECT MIN(symbol) FROM candles"
+    " UNION ALL SELECT (SELECT MIN(symbol) FROM candles WHERE symbol > y.symbol) FROM syms y WHERE y.symbol IS NOT NULL),"
+    " series(symbol, tf) AS ("
+    " SELECT symbol, (SELECT MIN(tf) FROM candles WHERE symbol = y.symbol) FROM syms y WHERE y.symbol IS NOT NULL"
+    " UNION ALL SELECT symbol, (SELECT MIN(tf) FROM candles WHERE symbol = s.symbol AND tf > s.tf) FROM series s"
+    " WHERE s.tf IS NOT NULL)"
+    " SELECT symbol, tf, (SELECT MAX(ts) FROM candles WHERE symbol = s.symbol AND tf = s.tf) AS last_ts FROM series s"
+    " WHERE tf IS NOT NULL AND NOT EXISTS (SELECT 1 FROM ingest_watermarks w WHERE w.symbol = s.symbol AND w.tf = s.tf)"
+    " UNION ALL SELECT symbol, tf, last_ts FROM candle_archives a WHERE last_ts IS NOT NULL"
+    " AND NOT EXISTS (SELECT 1 FROM ingest_watermarks w WHERE w.symbol = a.symbol AND w.tf = a.tf)")
+
+def watermarks(tf: Optional[str] = None) -> Dict[Tuple[str, str], int]:
+    """(symbol, tf) -> newest ingested ts, in one query. Series with candles or archive meta but no watermark row
+    (written before the table existed, or by another writer) are backfilled first."""
+    sql = "SELECT symbol, tf, last_ts FROM ingest_watermarks" + (" WHERE tf=?" if tf else "")
+    params = (tf,) if tf else ()
+    with raw_transaction() as cur:
+        cur.execute("INSERT INTO ingest_watermarks (symbol, tf, last_ts, updated_at) "
+                    f"SELECT symbol, tf, MAX(last_ts), ? FROM ({MISSING_WATERMARKS}) GROUP BY symbol, tf", (_now_str(),))
+        rows = cur.execute(sql, params).fetchall()
+    return {(sym, t): int(ts) for sym, t, ts in rows}
+
+def _insert_flows(flows: pd.DataFrame, cur=None) -> int:
+    if flows.empty: return 0
+    with raw_transaction(cur) as cur:
+        cur.executemany(FLOW_INSERT, zip(flows["symbol"].tolist(), flows["ts"].to_numpy(dtype=np.int64).tolist(),
+                                         *(flows[c].to_numpy(dtype=np.float64).tolist() for c in ("foreigner","institution","retail"))))
+    return len(flows)
+
+def _sqlite_history(cur, symbol: str, tf: str, before_ts: Optional[int]) -> Dict[str, np.ndarray]:
+    sql = "SELECT ts, open, high, low, close, vol FROM candles WHERE symbol=? AND tf=?"
+    params = [symbol, tf]
+    if before_ts is not None:
+        sql += " AND ts<?"; params.append(int(before_ts))
+    rec = np.array(cur.execute(sql + " ORDER BY ts", params).fetchall(), dtype=CANDLE_DTYPE)
+    return {c: rec[c] for c in CANDLE_COLS}
+
+def _archive_candles(df: pd.DataFrame, symbol: str, tf: str, replace: bool = False, cur=None):
+    """Write bars through to the columnar archive, then trim SQLite down to the recent window.
+
+    SQLite bars older than the archive's first bar (history from before the archive existed) are copied in
+    first, and nothing is pruned unless the archive reaches back at least as far as SQLite does."""
+    arc = CandleArchive(symbol, tf)
+    new = {c: df[c].to_numpy() for c in CANDLE_COLS}
+    with raw_transaction(cur) as cur:
+        oldest = cur.execute("SELECT MIN(ts) FROM candles WHERE symbol=? AND tf=?", (symbol, tf)).fetchone()[0]
+        first = arc.first_ts()
+        if oldest is not None and (first is None or oldest < first):
+            hist = _sqlite_history(cur, symbol, tf, first)  # first occurrence wins in write(): stored bars unless replace
+            n_old = int(np.isin(hist["ts"], new["ts"], invert=True).sum())
+            new = {c: np.concatenate([new[c], hist[c]] if replace else [hist[c], new[c]]) for c in CANDLE_COLS}
+            if n_old: log.info(f"Backfilling {n_old} SQLite-only bars of {symbol} {tf} into the archive.")
+        arc.write(new, replace=replace)
+        rows = len(arc); first_ts, last_ts = arc.first_ts(), arc.last_ts()
+        cur.execute(META_UPSERT, (symbol, tf, rows, first_ts, last_ts, _now_str()))
+        if SQLITE_RECENT_BARS > 0 and first_ts is not None and (oldest is None or first_ts <= oldest):
+            cur.execute(PRUNE, (symbol, tf, symbol, tf, SQLITE_RECENT_BARS - 1))
+
+# ---------- rollups: higher timeframes derived from 1m ----------
+ROLLUP_TFS = ("3m","15m","60m","1d")
+
+def resample_ohlcv(cols: Dict[str, np.ndarray], tf: str) -> pd.DataFrame:
+    """Vectorized OHLCV rollup of ascending 1m columns into tf buckets (see bucket_start)."""
+    ts = np.asarray(cols["ts"], dtype=np.int64)
+    if not len(ts):
+        return pd.DataFrame(columns=["ts","open","high","low","close","vol"])
+    b = bucket_start(ts, tf)
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return pd.DataFrame({
+        "ts": b[starts],
+        "open": np.asarray(cols["open"])[starts],
+        "high": np.maximum.reduceat(np.asarray(cols["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(cols["low"], dtype=np.float64), starts),
+        "close": np.asarray(cols["close"])[ends],
+        "vol": np.add.reduceat(np.asarray(cols["vol"], dtype=np.float64), starts),
+    })
+
+def materialize_rollups(symbol: str, since_ts: Optional[int] = None, tfs: Sequence[str] = ROLLUP_TFS, cur=None) -> Dict[str, int]:
+    """Rebuild only the tf buckets touched by 1m bars at/after since_ts (all of them when None).
+    The 1m bars must already be committed; ``cur`` writes the buckets in the caller's transaction."""
+    out = {}
+    for tf in tfs:
+        start = None if since_ts is None else int(bucket_start(int(since_ts), tf))
+        bars = resample_ohlcv(load_arrays(symbol, "1m", since_ts=start), tf)
+        out[tf] = _bulk_upsert_candles(bars, symbol, tf, replace=True, cur=cur) if len(bars) else 0
+    return out
+
+def check_rollups(symbol: str, tfs: Sequence[str] = ROLLUP_TFS) -> Dict[str, Dict[str, int]]:
+    """Stored tf bars vs a fresh rollup of the full 1m history: missing/extra buckets and OHLCV mismatches."""
+    ref_1m = load_arrays(symbol, "1m"); report = {}
+    for tf in tfs:
+        ref = resample_ohlcv(ref_1m, tf).set_index("ts")
+        got = pd.DataFrame(load_arrays(symbol, tf)).set_index("ts")
+        both = ref.index.intersection(got.index)
+        cols = ["open","high","low","close","vol"]
+        bad = ~np.isclose(ref.loc[both, cols].to_numpy(), got.loc[both, cols].to_numpy()).all(axis=1)
+        report[tf] = {"buckets": len(ref), "missing": len(ref.index.difference(got.index)),
+                      "extra": len(got.index.difference(ref.index)), "mismatched": int(bad.sum())}
+    return report
+
+def _gen_symbol(sym: str, now: int, periods: int, derived: Sequence[str], years: int):
+    """Pool task: one symbol's 1m history, its rollups and investor flows, as column frames."""
+    start_ts = bucket_start(now, "1m") - periods*60*1000
+    df = _gen_dummy_ohlcv(start_ts, periods, "1m", seed=abs(hash(sym+"1m"))%(2**32))
+    cols = {c: df[c].to_numpy() for c in df.columns}
+    bars = {"1m": df}
+    for tf in derived: bars[tf] = resample_ohlcv(cols, tf)
+
+    # Investor flows: cap 500 days
+    periods_f = min(252*years, 500)
+    ts0 = now - periods_f*24*60*60*1000
+    flows = pd.DataFrame({
+        "symbol": sym,
+        "ts": [ts0 + i*24*60*60*1000 for i in range(periods_f)],
+        "foreigner": np.random.randint(-500,500, size=periods_f),
+        "institution": np.random.randint(-500,500, size=periods_f),
+        "retail": np.random.randint(-500,500, size=periods_f)
+    })
+    return sym, bars, flows
+
+def _write_symbol(sym: str, bars: Dict[str, pd.DataFrame], flows: pd.DataFrame):
+    with raw_transaction() as cur:  # the symbol's candles, archive meta and flows land together
+        for tf, df in bars.items():
+            # rollups were built from the freshly generated 1m bars, so they overwrite stale buckets
+            _bulk_upsert_candles(df, sym, tf, replace=(tf != "1m"), cur=cur)
+        _insert_flows(flows, cur)
+
+def initial_load(symbols: List[str], tfs: List[str] = ["1m","3m","15m","60m","1d"], years: int = 2,
+                 workers: Optional[int] = None, queue_size: int = 4, progress: Optional[Callable[[str], None]] = None):
+    """Generate 1m history per symbol and derive the other timeframes from it.
+
+    1m is always written whatever ``tfs`` says: it is the base every other timeframe is rolled up from, here
+    and by update_data/materialize_rollups. ``tfs`` picks the rollups written alongside it; progress and the
+    log name the timeframes actually written.
+
+    A process pool builds per-symbol column batches; a single writer thread owns every SQLite write, so the
+    database never sees lock contention. The bounded queue between them keeps memory flat when the writer lags.
+    """
     now = int(datetime.utcnow().timestamp()*1000)
     trading_minutes_per_year = 252 * 390
-    caps = {"1m":200_000, "3m":150_000, "15m":80_000, "60m":40_000, "1d":1_200}
-
-    for sym in symbols:
-        for tf in tfs:
-            step = TF_MINUTES[tf]
-            periods = max(200, (trading_minutes_per_year*years)//step)
-            periods = min(periods, caps.get(tf, periods))
-            start_ts = now - periods*step*60*1000
-            df = _gen_dummy_ohlcv(start_ts, periods, tf, seed=abs(hash(sym+tf))%(2**32))
-            _bulk_upsert_candles(df, sym, tf, chunk=20000)
-
-        # Investor flows: cap 500 days
-        periods = min(252*years, 500)
-        ts0 = now - periods*24*60*60*1000
-        flows = pd.DataFrame({
-            "symbol": sym,
-            "ts": [ts0 + i*24*60*60*1000 for i in range(periods)],
-            "foreigner": np.random.randint(-500,500, size=periods),
-            "institution": np.random.randint(-500,500, size=periods),
-            "retail": np.random.randint(-500,500, size=periods)
-        })
-        with get_session() as s:
-            for i in range(0, len(flows), 5000):
-                part = flows.iloc[i:i+5000]
-                stmt = sqlite_insert(InvestorFlow.__table__).values(part.to_dict("records")).prefix_with("OR IGNORE")
-                s.execute(stmt); s.commit()
-    log.info(f"Initial load completed for {len(symbols)} symbols.")
-
-def update_data(symbols: List[str], tfs: List[str] = ["1m","3m","15m","60m","1d"]):
+    periods = min(max(200, trading_minutes_per_year*years), 200_000)
+    derived = [tf for tf in dict.fromkeys(tfs) if tf != "1m"]
+    written = ", ".join(["1m", *derived])
+    workers = max(1, min(workers or os.cpu_count() or 1, len(symbols) or 1))
+    report = progress or (lambda msg: None)
+
+    batches: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    errors: List[BaseException] = []
+    def writer():
+        done = 0
+        while True:
+            item = batches.get()
+            if item is None: return
+            if errors: continue  # keep draining so producers never block on a dead writer
+            try:
+                _write_symbol(*item); done += 1
+                report(f"[{done}/{len(symbols)}] {item[0]} written ({written})")
+            except BaseException as e:
+                errors.append(e)
+    t = threading.Thread(target=writer, name="initial-load-writer", daemon=True); t.start()
+
+    try:
+        if workers == 1:
+            for sym in symbols: batches.put(_gen_symbol(sym, now, periods, derived, years))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                pending = set()
+                for sym in symbols:  # at most 2 batches per worker in flight
+                    pending.add(ex.submit(_gen_symbol, sym, now, periods, derived, years))
+                    if len(pending) >= workers*2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for f in finished: batches.put(f.result())
+                for f in as_completed(pending): batches.put(f.result())
+    finally:
+        batches.put(None); t.join()
+    if errors: raise errors[0]
+    log.info(f"Initial load completed for {len(symbols)} symbols ({written}).")
+
+def plan_updates(symbols: Sequence[str], tf: str = "1m") -> List[Tuple[str, int]]:
+    """(symbol, last_ts) for every symbol that has tf history, from the watermark table."""
+    marks = watermarks(tf)
+    return [(sym, marks[(sym, tf)]) for sym in symbols if (sym, tf) in marks]
+
+def update_data(symbols: List[str], tfs: List[str] = ["1m","3m","15m","60m","1d"], batch: int = 50):
+    """Append 1m bars and re-roll only the higher-tf buckets they touch.
+
+    All gaps are planned up front from the watermarks; each batch of symbols is written in one transaction,
+    then its rollups in another.
+    """
     add_bars = 300
-    for sym in symbols:
-        for tf in tfs:
-            step = TF_MINUTES[tf]
-            with get_session() as s:
-                last_ts = s.execute(select(Candle.ts).where(Candle.symbol==sym, Candle.tf==tf).order_by(Candle.ts.desc())).scalars().first()
-            if not last_ts: continue
-            df = _gen_dummy_ohlcv(last_ts + step*60*1000, add_bars, tf, seed=abs(hash(sym+tf+"upd"))%(2**32))
-            _bulk_upsert_candles(df, sym, tf, chunk=20000)
-    log.info(f"Update completed for {len(symbols)} symbols.")
+    derived = [tf for tf in tfs if tf != "1m"]
+    plan = plan_updates(symbols)
+    for i in range(0, len(plan), batch):
+        part = plan[i:i+batch]; first = {}
+        with raw_transaction() as cur:
+            for sym, last_ts in part:
+                df = _gen_dummy_ohlcv(last_ts + 60*1000, add_bars, "1m", seed=abs(hash(sym+"1m"+"upd"))%(2**32))
+                _bulk_upsert_candles(df, sym, "1m", cur=cur); first[sym] = int(df["ts"].iloc[0])
+        if derived:
+            with raw_transaction() as cur:
+                for sym, since in first.items(): materialize_rollups(sym, since_ts=since, tfs=derived, cur=cur)
+    log.info(f"Update completed for {len(plan)}/{len(symbols)} symbols.")
@@ -0,0 +1,200 @@
+
+import copy, heapq, itertools, json, random, threading, time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+Fill = Tuple[str, str, float, int]  # taker order_id, maker order_id, price, qty
+
+@dataclass
+class SimOrder:
+    symbol: str
+    side: str                      # BUY / SELL, or CANCEL for the resting order with this order_id
+    qty: int
+    price: Optional[float] = None  # None = market (always IOC)
+    tif: str = "GTC"               # GTC rests the unfilled remainder, IOC cancels it
+    owner: str = "flow"
+    order_id: str = ""
+    ts: int = 0
+
+@dataclass
+class Execution:
+    order_id: str
+    status: str        # FILLED / PARTIAL / NEW (resting, nothing filled) / CANCELED (IOC, nothing filled) / REJECTED
+    filled: int = 0
+    avg_price: float = 0.0
+    fills: List[Fill] = field(default_factory=list)
+    reason: str = ""
+
+class MatchingBook:
+    """One symbol's limit order book with price-time priority.
+
+    Each side maps price -> FIFO of [order_id, qty, owner] entries, with a heap of its prices for the best level.
+    Cancels zero an entry in place; empty entries and levels are skipped lazily when they reach the front.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.levels: Tuple[Dict[float, deque], Dict[float, deque]] = ({}, {})  # BUY, SELL
+        self.heaps: Tuple[List[float], List[float]] = ([], [])                  # -bid prices, ask prices
+        self.live: Dict[str, list] = {}
+
+    def best(self, s: int) -> Tuple[Optional[float], Optional[deque]]:
+        heap = self.heaps[s]; levels = self.levels[s]
+        while heap:
+            p = -heap[0] if s == 0 else heap[0]
+            q = levels.get(p)
+            if q is not None:
+                while q and q[0][1] <= 0: q.popleft()
+                if q: return p, q
+                del levels[p]
+            heapq.heappop(heap)
+        return None, None
+
+    def match(self, o: SimOrder) -> Tuple[List[Fill], int]:
+        """Fill o against the opposite side as far as its limit allows; returns (fills, unfilled qty)."""
+        s = 1 if o.side == "BUY" else 0
+        fills: List[Fill] = []; left = o.qty; limit = o.price
+        while left:
+            p, q = self.best(s)
+            if p is None or (limit is not None and (p > limit if s == 1 else p < limit)): break
+            entry = q[0]; n = left if left < entry[1] else entry[1]
+            entry[1] -= n; left -= n
+            fills.append((o.order_id, entry[0], p, n))
+            if not entry[1]:
+                q.popleft(); self.live.pop(entry[0], None)
+        return fills, left
+
+    def rest(self, o: SimOrder, qty: int):
+        s = 0 if o.side == "BUY" else 1
+        q = self.levels[s].get(o.price)
+        if q is None:
+            q = self.levels[s][o.price] = deque()
+            heapq.heappush(self.heaps[s], -o.price if s == 0 else o.price)
+        entry = [o.order_id, qty, o.owner]; q.append(entry); self.live[o.order_id] = entry
+
+    def cancel(self, order_id: str) -> int:
+        entry = self.live.pop(order_id, None)
+        if entry is None: return 0
+        n = entry[1]; entry[1] = 0
+        return n
+
+    def depth(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(2, n) price and qty arrays, ASK row then BID row, best level first (OrderBooks layout)."""
+        px = np.zeros((2, n)); qty = np.zeros((2, n))
+        for row, s, pick in ((0, 1, heapq.nsmallest), (1, 0, heapq.nlargest)):
+            sizes = {p: sum(e[1] for e in q) for p, q in self.levels[s].items()}
+            for i, p in enumerate(pick(n, (p for p, v in sizes.items() if v > 0))):
+                px[row, i] = p; qty[row, i] = sizes[p]
+        return px, qty
+
+class ExchangeSim:
+    """Local exchange: a MatchingBook per symbol, order validation, simulated latency and rejects.
+
+    Every submitted order is appended to ``flow`` (with its assigned id and timestamp), so a session can be
+    saved and replayed into a fresh simulator with identical executions. ``on_trade`` callbacks receive
+    (symbol, ts, last price, qty) after each order that traded.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, reject_rate: float = 0.0, tick: float = 0.0,
+                 max_qty: int = 1_000_000, seed: int = 0, record: bool = True):
+        self.latency = latency; self.jitter = jitter; self.reject_rate = reject_rate
+        self.tick = tick; self.max_qty = max_qty; self.record = record
+        self.books: Dict[str, MatchingBook] = {}
+        self.flow: List[SimOrder] = []
+        self.on_trade: List[Callable[[str, int, float, int], None]] = []
+        self.stats = {"orders": 0, "fills": 0, "filled_qty": 0, "rejected": 0, "canceled": 0, "resting": 0, "cancels": 0}
+        self._rng = random.Random(seed); self._latency_rng = random.Random(seed + 1)
+        self._ids = itertools.count(1); self._lock = threading.Lock()
+
+    def book(self, symbol: str) -> MatchingBook:
+        b = self.books.get(symbol)
+        if b is None: b = self.books[symbol] = MatchingBook(symbol)
+        return b
+
+    def _check(self, o: SimOrder) -> str:
+        if o.side not in ("BUY", "SELL"): return "invalid side"
+        if o.qty <= 0 or o.qty > self.max_qty: return "invalid qty"
+        if o.price is not None:
+            if o.price <= 0: return "invalid price"
+            if self.tick and abs(o.price / self.tick - round(o.price / self.tick)) > 1e-9: return "price off tick"
+        if self.reject_rate and self._rng.random() < self.reject_rate: return "rejected by exchange"
+        return ""
+
+    def submit(self, o: SimOrder) -> Execution:
+        if self.latency or self.jitter: time.sleep(self.latency + self._latency_rng.uniform(0.0, self.jitter))
+        with self._lock:
+            if not o.order_id: o.order_id = f"X{next(self._ids)}"
+            if not o.ts: o.ts = int(time.time() * 1000)
+            if o.price is not None: o.price = round(o.price, 9)  # one float key per price level (107.1 vs 107.10000000000001)
+            if self.record: self.flow.append(o)
+            self.stats["orders"] += 1
+            if o.side == "CANCEL":
+                n = self.book(o.symbol).cancel(o.order_id)
+                self.stats["cancels" if n else "rejected"] += 1
+                return Execution(o.order_id, "CANCELED", 0) if n else Execution(o.order_id, "REJECTED", reason="unknown order")
+            reason = self._check(o)
+            if reason:
+                self.stats["rejected"] += 1
+                return Execution(o.order_id, "REJECTED", reason=reason)
+            book = self.book(o.symbol)
+            fills, left = book.match(o)
+            if left and o.price is not None and o.tif == "GTC":
+                book.rest(o, left); self.stats["resting"] += 1
+                status = "PARTIAL" if fills else "NEW"
+            elif left:
+                self.stats["canceled"] += 1
+                status = "PARTIAL" if fills else "CANCELED"
+            else:
+                status = "FILLED"
+            filled = o.qty - left
+            avg = sum(f[2] * f[3] for f in fills) / filled if filled else 0.0
+            self.stats["fills"] += len(fills); self.stats["filled_qty"] += filled
+        if fills:
+            for cb in self.on_trade: cb(o.symbol, o.ts, fills[-1][2], filled)
+        return Execution(o.order_id, status, filled, avg, fills)
+
+    def cancel(self, symbol: str, order_id: str) -> Execution:
+        return self.submit(SimOrder(symbol, "CANCEL", 0, order_id=order_id))
+
+    def seed_book(self, symbol: str, mid: float, levels: int = 10, step: float = 10.0, qty: int = 500):
+        """Resting liquidity on both sides around mid, for sessions without historical flow."""
+        if self.tick: mid = round(mid / self.tick) * self.tick
+        for i in range(levels):
+            self.submit(SimOrder(symbol, "SELL", qty, mid + step * (i + 1), owner="seed"))
+            self.submit(SimOrder(symbol, "BUY", qty, mid - step * (i + 1), owner="seed"))
+
+def replay_flow(flow: Iterable[SimOrder], **kwargs) -> List[Execution]:
+    """Feed a recorded flow into a fresh simulator (no latency); ids and timestamps are kept, so executions repeat."""
+    sim = ExchangeSim(record=False, **kwargs)
+    return [sim.submit(copy.copy(o)) for o in flow]
+
+def save_flow(path, flow: Iterable[SimOrder]):
+    with open(path, "w", encoding="utf-8") as f:
+        for o in flow: f.write(json.dumps(vars(o), separators=(",", ":")) + "\n")
+
+def load_flow(path) -> List[SimOrder]:
+    return [SimOrder(**json.loads(line)) for line in Path(path).read_text(encoding="utf-8").splitlines() if line]
+
+def flow_from_candles(symbol: str, cols: Dict[str, np.ndarray], orders_per_bar: int = 20, tick: float = 1.0,
+                      seed: int = 0) -> Iterator[SimOrder]:
+    """Order flow implied by stored candles. Per bar: makers pull last bar's unfilled quotes and quote afresh
+    around the close (up to a quarter of the bar's range away), then takers send market orders sized from
+    the bar's volume."""
+    rng = np.random.default_rng(seed); quotes: List[str] = []
+    n_quotes = int(orders_per_bar * 0.7)
+    for b, (ts, lo, hi, c, v) in enumerate(zip(*(cols[k].tolist() for k in ("ts", "low", "high", "close", "vol")))):
+        ts = int(ts); spread = max(tick, (hi - lo) / 4.0); per = max(1, int(v / orders_per_bar))
+        for oid in quotes: yield SimOrder(symbol, "CANCEL", 0, order_id=oid, ts=ts)
+        quotes = []
+        for i in range(orders_per_bar):
+            side = "BUY" if rng.random() < 0.5 else "SELL"; oid = f"{symbol}-{b}-{i}"
+            if i < n_quotes:
+                off = tick + rng.random() * spread
+                px = round((c - off if side == "BUY" else c + off) / tick) * tick
+                quotes.append(oid)
+                yield SimOrder(symbol, side, per, float(px), order_id=oid, ts=ts + i)
+            else:
+                yield SimOrder(symbol, side, max(1, per // 2), None, "IOC", order_id=oid, ts=ts + i)
@@ -0,0 +1,130 @@
+
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+import pandas as pd
+from app.core.config import get
+from app.core.indicators import ema, sma, rsi, macd, obv, volume_spike
+
+# Named indicators shared by the evaluators; each is computed at most once per FeatureFrame.
+FEATURES: Dict[str, Callable[["FeatureFrame"], object]] = {
+    "ema5":         lambda f: ema(f["close"], 5),
+    "ema20":        lambda f: ema(f["close"], 20),
+    "sma20":        lambda f: sma(f["close"], 20),
+    "sma50":        lambda f: sma(f["close"], 50),
+    "rsi14":        lambda f: rsi(f["close"], 14),
+    "macd_all":     lambda f: macd(f["close"]),
+    "macd":         lambda f: f["macd_all"][0],
+    "macd_signal":  lambda f: f["macd_all"][1],
+    "obv":          lambda f: obv(f["close"], f["vol"]),
+    "volume_spike": lambda f: volume_spike(f["vol"], 20, 2.0),
+    "atr14":        lambda f: (f["high"] - f["low"]).rolling(14).mean(),
+    "high20":       lambda f: f["high"].rolling(20).max(),
+    "low20":        lambda f: f["low"].rolling(20).min(),
+    "high390_prev": lambda f: f["high"].rolling(390).max().shift(1),
+    "low390_prev":  lambda f: f["low"].rolling(390).min().shift(1),
+}
+
+STATS = {"computed": 0, "hits": 0, "frames": 0, "frame_hits": 0}
+
+def uses(*features: str, lookback: int = None):
+    """Declare the FEATURES an evaluator reads and how many trailing bars its last value depends on.
+
+    EMA-based items are given ~5x their span so the truncated recursion has converged.
+    """
+    def deco(fn):
+        fn.features = features; fn.lookback = lookback
+        return fn
+    return deco
+
+def required_lookback(funcs) -> int:
+    """Tail window that reproduces the last bar of every func; None if any needs full history."""
+    lbs = [getattr(f, "lookback", None) for f in funcs]
+    if not lbs or any(lb is None for lb in lbs): return None
+    return max(lbs)
+
+def _nbytes(val) -> int:
+    if isinstance(val, tuple): return sum(_nbytes(v) for v in val)
+    return int(getattr(val, "nbytes", 0))
+
+class FeatureFrame:
+    """Candle columns plus lazily computed, memoized FEATURES."""
+    def __init__(self, df: pd.DataFrame):
+        self.df = df; self._cache: Dict[str, object] = {}; self.computed = 0
+
+    def __len__(self): return len(self.df)
+
+    @property
+    def index(self): return self.df.index
+
+    def __getitem__(self, name: str):
+        if name in self._cache:
+            STATS["hits"] += 1; return self._cache[name]
+        if name in self.df.columns: return self.df[name]
+        val = self._cache[name] = FEATURES[name](self)
+        self.computed += 1; STATS["computed"] += 1
+        return val
+
+    @property
+    def nbytes(self) -> int:
+        """Candle columns plus every feature computed so far (features grow the frame after it is memoized)."""
+        return int(self.df.memory_usage(index=True).sum()) + sum(_nbytes(v) for v in self._cache.values())
+
+    def prefetch(self, names):
+        for n in names: self[n]
+        return self
+
+OHLCV = ("open", "high", "low", "close", "vol")
+
+_FRAMES: "OrderedDict[Tuple, FeatureFrame]" = OrderedDict()
+MAX_FRAMES = 64
+MAX_FRAME_BYTES = int(get("feature_cache_mb", 256)) << 20  # full-history frames run to tens of MB each
+
+_WRITES: Dict[Tuple[str, str], int] = {}  # (symbol, tf) -> candle writes in this process
+
+def note_write(symbol: str, tf: str):
+    """Called by the candle writers after every write to the series."""
+    _WRITES[(symbol, tf)] = _WRITES.get((symbol, tf), 0) + 1
+
+def data_version(symbol: str, tf: str, df: pd.DataFrame) -> Tuple:
+    """Write count of the series plus length, end timestamps and the last bar's OHLCV, so a rewritten bar
+    (a forming bar's update, a rollup replace) never reuses a frame built from the old values."""
+    n = _WRITES.get((symbol, tf), 0)
+    if df.empty: return (n, 0)
+    ts = df["ts"].to_numpy()
+    return (n, len(ts), int(ts[0]), int(ts[-1])) + tuple(float(df[c].to_numpy()[-1]) for c in OHLCV if c in df.columns)
+
+# FEATURES served by the streaming IndicatorState (app.core.streaming), by snapshot key
+STREAMED = {"ema5": "ema5", "ema20": "ema20", "sma20": "sma20", "sma50": "sma50", "rsi14": "rsi", "macd": "macd",
+            "macd_signal": "macd_signal", "obv": "obv", "atr14": "atr14", "high20": "high20", "low20": "low20"}
+STREAMED_FEATURES = frozenset(STREAMED) | {"macd_all", "volume_spike", "high390_prev", "low390_prev"}
+
+def streamed_frame(state) -> FeatureFrame:
+    """FeatureFrame over a streaming state's last two bars with its features taken from the state, not
+    recomputed: exact for the newest bar's value and one-bar shifts, which is what score_last reads."""
+    rows = list(state.rows)
+    df = pd.DataFrame([bar for bar, _ in rows], columns=["ts", *OHLCV])
+    col = lambda key, dtype=float: pd.Series([snap[key] for _, snap in rows], index=df.index, dtype=dtype)
+    ff = FeatureFrame(df); c = ff._cache
+    for name, key in STREAMED.items(): c[name] = col(key)
+    c["macd_all"] = (c["macd"], c["macd_signal"], col("macd_hist"))
+    c["volume_spike"] = col("volume_spike", bool)
+    c["high390_prev"] = col("high390").shift(1); c["low390_prev"] = col("low390").shift(1)
+    return ff
+
+def feature_frame(symbol: str, tf: str, df: pd.DataFrame) -> FeatureFrame:
+    """Shared frame per (symbol, tf, data version), so profiles scoring the same bars reuse features."""
+    key = (symbol, tf) + data_version(symbol, tf, df)
+    ff = _FRAMES.get(key)
+    if ff is not None:
+        _FRAMES.move_to_end(key); STATS["frame_hits"] += 1
+        return ff
+    ff = _FRAMES[key] = FeatureFrame(df); STATS["frames"] += 1
+    _evict()
+    return ff
+
+def _evict():
+    """Drop least recently used frames past MAX_FRAMES or MAX_FRAME_BYTES; the newest frame is always kept."""
+    while len(_FRAMES) > MAX_FRAMES: _FRAMES.popitem(last=False)
+    total = sum(f.nbytes for f in _FRAMES.values())
+    while len(_FRAMES) > 1 and total > MAX_FRAME_BYTES:
+        total -= _FRAMES.popitem(last=False)[1].nbytes
@@ -1,13 +1,115 @@
 
-from typing import List, Callable, Optional
-import time, random, uuid
+from typing import Any, Dict, Hashable, List, Callable, Optional, Tuple
+import heapq, itertools, threading, time, random, uuid
+from collections import deque
+from concurrent.futures import Future, wait as futures_wait
 from dataclasses import dataclass
+import numpy as np
+from app.core.config import get
+from app.core.order_book import DEPTH, OrderBooks
+from app.services.exchange_sim import ExchangeSim, SimOrder
 
 @dataclass
 class OrderResult:
     order_id: str
-    status: str   # NEW/FILLED/CANCELED
-    price: float
+    status: str   # NEW/FILLED/PARTIAL/CANCELED/REJECTED
+    price: float  # average fill price
+    filled_qty: Optional[int] = None  # shares filled when PARTIAL (FILLED without it means all of them)
+
+# ---------- Request scheduling ----------
+# KHOpenAPI allows 5 lookups (TR/condition requests) and 5 orders in any 1 s window; excess calls fail with -200/-308.
+# Tokens are spaced evenly (burst 1) with a small margin, so no sliding window ever sees a sixth call.
+BUCKETS: Dict[str, Tuple[float, int]] = {"tr": (4.5, 1), "order": (4.5, 1)}   # rate/s, burst
+CLASSES: Dict[str, Tuple[int, str]] = {   # priority (lower first), bucket
+    "order": (0, "order"), "account": (1, "tr"), "condition": (2, "tr"), "data": (3, "tr")}
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate; self.burst = burst; self.clock = clock
+        self.tokens = float(burst); self.t = clock()
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 = now)."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate); self.t = now
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self): self.tokens -= 1.0
+
+class RequestScheduler:
+    """Admission control for broker requests: per-bucket token limits, priority classes (orders first) and
+    coalescing of identical in-flight requests. The request itself runs on the calling thread, so OCX calls
+    stay on the thread that owns the control."""
+
+    def __init__(self, buckets: Dict[str, Tuple[float, int]] = BUCKETS, classes: Dict[str, Tuple[int, str]] = CLASSES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.buckets = {name: TokenBucket(rate, burst, clock) for name, (rate, burst) in buckets.items()}
+        self.classes = classes; self.clock = clock
+        self._cv = threading.Condition(); self._seq = itertools.count()
+        self._waiting: Dict[str, list] = {name: [] for name in buckets}   # bucket -> heap of (priority, seq)
+        self._inflight: Dict[Hashable, Future] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "errors": 0, "max_depth": 0}
+        self.waits: Dict[str, deque] = {c: deque(maxlen=1000) for c in classes}   # admission wait, seconds
+
+    def call(self, cls: str, key: Optional[Hashable], fn: Callable[..., Any], *args, timeout: Optional[float] = None):
+        """Run fn(*args) once admitted. Requests with the same non-None key share one broker round trip."""
+        with self._cv:
+            self.stats["requests"] += 1
+            fut = self._inflight.get(key) if key is not None else None
+            leader = fut is None
+            if leader:
+                fut = Future()
+                if key is not None: self._inflight[key] = fut
+            else:
+                self.stats["coalesced"] += 1
+        if not leader: return fut.result(timeout)
+        try:
+            self._admit(cls, timeout)
+            res = fn(*args)
+            fut.set_result(res)
+            return res
+        except BaseException as e:
+            self.stats["errors"] += 1; fut.set_exception(e); raise
+        finally:
+            if key is not None:
+                with self._cv: self._inflight.pop(key, None)
+
+    def _admit(self, cls: str, timeout: Optional[float]):
+        prio, bucket_name = self.classes[cls]
+        bucket = self.buckets[bucket_name]; heap = self._waiting[bucket_name]
+        t0 = self.clock(); me = (prio, next(self._seq))
+        with self._cv:
+            heapq.heappush(heap, me)
+            self.stats["max_depth"] = max(self.stats["max_depth"], sum(len(h) for h in self._waiting.values()))
+            try:
+                while True:
+                    wait = bucket.wait_time()
+                    if heap[0] == me and wait == 0.0:
+                        heapq.heappop(heap); bucket.take(); self._cv.notify_all()
+                        break
+                    if timeout is not None and self.clock() - t0 >= timeout:
+                        raise TimeoutError(f"{cls} request not admitted within {timeout}s")
+                    self._cv.wait(wait if heap[0] == me else 0.05)
+            except BaseException:
+                if me in heap: heap.remove(me); heapq.heapify(heap); self._cv.notify_all()
+                raise
+        self.waits[cls].append(self.clock() - t0)
+
+    def depth(self) -> int:
+        with self._cv: return sum(len(h) for h in self._waiting.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        out = dict(self.stats, depth=self.depth())
+        for c, w in self.waits.items():
+            if w:
+                ws = sorted(w)
+                out[f"{c}_wait_ms"] = {"n": len(ws), "p50": ws[len(ws) // 2] * 1000.0, "max": ws[-1] * 1000.0}
+        return out
+
+SCHEDULER = RequestScheduler()  # shared by every KiwoomAPI instance (each tab builds its own facade)
+
+class RateLimitError(RuntimeError):
+    pass
 
 # ---------- Mock Impl (safe fallback) ----------
 class _MockKiwoom:
@@ -17,6 +119,27 @@ class _MockKiwoom:
         self.accounts = ["000000-01"]
         self.conds = ["Scalp_VolSpike", "Day_Cross", "Mid_Trend"]
         self._real_callbacks: List[Callable[[str,str,str,int], None]] = []
+        self._tick_callbacks: List[Callable[[str,int,float,float], None]] = []
+        # simulated broker limits: more than `burst` calls of a kind inside `window` seconds are rejected
+        self.limits = {"tr": 5, "order": 5}; self.window = 1.0
+        self._calls = {k: deque() for k in self.limits}
+        self.rejected = {k: 0 for k in self.limits}
+        self.latency = 0.0  # simulated round trip, seconds
+        # simulated depth feed: every registered symbol gets depth_hz random-walk updates a second
+        self.books = OrderBooks(); self.depth_hz = 10.0
+        self._depth: Dict[str, Dict] = {}; self._depth_lock = threading.Lock(); self._depth_thread = None
+
+    def _limit(self, kind: str):
+        if not self.limits.get(kind):  # 0 = unlimited
+            if self.latency: time.sleep(self.latency)
+            return
+        now = time.monotonic(); q = self._calls.setdefault(kind, deque())
+        while q and now - q[0] >= self.window: q.popleft()
+        if len(q) >= self.limits[kind]:
+            self.rejected[kind] += 1
+            raise RateLimitError(f"-200: {kind} request rate exceeded")
+        q.append(now)
+        if self.latency: time.sleep(self.latency)
 
     def login(self, account_no: str, password: str="", is_paper: bool=True) -> bool:
         time.sleep(0.1)
@@ -27,29 +150,124 @@ class _MockKiwoom:
         return True
 
     def get_accounts(self) -> List[str]: return self.accounts
-    def fetch_condition_list(self) -> List[str]: return list(self.conds)
+    def fetch_condition_list(self) -> List[str]:
+        self._limit("tr"); return list(self.conds)
 
     def subscribe_condition(self, cond_name: str) -> List[str]:
+        self._limit("tr")
         sample = ["A005930","A000660","A035720","A251270","A091990","A214330"]
         random.shuffle(sample)
         for code in sample[:2]:
             for cb in self._real_callbacks: cb(code, "I", cond_name, 0)
         return sample[:random.randint(2, 5)]
 
+    # *_async forms, for parity with _RealKiwoom: the mock answers at once
+    @staticmethod
+    def _done(fn, *args) -> Future:
+        fut: Future = Future()
+        try: fut.set_result(fn(*args))
+        except Exception as e: fut.set_exception(e)
+        return fut
+
+    def login_async(self, account_no: str="", password: str="", is_paper: bool=True) -> Future:
+        return self._done(self.login, account_no, password, is_paper)
+    def fetch_condition_list_async(self) -> Future: return self._done(self.fetch_condition_list)
+    def subscribe_condition_async(self, cond_name: str) -> Future: return self._done(self.subscribe_condition, cond_name)
+
     def on_real_condition(self, cb: Callable[[str,str,str,int], None]): self._real_callbacks.append(cb)
+    def on_real_tick(self, cb: Callable[[str,int,float,float], None]): self._tick_callbacks.append(cb)
+    def register_real(self, symbols: List[str]) -> None: pass  # mock ticks come from push_tick / replay
+    def is_connected(self) -> bool: return True
+    def resubscribe(self) -> None: pass
+
+    def push_tick(self, symbol: str, ts: int, price: float, volume: float):
+        for cb in self._tick_callbacks: cb(symbol, ts, price, volume)
+
+    def register_orderbook(self, symbols: List[str]) -> None:
+        with self._depth_lock:
+            for sym in symbols:
+                if sym not in self._depth:
+                    self._depth[sym] = {"bid": round(random.uniform(10000, 50000), -1),
+                                        "qty": np.random.randint(1, 51, size=(2, DEPTH)) * 10.0}
+        self.step_depth(symbols)
+        if self.depth_hz and (self._depth_thread is None or not self._depth_thread.is_alive()):
+            self._depth_thread = threading.Thread(target=self._depth_loop, name="mock-depth", daemon=True)
+            self._depth_thread.start()
+
+    def unregister_orderbook(self, symbols: List[str]) -> None:
+        with self._depth_lock:
+            for sym in symbols:
+                self._depth.pop(sym, None); self.books.discard(sym)
+
+    def step_depth(self, symbols: Optional[List[str]] = None):
+        """One depth update per symbol: usually a few level quantities change, sometimes the ladder moves a tick."""
+        ts = int(time.time()*1000); steps = np.arange(DEPTH) * 10.0
+        with self._depth_lock:
+            for sym in (symbols or list(self._depth)):
+                st = self._depth.get(sym)
+                if st is None: continue
+                if random.random() < 0.1: st["bid"] += random.choice((-10.0, 10.0))
+                else:
+                    for _ in range(random.randint(1, 3)): st["qty"][random.randrange(2), random.randrange(DEPTH)] = random.randint(1, 50) * 10.0
+                self.books.update(sym, np.vstack([st["bid"] + 10.0 + steps, st["bid"] - steps]), st["qty"], ts)
+
+    def _depth_loop(self):
+        while self._depth:
+            hz = self.depth_hz
+            if not hz: break
+            t0 = time.monotonic(); self.step_depth()
+            time.sleep(max(0.0, 1.0 / hz - (time.monotonic() - t0)))
 
     # --- extras for UI demo ---
     def get_orderbook(self, symbol: str):
+        self._limit("tr"); return self._quote(symbol)
+
+    def _quote(self, symbol: str):
         mid = random.uniform(10000, 50000)
         asks = [(round(mid + i*10,2), random.randint(1,50)*10) for i in range(5,0,-1)]
         bids = [(round(mid - i*10,2), random.randint(1,50)*10) for i in range(1,6)]
         return {"asks": asks, "bids": bids, "mid": round(mid,2)}
 
     def place_order(self, symbol: str, side: str, qty: int, price: Optional[float]=None) -> OrderResult:
-        mid = self.get_orderbook(symbol)["mid"]
+        self._limit("order")
+        mid = self._quote(symbol)["mid"]
         fill_price = price or mid
         return OrderResult(order_id=str(uuid.uuid4()), status="FILLED", price=float(fill_price))
 
+class _SimKiwoom(_MockKiwoom):
+    """Mock session whose orders are matched on a local ExchangeSim instead of filled at a random mid.
+    Trades drive on_real_tick, and streamed depth comes from the matching books."""
+    def __init__(self, sim: Optional[ExchangeSim] = None, liquidity: Optional[Callable[[str], Optional[float]]] = None):
+        super().__init__()
+        self.sim = sim if sim is not None else ExchangeSim()
+        self.liquidity = liquidity  # symbol -> mid for seeding an empty book (None: leave it empty)
+        self.depth_hz = 0.0
+        self.sim.on_trade.append(self._on_trade)
+
+    def _on_trade(self, symbol: str, ts: int, price: float, qty: int):
+        self.push_tick(symbol, ts, price, float(qty))
+        if symbol in self.books: self.books.update(symbol, *self.sim.book(symbol).depth(DEPTH), ts)
+
+    def register_orderbook(self, symbols: List[str]) -> None:
+        for sym in symbols: self.books.update(sym, *self.sim.book(sym).depth(DEPTH), int(time.time()*1000))
+
+    def unregister_orderbook(self, symbols: List[str]) -> None:
+        for sym in symbols: self.books.discard(sym)
+
+    def _quote(self, symbol: str):
+        px, qty = self.sim.book(symbol).depth(5)
+        mid = (px[0, 0] + px[1, 0]) / 2.0 if px[0, 0] and px[1, 0] else 0.0
+        return {"asks": list(zip(px[0].tolist(), qty[0].tolist()))[::-1],
+                "bids": list(zip(px[1].tolist(), qty[1].tolist())), "mid": round(float(mid), 2)}
+
+    def place_order(self, symbol: str, side: str, qty: int, price: Optional[float]=None) -> OrderResult:
+        self._limit("order")
+        if self.liquidity is not None and self.sim.book(symbol).best(1 if side.upper() == "BUY" else 0)[0] is None:
+            mid = self.liquidity(symbol)
+            if mid: self.sim.seed_book(symbol, mid, step=self.sim.tick or 10.0)
+        ex = self.sim.submit(SimOrder(symbol, side.upper(), qty, price, tif="IOC", owner="engine"))
+        return OrderResult(order_id=ex.order_id, status=ex.status, price=ex.avg_price, filled_qty=ex.filled)
+
 # ---------- Real KHOpenAPI wrapper (minimal) ----------
 try:
     from PyQt5.QAxContainer import QAxWidget
@@ -58,79 +276,222 @@ except Exception:
     QAxWidget = None
     QtCore = None
 
-class _RealKiwoom:
+class PendingRequests:
+    """Correlates OCX calls with the events that answer them: each request registers a key (e.g. screen number +
+    condition index) and gets a Future that the matching event handler resolves. Requests with different keys
+    can be in flight together; a second request for a key still pending shares its Future."""
+
     def __init__(self):
-        self.ocx = QAxWidget("KHOPENAPI.KHOpenAPICtrl.1")
+        self._lock = threading.Lock(); self._pending: Dict[Hashable, Future] = {}
+        self.stats = {"issued": 0, "resolved": 0, "timeouts": 0, "cancelled": 0, "unmatched": 0}
+
+    def expect(self, key: Hashable) -> Tuple[Future, bool]:
+        """(future, is_new). Only a new request should be sent to the OCX."""
+        with self._lock:
+            fut = self._pending.get(key)
+            if fut is not None and not fut.done(): return fut, False
+            fut = self._pending[key] = Future(); self.stats["issued"] += 1
+        fut.add_done_callback(lambda f, k=key: self._forget(k, f))
+        return fut, True
+
+    def _forget(self, key: Hashable, fut: Future):
+        with self._lock:
+            if self._pending.get(key) is fut: del self._pending[key]
+        if fut.cancelled(): self.stats["cancelled"] += 1
+
+    def resolve(self, key: Hashable, value=None, error: Optional[BaseException] = None) -> bool:
+        with self._lock: fut = self._pending.get(key)
+        if fut is None or fut.done():
+            self.stats["unmatched"] += 1; return False  # late answer to a cancelled/timed-out request
+        try:
+            fut.set_exception(error) if error is not None else fut.set_result(value)
+        except Exception:  # cancelled concurrently
+            self.stats["unmatched"] += 1; return False
+        self.stats["resolved"] += 1
+        return True
+
+    def wait(self, fut: Future, timeout: Optional[float]):
+        """Result of fut, cancelling it after timeout seconds. On the Qt thread a local QEventLoop keeps OCX events
+        flowing while waiting; elsewhere the thread just blocks on the Future."""
+        if not fut.done():
+            app = QtCore.QCoreApplication.instance() if QtCore is not None else None
+            if app is not None and QtCore.QThread.currentThread() == app.thread():
+                loop = QtCore.QEventLoop()
+                fut.add_done_callback(lambda _: QtCore.QMetaObject.invokeMethod(loop, "quit", QtCore.Qt.QueuedConnection))
+                if timeout is not None: QtCore.QTimer.singleShot(int(timeout * 1000), loop.quit)
+                if not fut.done(): loop.exec_()
+            else:
+                futures_wait([fut], timeout)
+        if not fut.done():
+            fut.cancel(); self.stats["timeouts"] += 1
+            raise TimeoutError("no response from the broker")
+        return fut.result()
+
+    def cancel_all(self):
+        with self._lock: futs = list(self._pending.values())
+        for f in futs: f.cancel()
+
+class _RealKiwoom:
+    CONDITION_SCREENS = range(9000, 9100)  # one screen per in-flight condition search
+    # "주식호가잔량": FID 41-50 ask price 1-10, 51-60 bid price, 61-70 ask qty, 71-80 bid qty
+    DEPTH_FIDS = range(41, 41 + 4 * DEPTH)
+
+    def __init__(self, ocx=None):
+        self.ocx = ocx if ocx is not None else QAxWidget("KHOPENAPI.KHOpenAPICtrl.1")
         self.logged_in = False
+        self.requests = PendingRequests()
+        self._screens = itertools.cycle(self.CONDITION_SCREENS)
+        self._cond_index: Dict[str, int] = {}
+        self.books = OrderBooks()
         self._real_callbacks: List[Callable[[str,str,str,int], None]] = []
+        self._tick_callbacks: List[Callable[[str,int,float,float], None]] = []
+        # real-time registrations are remembered: SetRealReg before login is dropped, so resubscribe() replays them
+        self._real_syms: set = set(); self._book_syms: set = set()
         # Connect events
         self.ocx.OnEventConnect.connect(self._on_event_connect)
         self.ocx.OnReceiveConditionVer.connect(self._on_receive_condition_ver)
         self.ocx.OnReceiveTrCondition.connect(self._on_receive_tr_condition)
         self.ocx.OnReceiveRealCondition.connect(self._on_receive_real_condition)
+        self.ocx.OnReceiveRealData.connect(self._on_receive_real_data)
 
     def on_real_condition(self, cb: Callable[[str,str,str,int], None]): self._real_callbacks.append(cb)
+    def on_real_tick(self, cb: Callable[[str,int,float,float], None]): self._tick_callbacks.append(cb)
 
-    def login(self, account_no: str="", password: str="", is_paper: bool=True) -> bool:
-        self.ocx.dynamicCall("CommConnect()")
-        t0 = time.time()
-        while not self.logged_in and time.time() - t0 < 30:
-            QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 50); time.sleep(0.05)
+    def is_connected(self) -> bool:
+        # the login may have gone through another control instance (the Login tab's), so ask the OCX
+        return self.logged_in or self.ocx.dynamicCall("GetConnectState()") == 1
+
+    def register_real(self, symbols: List[str]) -> None:
+        self._real_syms.update(symbols)
+        # FID 10: current price, 15: traded volume ("주식체결")
+        if symbols and self.is_connected():
+            self.ocx.dynamicCall("SetRealReg(QString, QString, QString, QString)", "9100", ";".join(symbols), "10;15", "1")
+
+    def register_orderbook(self, symbols: List[str]) -> None:
+        self._book_syms.update(symbols)
+        if symbols and self.is_connected():
+            self.ocx.dynamicCall("SetRealReg(QString, QString, QString, QString)", "9200", ";".join(symbols),
+                                 ";".join(map(str, self.DEPTH_FIDS)), "1")
+
+    def unregister_orderbook(self, symbols: List[str]) -> None:
+        for sym in symbols:
+            self._book_syms.discard(sym)
+            if self.is_connected(): self.ocx.dynamicCall("SetRealRemove(QString, QString)", "9200", sym)
+            self.books.discard(sym)
+
+    def resubscribe(self) -> None:
+        """Re-issue every remembered tick/depth registration (after login)."""
+        self.register_real(sorted(self._real_syms)); self.register_orderbook(sorted(self._book_syms))
+
+    def _on_depth(self, code):
+        try:
+            vals = np.array([abs(float(self.ocx.dynamicCall("GetCommRealData(QString, int)", code, fid) or 0))
+                             for fid in self.DEPTH_FIDS]).reshape(4, DEPTH)
+        except (TypeError, ValueError):
+            return
+        self.books.update(code, vals[:2], vals[2:], int(time.time()*1000))
+
+    def _on_receive_real_data(self, code, real_type, real_data):
+        if real_type == "주식호가잔량": return self._on_depth(code)
+        if real_type != "주식체결" or not self._tick_callbacks: return
+        try:
+            price = abs(float(self.ocx.dynamicCall("GetCommRealData(QString, int)", code, 10)))
+            vol = abs(float(self.ocx.dynamicCall("GetCommRealData(QString, int)", code, 15)))
+        except (TypeError, ValueError):
+            return
+        ts = int(time.time()*1000)
+        for cb in self._tick_callbacks:
+            try: cb(code, ts, price, vol)
+            except Exception: pass
+
+    # Each request has an *_async form returning a Future (awaitable through asyncio.wrap_future);
+    # the plain form waits for it and keeps the old return value on timeout.
+    def login_async(self, account_no: str="", password: str="", is_paper: bool=True) -> Future:
+        fut, new = self.requests.expect(("connect",))
+        if new: self.ocx.dynamicCall("CommConnect()")
+        return fut
+
+    def login(self, account_no: str="", password: str="", is_paper: bool=True, timeout: float = 30.0) -> bool:
+        try: self.logged_in = self.requests.wait(self.login_async(account_no, password, is_paper), timeout)
+        except TimeoutError: self.logged_in = False
         return self.logged_in
-    def _on_event_connect(self, err_code): self.logged_in = (err_code == 0)
+
+    def _on_event_connect(self, err_code):
+        self.logged_in = (err_code == 0)
+        if self.logged_in: self.resubscribe()
+        self.requests.resolve(("connect",), self.logged_in)
 
     def get_accounts(self) -> List[str]:
         v = self.ocx.dynamicCall("GetLoginInfo(QString)", "ACCNO")
         return [x for x in v.strip().split(';') if x] if v else []
 
-    def fetch_condition_list(self) -> List[str]:
-        self.ocx.dynamicCall("GetConditionLoad()")
-        t0 = time.time()
-        while not hasattr(self, "_cond_list") and time.time() - t0 < 10:
-            QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 50); time.sleep(0.05)
-        return getattr(self, "_cond_list", [])
+    def fetch_condition_list_async(self) -> Future:
+        fut, new = self.requests.expect(("condition_ver",))
+        if new: self.ocx.dynamicCall("GetConditionLoad()")
+        return fut
+
+    def fetch_condition_list(self, timeout: float = 10.0) -> List[str]:
+        try: return self.requests.wait(self.fetch_condition_list_async(), timeout)
+        except TimeoutError: return []
 
     def _on_receive_condition_ver(self, ret, msg):
         s = self.ocx.dynamicCall("GetConditionNameList()")
-        lst = []
+        index = {}
         if s:
             for item in s.split(';'):
                 if '^' in item:
-                    idx, name = item.split('^'); lst.append(name)
-        self._cond_list = lst
+                    idx, name = item.split('^'); index[name] = int(idx)
+        self._cond_index = index
+        self.requests.resolve(("condition_ver",), list(index))
 
-    def subscribe_condition(self, cond_name: str) -> List[str]:
-        names = self.fetch_condition_list()
-        idx = names.index(cond_name) if cond_name in names else 0
-        self.ocx.dynamicCall("SendCondition(QString, QString, int, int)", "9000", cond_name, idx, 1)
-        t0 = time.time()
-        while not hasattr(self, "_last_codes") and time.time() - t0 < 5:
-            QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents, 50); time.sleep(0.05)
-        codes = getattr(self, "_last_codes", [])
-        if hasattr(self, "_last_codes"): delattr(self, "_last_codes")
-        return codes
+    def subscribe_condition_async(self, cond_name: str) -> Future:
+        """Real-time condition search; resolves to the initial code list from OnReceiveTrCondition."""
+        if cond_name not in self._cond_index: self.fetch_condition_list()
+        idx = self._cond_index.get(cond_name, 0)
+        for _ in self.CONDITION_SCREENS:  # a free screen, so concurrent searches never share a key
+            scr = str(next(self._screens))
+            fut, new = self.requests.expect(("tr_condition", scr, idx))
+            if new: break
+        else:
+            raise RuntimeError("no free condition screen")
+        if self.ocx.dynamicCall("SendCondition(QString, QString, int, int)", scr, cond_name, idx, 1) == 0:
+            self.requests.resolve(("tr_condition", scr, idx), error=RuntimeError(f"SendCondition({cond_name}) refused"))
+        return fut
+
+    def subscribe_condition(self, cond_name: str, timeout: float = 5.0) -> List[str]:
+        try: return self.requests.wait(self.subscribe_condition_async(cond_name), timeout)
+        except (TimeoutError, RuntimeError): return []
 
     def _on_receive_tr_condition(self, scr_no, code_list, cond_name, idx, next_):
-        codes = [c for c in code_list.split(';') if c]; self._last_codes = codes
+        codes = [c for c in code_list.split(';') if c]
+        self.requests.resolve(("tr_condition", str(scr_no), int(idx)), codes)
 
     def _on_receive_real_condition(self, code, rtype, cond_name, cond_idx):
         for cb in self._real_callbacks:
             try: cb(code, rtype, cond_name, cond_idx)
             except Exception: pass
 
-    # Minimal place_order stub (user should map to SendOrder in production)
+    # Minimal place_order stub (user should map to SendOrder in production). TradeEngine calls it on its
+    # order-exec thread: a real SendOrder must be handed to the thread that owns the control, not made there.
     def place_order(self, symbol: str, side: str, qty: int, price: Optional[float]=None) -> OrderResult:
         # For safety here we just simulate a fill; replace with SendOrder(...) mapping.
         return OrderResult(order_id=str(uuid.uuid4()), status="FILLED", price=float(price or 0.0))
 
 # ---------- Facade ----------
 class KiwoomAPI:
-    def __init__(self):
-        if QAxWidget is None:
-            self.mode = "mock"; self._impl = _MockKiwoom()
+    """Broker facade. Rate-limited requests go through ``scheduler`` (see RequestScheduler)."""
+    def __init__(self, impl=None, scheduler: Optional[RequestScheduler] = None):
+        if impl is not None:
+            self.mode = "mock" if isinstance(impl, _MockKiwoom) else "real"; self._impl = impl
+        elif QAxWidget is None:
+            self.mode = "mock"
+            self._impl = _SimKiwoom(liquidity=lambda sym: random.uniform(10000, 50000)) if get("mock_broker") == "sim" else _MockKiwoom()
         else:
             self.mode = "real"; self._impl = _RealKiwoom()
+        self.scheduler = scheduler if scheduler is not None else SCHEDULER
         self.on_real_condition = self._impl.on_real_condition
+        self.on_real_tick = self._impl.on_real_tick
+        self.books: OrderBooks = self._impl.books
 
     def login(self, account_no: str="", password: str="", is_paper: bool=True) -> bool:
         return self._impl.login(account_no, password, is_paper)
@@ -139,17 +500,46 @@ class KiwoomAPI:
         return self._impl.get_accounts()
 
     def fetch_condition_list(self) -> List[str]:
-        return self._impl.fetch_condition_list()
+        return self.scheduler.call("condition", ("conditions",), self._impl.fetch_condition_list)
 
     def subscribe_condition(self, cond_name: str) -> List[str]:
-        return self._impl.subscribe_condition(cond_name)
+        return self.scheduler.call("condition", ("subscribe", cond_name), self._impl.subscribe_condition, cond_name)
+
+    # Futures resolved by the broker's answering event; only admission (rate limit) happens on the calling thread.
+    def login_async(self, account_no: str="", password: str="", is_paper: bool=True) -> Future:
+        return self._impl.login_async(account_no, password, is_paper)
+
+    def fetch_condition_list_async(self) -> Future:
+        return self.scheduler.call("condition", None, self._impl.fetch_condition_list_async)
+
+    def subscribe_condition_async(self, cond_name: str) -> Future:
+        return self.scheduler.call("condition", None, self._impl.subscribe_condition_async, cond_name)
+
+    def register_real(self, symbols: List[str]) -> None:
+        """Start real-time trade ticks (on_real_tick callbacks) for symbols."""
+        self._impl.register_real(symbols)
+
+    def register_orderbook(self, symbols: List[str]) -> None:
+        """Stream depth for symbols into ``books`` (updated in place; render from books.drain())."""
+        self._impl.register_orderbook(symbols)
+
+    def unregister_orderbook(self, symbols: List[str]) -> None:
+        self._impl.unregister_orderbook(symbols)
+
+    def is_connected(self) -> bool:
+        return self._impl.is_connected()
+
+    def resubscribe(self) -> None:
+        """Replay tick/depth registrations made before login (the OCX ignores SetRealReg until connected)."""
+        self._impl.resubscribe()
 
     # used by TradeEngine
     def place_order(self, symbol: str, side: str, qty: int, price: Optional[float]=None) -> OrderResult:
-        return self._impl.place_order(symbol, side, qty, price)
+        return self.scheduler.call("order", None, self._impl.place_order, symbol, side, qty, price)
 
-    # UI-only in mock
+    # one-off lookup; streamed symbols are answered from ``books`` without a request
     def get_orderbook(self, symbol: str):
+        if symbol in self.books: return self.books.snapshot(symbol)
         if hasattr(self._impl, "get_orderbook"):
-            return self._impl.get_orderbook(symbol)
+            return self.scheduler.call("data", ("orderbook", symbol), self._impl.get_orderbook, symbol)
         return {"asks": [], "bids": [], "mid": 0.0}
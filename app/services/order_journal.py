@@ -0,0 +1,159 @@
+
+import json, os, queue, shutil, threading, time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.core.config import JOURNAL_PATH
+from app.core.db import raw_transaction
+from app.core.utils import get_logger
+
+log = get_logger("order_journal")
+
+COMMIT_KEY = "journal_committed"  # settings value "seq:offset" of the last journal record already in SQLite
+ORDER_UPSERT = "INSERT OR REPLACE INTO orders (order_id, symbol, side, qty, price, status, ts) VALUES (?,?,?,?,?,?,?)"
+TRADE_UPSERT = "INSERT OR REPLACE INTO trades (trade_id, order_id, symbol, qty, price, pnl, ts) VALUES (?,?,?,?,?,?,?)"
+SETTING_UPSERT = "INSERT OR REPLACE INTO settings (key, value) VALUES (?,?)"
+
+def read_committed() -> Tuple[int, int]:
+    with raw_transaction() as cur:
+        row = cur.execute("SELECT value FROM settings WHERE key=?", (COMMIT_KEY,)).fetchone()
+    if not row: return 0, 0
+    seq, offset = row[0].split(":")
+    return int(seq), int(offset)
+
+# Offsets are journal positions, not file positions: once compact() has dropped the records before N, the
+# file starts with a BASE_PREFIX line naming N, and position p lives at byte p - N + len(that line).
+BASE_PREFIX = b'{"type":"base","offset":'
+
+def _base(f) -> Tuple[int, int]:
+    """(journal position of the first record in the file, bytes before it)."""
+    line = f.readline()
+    if line.startswith(BASE_PREFIX) and line.endswith(b"\n"): return json.loads(line)["offset"], len(line)
+    return 0, 0
+
+def read_records(path, offset: int = 0) -> Tuple[List[Dict], int]:
+    """Complete records from journal position offset on (from the first kept one if offset was compacted away),
+    and the position just past the last one (a torn final line is left out)."""
+    recs = []; end = offset
+    if not Path(path).exists(): return recs, end
+    with open(path, "rb") as f:
+        base, head = _base(f)
+        end = max(offset, base)
+        f.seek(end - base + head)
+        for line in f:
+            if not line.endswith(b"\n"): break
+            recs.append(json.loads(line)); end += len(line)
+    return recs, end
+
+def journal_size(path) -> int:
+    """Journal position at the end of the file."""
+    if not Path(path).exists(): return 0
+    with open(path, "rb") as f:
+        base, head = _base(f)
+        return base + f.seek(0, os.SEEK_END) - head
+
+def _commit(cur, recs: List[Dict], offset: int):
+    cur.executemany(ORDER_UPSERT, [(r["order_id"], r["symbol"], r["side"], r["qty"], r["price"], r["status"], r["ts"])
+                                   for r in recs if r["type"] == "order"])
+    cur.executemany(TRADE_UPSERT, [(r["trade_id"], r["order_id"], r["symbol"], r["qty"], r["price"], r["pnl"], r["ts"])
+                                   for r in recs if r["type"] == "trade"])
+    cur.execute(SETTING_UPSERT, (COMMIT_KEY, f"{recs[-1]['seq']}:{offset}"))
+
+class OrderJournal:
+    """Append-only JSONL of order/trade records; a writer thread batches them into SQLite behind the caller.
+
+    A record is durable once append() returns (it is in the OS file cache). SQLite trails the file; the
+    seq:offset watermark committed with each batch tells the next start which records still need loading.
+    compact() drops committed records a snapshot has made unnecessary, so the file does not grow without bound.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, max_batch: int = 500, flush_interval: float = 0.2):
+        self.path = Path(path); self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_batch = max_batch; self.flush_interval = flush_interval
+        self.stats = {"records": 0, "batches": 0, "rows": 0, "max_batch": 0, "errors": 0, "recovered": 0, "compactions": 0}
+        self.seq, self.offset = self._recover()
+        self._f = open(self.path, "ab")
+        self._lock = threading.Lock()
+        self.q: "queue.Queue[Optional[Tuple[Dict, int]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def _recover(self) -> Tuple[int, int]:
+        """Load records the previous run appended but never committed, and drop a torn last line."""
+        seq, offset = read_committed()
+        size = journal_size(self.path)
+        if offset > size: offset = 0  # journal replaced under us: re-apply it (upserts are idempotent)
+        recs, end = read_records(self.path, offset)
+        if end < size:
+            with open(self.path, "r+b") as f:
+                base, head = _base(f); f.truncate(end - base + head)
+        if recs:
+            with raw_transaction() as cur: _commit(cur, recs, end)
+            seq = recs[-1]["seq"]; self.stats["recovered"] = len(recs)
+            log.info(f"Recovered {len(recs)} journal records into SQLite.")
+        return seq, end
+
+    def append(self, rec: Dict) -> int:
+        """Write one record ({"type": "order"|"trade", ...}); returns its seq."""
+        with self._lock:
+            self.seq += 1; rec["seq"] = self.seq
+            line = (json.dumps(rec, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+            self._f.write(line); self._f.flush()
+            self.offset += len(line)
+            self.q.put((rec, self.offset)); self.stats["records"] += 1
+            return self.seq
+
+    def _run(self):
+        batch: List[Tuple[Dict, int]] = []; deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.q.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    self.q.task_done(); break
+                batch.append(item)
+                if len(batch) < self.max_batch: continue
+            except queue.Empty:
+                pass
+            self._flush(batch); batch = []; deadline = time.monotonic() + self.flush_interval
+        self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Dict, int]]):
+        if not batch: return
+        try:
+            with raw_transaction() as cur: _commit(cur, [r for r, _ in batch], batch[-1][1])
+            self.stats["batches"] += 1; self.stats["rows"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        except Exception as e:
+            # the records stay in the journal past the watermark; the next start loads them
+            self.stats["errors"] += 1; log.error(f"Journal commit of {len(batch)} records failed: {e}")
+        finally:
+            for _ in batch: self.q.task_done()
+
+    def flush(self):
+        """Block until every appended record is committed to SQLite, and fsync the journal."""
+        with self._lock:
+            self._f.flush(); os.fsync(self._f.fileno())
+        self.q.join()
+
+    def compact(self, offset: int) -> int:
+        """Drop the records before journal position ``offset`` that SQLite already holds (the caller's snapshot
+        covers them): the rest goes to a fresh file behind a base line, which atomically replaces the journal.
+        Positions already handed out stay valid. Returns the bytes dropped."""
+        with self._lock:  # no appends while the file is swapped
+            self._f.flush()
+            upto = min(offset, read_committed()[1], self.offset)
+            tmp = self.path.with_name(self.path.name + ".compact")
+            with open(self.path, "rb") as src:
+                base, head = _base(src)
+                if upto <= base: return 0
+                src.seek(upto - base + head)
+                with open(tmp, "wb") as dst:
+                    dst.write(BASE_PREFIX + b"%d}\n" % upto); shutil.copyfileobj(src, dst)
+                    dst.flush(); os.fsync(dst.fileno())
+            self._f.close(); os.replace(tmp, self.path); self._f = open(self.path, "ab")
+            self.stats["compactions"] += 1
+            return upto - base
+
+    def close(self):
+        if self._f.closed: return
+        self.flush(); self.q.put(None); self._thread.join()
+        self._f.close()
@@ -1,60 +1,83 @@
 
-from typing import Tuple
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 from sqlalchemy import select
-from app.core.db import get_session, RationaleItem, RationaleWeight
-from app.services.condition_engine import load_df
-from app.core.indicators import ema, sma, rsi, macd, obv, volume_spike
+from app.core import streaming
+from app.core.config import get
+from app.core.db import get_session, RationaleItem, RationaleWeight, Setting
+from app.services.condition_engine import load_df, load_recent
+from app.services.features import uses, feature_frame, required_lookback, streamed_frame, STREAMED_FEATURES
 
-def _eval_volume_spike(df): return volume_spike(df["vol"], 20, 2.0)
-def _eval_short_ma_gc(df):
-    s = ema(df["close"], 5); l = ema(df["close"], 20)
+# Evaluators take a FeatureFrame: raw candle columns plus shared, memoized indicators.
+@uses("volume_spike", lookback=20)
+def _eval_volume_spike(f): return f["volume_spike"]
+@uses("ema5", "ema20", lookback=100)
+def _eval_short_ma_gc(f):
+    s = f["ema5"]; l = f["ema20"]
     return ((s.shift(1) <= l.shift(1)) & (s > l)).fillna(False)
-def _eval_long_green(df):
-    body = (df["close"] - df["open"]).abs()
-    atr = (df["high"] - df["low"]).rolling(14).mean()
-    return ((df["close"] > df["open"]) & (body > 1.5*atr)).fillna(False)
-def _eval_prev_high_break(df):
-    rh = df["high"].rolling(390).max().shift(1)
-    return (df["high"] > rh).fillna(False)
-def _eval_prev_low_hold(df):
-    rl = df["low"].rolling(390).min().shift(1)
-    return (df["low"] >= rl).fillna(False)
-def _eval_gap_up_support(df):
-    prev_close = df["close"].shift(1)
-    gap = (df["open"] - prev_close) / (prev_close.replace(0,1e-9)) * 100.0
-    return ((gap > 1.0) & (df["low"] > prev_close)).fillna(False)
-def _eval_rsi_oversold_bounce(df):
-    r = rsi(df["close"])
+@uses("atr14", lookback=14)
+def _eval_long_green(f):
+    body = (f["close"] - f["open"]).abs()
+    return ((f["close"] > f["open"]) & (body > 1.5*f["atr14"])).fillna(False)
+@uses("high390_prev", lookback=391)
+def _eval_prev_high_break(f):
+    return (f["high"] > f["high390_prev"]).fillna(False)
+@uses("low390_prev", lookback=391)
+def _eval_prev_low_hold(f):
+    return (f["low"] >= f["low390_prev"]).fillna(False)
+@uses(lookback=2)
+def _eval_gap_up_support(f):
+    prev_close = f["close"].shift(1)
+    gap = (f["open"] - prev_close) / (prev_close.replace(0,1e-9)) * 100.0
+    return ((gap > 1.0) & (f["low"] > prev_close)).fillna(False)
+@uses("rsi14", lookback=16)
+def _eval_rsi_oversold_bounce(f):
+    r = f["rsi14"]
     return ((r.shift(1) < 30) & (r >= 30)).fillna(False)
-def _eval_rsi_overbought(df):
-    r = rsi(df["close"]); return (r > 70).fillna(False)
-def _eval_macd_gc(df):
-    m, s, _ = macd(df["close"]); return ((m.shift(1) <= s.shift(1)) & (m > s)).fillna(False)
-def _eval_macd_dc(df):
-    m, s, _ = macd(df["close"]); return ((m.shift(1) >= s.shift(1)) & (m < s)).fillna(False)
-def _eval_obv_up(df):
-    o = obv(df["close"], df["vol"]); return (o.diff() > 0).fillna(False)
-def _eval_obv_down(df):
-    o = obv(df["close"], df["vol"]); return (o.diff() < 0).fillna(False)
-def _eval_pullback_bounce(df):
-    e20 = ema(df["close"], 20); return ((df["close"].shift(1) <= e20.shift(1)) & (df["close"] > e20)).fillna(False)
-def _eval_lower_high(df):
-    s20 = sma(df["close"], 20); rolling_max = df["high"].rolling(20).max()
-    return ((s20.diff() < 0) & (df["close"] < s20) & (rolling_max.diff() < 0)).fillna(False)
-def _eval_fib_retracement(df):
-    low20 = df["low"].rolling(20).min(); high20 = df["high"].rolling(20).max()
-    rng = (high20 - low20).replace(0, 1e-9); ratio = (df["close"] - low20) / rng
+@uses("rsi14", lookback=15)
+def _eval_rsi_overbought(f):
+    r = f["rsi14"]; return (r > 70).fillna(False)
+@uses("macd", "macd_signal", lookback=200)
+def _eval_macd_gc(f):
+    m, s = f["macd"], f["macd_signal"]; return ((m.shift(1) <= s.shift(1)) & (m > s)).fillna(False)
+@uses("macd", "macd_signal", lookback=200)
+def _eval_macd_dc(f):
+    m, s = f["macd"], f["macd_signal"]; return ((m.shift(1) >= s.shift(1)) & (m < s)).fillna(False)
+@uses("obv", lookback=2)
+def _eval_obv_up(f):
+    o = f["obv"]; return (o.diff() > 0).fillna(False)
+@uses("obv", lookback=2)
+def _eval_obv_down(f):
+    o = f["obv"]; return (o.diff() < 0).fillna(False)
+@uses("ema20", lookback=100)
+def _eval_pullback_bounce(f):
+    e20 = f["ema20"]; return ((f["close"].shift(1) <= e20.shift(1)) & (f["close"] > e20)).fillna(False)
+@uses("sma20", "high20", lookback=21)
+def _eval_lower_high(f):
+    s20 = f["sma20"]; rolling_max = f["high20"]
+    return ((s20.diff() < 0) & (f["close"] < s20) & (rolling_max.diff() < 0)).fillna(False)
+@uses("low20", "high20", lookback=20)
+def _eval_fib_retracement(f):
+    low20 = f["low20"]; high20 = f["high20"]
+    rng = (high20 - low20).replace(0, 1e-9); ratio = (f["close"] - low20) / rng
     return ((ratio > 0.382) & (ratio < 0.618)).fillna(False)
-def _eval_ma_support(df):
-    s20 = sma(df["close"], 20); return (df["low"] >= s20*0.995).fillna(False)
-def _eval_news_theme(df): return _eval_volume_spike(df)
-def _eval_ask_wall_clear(df):
-    return pd.Series([False]*len(df), index=df.index)
-def _eval_downtrend_break(df):
-    s50 = sma(df["close"], 50); return ((df["close"].shift(1) <= s50.shift(1)) & (df["close"] > s50)).fillna(False)
-def _eval_psych_levels(df):
-    c = df["close"]; nearest = (c/1000.0).round()*1000.0
+@uses("sma20", lookback=20)
+def _eval_ma_support(f):
+    s20 = f["sma20"]; return (f["low"] >= s20*0.995).fillna(False)
+@uses("volume_spike", lookback=20)
+def _eval_news_theme(f): return _eval_volume_spike(f)
+@uses(lookback=1)
+def _eval_ask_wall_clear(f):
+    return pd.Series([False]*len(f), index=f.index)
+@uses("sma50", lookback=51)
+def _eval_downtrend_break(f):
+    s50 = f["sma50"]; return ((f["close"].shift(1) <= s50.shift(1)) & (f["close"] > s50)).fillna(False)
+@uses(lookback=1)
+def _eval_psych_levels(f):
+    c = f["close"]; nearest = (c/1000.0).round()*1000.0
     return ((abs(c - nearest) / nearest) < 0.002).fillna(False)
 
 EVAL_MAP = {
@@ -80,28 +103,105 @@ EVAL_MAP = {
     "심리적 가격대": _eval_psych_levels,
 }
 
-def compute_human_score(symbol: str, tf: str, profile: str = "scalp") -> Tuple[float, pd.Series]:
+PLAN_VERSION_KEY = "rationale_version"
+PLAN_CHECK_S = float(get("plan_check_s", 5.0))  # how often get_plan looks for weights saved by another process
+STREAM_WARM_BARS = int(get("bar_cache_bars", 1024))  # history a streaming state is (re)built from, served by BAR_CACHE
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    """Per-profile evaluators and normalized weights, resolved once from the rationale tables."""
+    profile: str
+    names: Tuple[str, ...]
+    funcs: Tuple[Callable, ...]
+    weights: np.ndarray            # sums to 1.0 (empty plan: no items)
+    features: Tuple[str, ...]
+    lookback: Optional[int]
+    version: int
+
+_PLANS: Dict[str, ScoringPlan] = {}
+_last_check = 0.0  # time.monotonic() of the last stored-version check
+
+def _stored_version(s) -> int:
+    row = s.get(Setting, PLAN_VERSION_KEY)
+    return int(row.value) if row and row.value else 0
+
+def _build_plan(profile: str) -> ScoringPlan:
     with get_session() as s:
         rows = s.execute(select(RationaleItem.id, RationaleItem.name, RationaleWeight.weight)
                          .join(RationaleWeight, RationaleWeight.item_id==RationaleItem.id)
                          .where(RationaleWeight.profile==profile)
                          .order_by(RationaleItem.idx)).all()
-    if not rows:
+        version = _stored_version(s)
+    items = [(name, EVAL_MAP[name], float(w)) for _, name, w in rows if name in EVAL_MAP and w and w > 0]
+    w = np.array([x[2] for x in items], dtype=np.float64)
+    funcs = tuple(x[1] for x in items)
+    return ScoringPlan(profile=profile, names=tuple(x[0] for x in items), funcs=funcs,
+                       weights=w / w.sum() if len(w) else w,
+                       features=tuple(dict.fromkeys(f for fn in funcs for f in fn.features)),
+                       lookback=required_lookback(funcs), version=version)
+
+def get_plan(profile: str) -> ScoringPlan:
+    """Compiled plan for profile; at most every PLAN_CHECK_S seconds the stored version is compared (refresh_plans)."""
+    if _PLANS and time.monotonic() - _last_check >= PLAN_CHECK_S: refresh_plans()
+    plan = _PLANS.get(profile)
+    if plan is None: plan = _PLANS[profile] = _build_plan(profile)
+    return plan
+
+def invalidate_plans() -> int:
+    """Bump the stored rationale version and drop compiled plans; call after rewriting weights."""
+    with get_session() as s:
+        version = _stored_version(s) + 1
+        s.merge(Setting(key=PLAN_VERSION_KEY, value=str(version))); s.commit()
+    _PLANS.clear()
+    return version
+
+def refresh_plans() -> bool:
+    """Drop plans compiled against an older stored version (weights saved by another process)."""
+    global _last_check
+    _last_check = time.monotonic()
+    if not _PLANS: return False
+    with get_session() as s:
+        version = _stored_version(s)
+    if all(p.version == version for p in _PLANS.values()): return False
+    _PLANS.clear()
+    return True
+
+def compute_human_score(symbol: str, tf: str, profile: str = "scalp", latest_only: bool = False) -> Tuple[float, pd.Series]:
+    """Weighted share of rationale items true on the last bar, 0-100.
+
+    ``latest_only`` scores from the series' streaming indicator state (advanced by the bar aggregator, warmed
+    and caught up from the newest stored bars), or loads just the largest declared lookback of the weighted items
+    when a feature has no streaming counterpart.
+    """
+    plan = get_plan(profile)
+    if not plan.funcs:
         return 0.0, pd.Series(dtype=float)
 
-    df_price = load_df(symbol, tf)
+    if latest_only and plan.lookback is not None and STREAMED_FEATURES.issuperset(plan.features):
+        state = streaming.current(symbol, tf, load_recent, max(STREAM_WARM_BARS, plan.lookback))
+        if state is None:
+            return 0.0, pd.Series(dtype=float)
+        return score_last(streamed_frame(state), plan)
+
+    df_price = load_df(symbol, tf, last_n=plan.lookback if latest_only else None, cached=latest_only)
     if df_price.empty:
         return 0.0, pd.Series(dtype=float)
 
-    score_sum = 0.0; weight_sum = 0.0; detail = {}
-    for item_id, name, weight in rows:
-        func = EVAL_MAP.get(name)
-        if func is None or not weight or weight <= 0: continue
-        series = func(df_price)
-        val = bool(series.iloc[-1]) if len(series) else False
-        detail[name] = 1.0 if val else 0.0
-        score_sum += (1.0 if val else 0.0) * float(weight)
-        weight_sum += float(weight)
-
-    final = 0.0 if weight_sum == 0 else (score_sum / weight_sum) * 100.0
-    return round(final, 2), pd.Series(detail)
+    return score_last(feature_frame(symbol, tf, df_price), plan)
+
+def score_last(ff, plan: ScoringPlan) -> Tuple[float, pd.Series]:
+    ff.prefetch(plan.features)
+    hits = np.array([bool(fn(ff).iloc[-1]) for fn in plan.funcs], dtype=np.float64)
+    final = float(hits @ plan.weights) * 100.0 if len(hits) else 0.0
+    return round(final, 2), pd.Series(hits, index=plan.names)
+
+def human_score_series(symbol: str, tf: str, profile: str = "scalp", df: pd.DataFrame = None) -> pd.Series:
+    """Per-bar human score indexed by ts: item signal matrix (bars x items) times the normalized weight vector."""
+    plan = get_plan(profile)
+    df = load_df(symbol, tf) if df is None else df
+    if not plan.funcs or df.empty:
+        return pd.Series(dtype=float)
+    ff = feature_frame(symbol, tf, df).prefetch(plan.features)
+    signals = np.column_stack([fn(ff).to_numpy(dtype=bool) for fn in plan.funcs]).astype(np.float64)
+    score = signals @ plan.weights * 100.0
+    return pd.Series(np.round(score, 2), index=pd.Index(df["ts"].to_numpy(), name="ts"), name=profile)
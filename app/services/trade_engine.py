@@ -1,82 +1,308 @@
 
-import time, uuid
-from typing import Optional, Dict, List, Tuple
-from sqlalchemy import select
-from app.core.db import get_session, Order, Trade, Candle
+import json, queue, threading, time, uuid
+from collections import deque
+from concurrent.futures import Future
+from typing import Iterable, Optional, Dict, List, Tuple
+import numpy as np
+from app.core.config import get
+from app.core.db import raw_transaction
+from app.services.condition_engine import load_recent
+from app.services.order_journal import OrderJournal, read_records
 from app.core.utils import get_logger
 
 log = get_logger("trade_engine")
 
+SNAPSHOT_KEY = "engine_snapshot"
+# a new trailing high is journaled once it is this far above the last journaled one (about a KRX price tick);
+# in between only memory and the next snapshot have it, so a crash restores a stop at most one step lower
+TRAIL_JOURNAL_STEP = float(get("trail_journal_bps", 10)) / 10_000
+
+def _new_position() -> Dict:
+    return {"qty":0, "avg":0.0, "trail":None, "sold_levels":set(), "pending":0}
+
+def _apply_fill(pos: Dict, signed_qty: int, price: float) -> float:
+    """Fold one fill (+qty bought / -qty sold) into a position; returns realized pnl."""
+    if signed_qty > 0:
+        new_qty = pos["qty"] + signed_qty
+        pos.update({"qty":new_qty, "avg":(pos["avg"]*pos["qty"] + price*signed_qty)/max(1, new_qty)})
+        return 0.0
+    qty = -signed_qty
+    pnl = (price - pos["avg"]) * qty
+    pos["qty"] = max(0, pos["qty"] - qty)
+    if pos["qty"] == 0:
+        pos["avg"] = 0.0; pos["sold_levels"] = set(); pos["trail"] = None
+    return pnl
+
+def replay(positions: Dict[str, Dict], records: Iterable[Dict]) -> Dict[str, Dict]:
+    """Rebuild positions from journal records: trades move qty/avg, TP orders mark their level as taken,
+    trail records carry the trailing high forward."""
+    for r in records:
+        if r["type"] == "order" and r.get("tp") is not None:
+            positions.setdefault(r["symbol"], _new_position())["sold_levels"].add(r["tp"])
+        elif r["type"] == "trail":
+            positions.setdefault(r["symbol"], _new_position())["trail"] = r["price"]
+        elif r["type"] == "trade":
+            _apply_fill(positions.setdefault(r["symbol"], _new_position()), r["qty"], r["price"])
+    return positions
+
 class TradeEngine:
-    def __init__(self, broker):
+    """Positions, risk rules and order flow. Orders run on an execution thread (submit() returns a Future);
+    fills update positions in memory at once and are persisted through the order journal.
+    With ``threaded=False`` orders wait in the queue until settle() executes them on the caller's thread
+    (replays and backtests: deterministic, no thread handoff)."""
+
+    def __init__(self, broker, journal: Optional[OrderJournal] = None, restore: bool = True,
+                 snapshot_interval: float = 30.0, threaded: bool = True, compact_journal: bool = True):
         self.broker = broker
+        self.journal = journal if journal is not None else OrderJournal()
         self.running = False
         self.positions: Dict[str, Dict] = {}
         self.take_profits: List[Tuple[float, float]] = []  # (gain_pct, sell_ratio)
+        # risk monitor: per-symbol (sell_at_or_below, check_at_or_above) prices; ticks strictly between are no-ops
+        self.stop_pct: Optional[float] = None; self.trail_pct: Optional[float] = None; self.auto_risk = False
+        self._triggers: Dict[str, Tuple[float, float]] = {}
+        self.risk_stats = {"ticks": 0, "checks": 0, "sells": 0}
+        self.risk_latency_ms = deque(maxlen=1000)  # price update -> SELL submitted
+        # order pipeline: positions are shared by the tick/GUI thread and the execution thread
+        self._lock = threading.RLock()
+        self._orders: "queue.Queue" = queue.Queue()
+        self._inline: deque = deque()  # threaded=False: orders waiting for settle()
+        self.order_stats = {"submitted": 0, "filled": 0, "partial": 0, "rejected": 0, "failed": 0}
+        self.ack_latency_ms = deque(maxlen=1000)  # submit -> broker ack applied
+        self.snapshot_interval = snapshot_interval; self._last_snapshot = time.monotonic()
+        self.compact_journal = compact_journal
+        self.restore_stats = self.restore() if restore else {}
+        self._exec = threading.Thread(target=self._run_orders, name="order-exec", daemon=True) if threaded else None
+        if self._exec is not None: self._exec.start()
 
     def start(self): self.running = True; log.info("Auto trading started.")
-    def stop(self):  self.running = False; log.info("Auto trading stopped.")
 
-    def set_take_profits(self, steps): self.take_profits = sorted(steps, key=lambda x: x[0])
+    def stop(self):
+        """Stop auto trading and make everything submitted so far durable (executed, journaled, in SQLite)."""
+        self.running = False; self.flush(); log.info("Auto trading stopped.")
+
+    def flush(self):
+        self.settle(); self.journal.flush()
+
+    def settle(self):
+        """Block until every submitted order is executed and applied to positions (the journal commits behind)."""
+        if self._exec is not None:
+            self._orders.join(); return
+        while self._inline: self._execute(self._inline.popleft())
+
+    def close(self, snapshot: bool = True):
+        """Application exit: flush, then end the execution and journal threads."""
+        if self._exec is not None and not self._exec.is_alive(): return
+        self.flush()
+        if snapshot: self.snapshot()
+        if self._exec is not None: self._orders.put(None); self._exec.join()
+        self.journal.close()
+
+    # ---------- restart state: snapshot + journal tail ----------
+    def snapshot(self) -> Dict:
+        """Persist positions (with trailing highs and TP levels taken) and the journal position they reflect,
+        then compact the journal: the records before it are in SQLite and a restart no longer reads them."""
+        with self._lock:  # journal appends happen under this lock, so seq/offset match the positions
+            snap = {"seq": self.journal.seq, "offset": self.journal.offset, "ts": int(time.time()*1000),
+                    "positions": {sym: {"qty": p["qty"], "avg": p["avg"], "trail": p["trail"], "sold_levels": sorted(p["sold_levels"])}
+                                  for sym, p in self.positions.items() if p["qty"] > 0}}
+        with raw_transaction() as cur:
+            cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?,?)", (SNAPSHOT_KEY, json.dumps(snap)))
+        if self.compact_journal: self.journal.compact(snap["offset"])  # only once the snapshot covering it is saved
+        self._last_snapshot = time.monotonic()
+        return snap
+
+    def maybe_snapshot(self):
+        if time.monotonic() - self._last_snapshot >= self.snapshot_interval: self.snapshot()
+
+    def restore(self) -> Dict:
+        """Positions from the last snapshot plus the journal records appended after it; cost is independent of
+        the trade history before the snapshot."""
+        t0 = time.perf_counter()
+        with raw_transaction() as cur:
+            row = cur.execute("SELECT value FROM settings WHERE key=?", (SNAPSHOT_KEY,)).fetchone()
+        snap = json.loads(row[0]) if row else {"seq": 0, "offset": 0, "positions": {}}
+        positions = {sym: dict(_new_position(), qty=p["qty"], avg=p["avg"], trail=p["trail"], sold_levels=set(p["sold_levels"]))
+                     for sym, p in snap["positions"].items()}
+        recs, _ = read_records(self.journal.path, snap["offset"])
+        if recs and recs[0]["seq"] != snap["seq"] + 1:
+            log.warning(f"Journal does not continue snapshot seq {snap['seq']} (found {recs[0]['seq']}); replaying it whole.")
+            positions, recs = {}, read_records(self.journal.path)[0]
+        self.positions = replay(positions, recs)
+        self._arm_all()
+        return {"snapshot_seq": snap["seq"], "replayed": len(recs), "positions": len(self.positions),
+                "ms": (time.perf_counter() - t0) * 1000.0}
+
+    def set_take_profits(self, steps): self.take_profits = sorted(steps, key=lambda x: x[0]); self._arm_all()
+
+    def set_risk(self, stop_pct: Optional[float], trail_pct: Optional[float], enabled: bool = True):
+        """Stop-loss / trailing-stop percentages (None = off) applied by on_price to every open position."""
+        self.stop_pct = stop_pct; self.trail_pct = trail_pct; self.auto_risk = enabled
+        self._arm_all()
+
+    def _arm_all(self):
+        for sym in list(self.positions): self._arm(sym)
+
+    def _arm(self, symbol: str):
+        """Recompute the prices at which a tick on symbol can change anything."""
+        pos = self.positions.get(symbol)
+        if not self.auto_risk or not pos or self._free_qty(pos) <= 0:
+            self._triggers.pop(symbol, None); return
+        lo, hi, avg = 0.0, float("inf"), pos["avg"]
+        if self.stop_pct is not None: lo = max(lo, avg * (1 - abs(self.stop_pct) / 100.0))
+        if self.trail_pct is not None:
+            high = pos.get("trail")
+            if high is None: hi = 0.0  # first tick seeds the trailing high
+            else: lo = max(lo, high * (1 - abs(self.trail_pct) / 100.0)); hi = min(hi, high)
+        sold = pos.get("sold_levels", set())
+        nxt = next((lvl for lvl, _ in self.take_profits if lvl not in sold), None)
+        if nxt is not None: hi = min(hi, avg * (1 + nxt / 100.0))
+        eps = 1e-9  # widen both bounds so rounding never skips a boundary the percentage checks would hit
+        self._triggers[symbol] = (lo * (1 + eps), hi * (1 - eps))
+
+    def on_price(self, symbol: str, price: float):
+        """Real-time price for one symbol (tick callback). Only prices crossing the symbol's triggers are evaluated."""
+        self.risk_stats["ticks"] += 1
+        trig = self._triggers.get(symbol)
+        if trig is None or trig[0] < price < trig[1]: return
+        t0 = time.perf_counter(); self.risk_stats["checks"] += 1
+        with self._lock:
+            sells = self.risk_stats["sells"]
+            if self.stop_pct is not None: self.apply_stop_loss(symbol, self.stop_pct, price=price)
+            if self.trail_pct is not None: self.apply_trailing_stop(symbol, self.trail_pct, price=price)
+            self.apply_take_profits(symbol, price=price)
+            self._arm(symbol)
+        if self.risk_stats["sells"] > sells: self.risk_latency_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    def poll_prices(self, symbols: Optional[Iterable[str]] = None):
+        """Fallback for positions without a real-time feed (mock mode, or ticks not flowing): push each one's
+        last bar. ``symbols`` limits the poll to those (default: every armed position)."""
+        for sym in list(self._triggers) if symbols is None else [s for s in symbols if s in self._triggers]:
+            last = self._last_price(sym)
+            if last is not None: self.on_price(sym, last)
+
+    def open_symbols(self) -> List[str]:
+        with self._lock: return [sym for sym, p in self.positions.items() if p["qty"] > 0]
+
+    def latency_summary(self, which: str = "risk") -> Dict[str, float]:
+        """p50/p99/max of tick -> SELL submitted ("risk") or order submit -> ack ("ack"), in ms."""
+        lat = np.asarray(self.risk_latency_ms if which == "risk" else self.ack_latency_ms)
+        if not len(lat): return {"n": 0}
+        return {"n": len(lat), "p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99)), "max_ms": float(lat.max())}
 
     def _last_price(self, symbol: str) -> Optional[float]:
-        with get_session() as s:
-            return s.execute(select(Candle.close).where(Candle.symbol==symbol, Candle.tf=="1m").order_by(Candle.ts.desc())).scalars().first()
+        close = load_recent(symbol, "1m", 1)["close"]
+        return float(close[-1]) if len(close) else None
+
+    @staticmethod
+    def _free_qty(pos: Dict) -> int:
+        return pos["qty"] - pos.get("pending", 0)  # shares not already promised to a working SELL
+
+    def submit(self, symbol: str, side: str, qty: int, price: Optional[float]=None, tp: Optional[float]=None) -> Future:
+        """Queue an order for the execution thread; the Future resolves to the broker's OrderResult.
+        ``tp`` is the take-profit level the order realizes (journaled so a restart knows the level was taken)."""
+        side = side.upper(); fut: Future = Future()
+        with self._lock:
+            if side == "SELL":
+                pos = self.positions.get(symbol)
+                if pos is not None: pos["pending"] = pos.get("pending", 0) + qty
+                self.risk_stats["sells"] += 1
+            self.order_stats["submitted"] += 1
+        item = (symbol, side, qty, price, tp, fut, time.perf_counter())
+        if self._exec is None: self._inline.append(item)
+        else: self._orders.put(item)
+        return fut
 
     def place_order(self, symbol: str, side: str, qty: int, price: Optional[float]=None):
-        res = self.broker.place_order(symbol, side, qty, price)
-        with get_session() as s:
-            s.merge(Order(order_id=res.order_id, symbol=symbol, side=side, qty=qty, price=res.price, status=res.status, ts=int(time.time()*1000)))
-            if res.status == "FILLED":
-                if side.upper() == "BUY":
-                    pos = self.positions.get(symbol, {"qty":0,"avg":0.0,"trail":None,"sold_levels":set()})
-                    new_qty = pos["qty"] + qty
-                    new_avg = (pos["avg"]*pos["qty"] + res.price*qty)/max(1, new_qty)
-                    pos.update({"qty":new_qty, "avg":new_avg})
-                    self.positions[symbol] = pos
-                    s.merge(Trade(trade_id=str(uuid.uuid4()), order_id=res.order_id, symbol=symbol, qty=qty, price=res.price, pnl=0.0, ts=int(time.time()*1000)))
-                else:
-                    pos = self.positions.get(symbol, {"qty":0,"avg":0.0,"trail":None,"sold_levels":set()})
-                    new_qty = pos["qty"] - qty
-                    pnl = (res.price - pos["avg"]) * qty
-                    pos.update({"qty":max(0,new_qty)})
-                    if pos["qty"] == 0:
-                        pos["avg"] = 0.0; pos["sold_levels"] = set(); pos["trail"] = None
-                    self.positions[symbol] = pos
-                    s.merge(Trade(trade_id=str(uuid.uuid4()), order_id=res.order_id, symbol=symbol, qty=-qty, price=res.price, pnl=pnl, ts=int(time.time()*1000)))
-            s.commit()
-        log.info(f"Order {res.order_id} {side} {symbol} x{qty} @ {res.price} -> {res.status}")
-        return res
-
-    def apply_stop_loss(self, symbol: str, stop_pct: float):
-        pos = self.positions.get(symbol)
-        if not pos or pos["qty"] <= 0: return
-        last = self._last_price(symbol)
-        if last is None: return
-        if (last - pos["avg"]) / pos["avg"] * 100.0 <= -abs(stop_pct):
-            self.place_order(symbol, "SELL", pos["qty"])
+        """Blocking submit()."""
+        fut = self.submit(symbol, side, qty, price)
+        if self._exec is None: self.settle()
+        return fut.result()
 
-    def apply_trailing_stop(self, symbol: str, trail_pct: float):
-        pos = self.positions.get(symbol)
-        if not pos or pos["qty"] <= 0: return
-        last = self._last_price(symbol)
-        if last is None: return
-        high = pos.get("trail")
-        if high is None or last > high: pos["trail"] = last
-        drawdown = (last - pos["trail"]) / pos["trail"] * 100.0 if pos["trail"] else 0.0
-        if drawdown <= -abs(trail_pct): self.place_order(symbol, "SELL", pos["qty"])
-
-    def apply_take_profits(self, symbol: str):
+    def _run_orders(self):
+        while True:
+            item = self._orders.get()
+            if item is None:
+                self._orders.task_done(); return
+            try: self._execute(item)
+            finally: self._orders.task_done()
+
+    def _execute(self, item):
+        symbol, side, qty, price, tp, fut, t0 = item
+        try:
+            res = self.broker.place_order(symbol, side, qty, price)
+            self._apply_result(symbol, side, qty, res, tp)
+            self.ack_latency_ms.append((time.perf_counter() - t0) * 1000.0)
+            fut.set_result(res)
+        except Exception as e:
+            with self._lock: self._release(symbol, side, qty); self._arm(symbol)
+            self.order_stats["failed"] += 1; log.error(f"Order {side} {symbol} x{qty} failed: {e}")
+            fut.set_exception(e)
+
+    def _release(self, symbol: str, side: str, qty: int):
         pos = self.positions.get(symbol)
-        if not pos or pos["qty"] <= 0 or not self.take_profits: return
-        last = self._last_price(symbol)
-        if last is None: return
-        gain = (last - pos["avg"]) / pos["avg"] * 100.0
-        for lvl, ratio in self.take_profits:
-            if gain >= lvl and lvl not in pos.get("sold_levels", set()):
-                qty_to_sell = max(1, int(pos["qty"] * ratio))
-                self.place_order(symbol, "SELL", qty_to_sell)
-                pos.setdefault("sold_levels", set()).add(lvl)
+        if side == "SELL" and pos is not None: pos["pending"] = max(0, pos.get("pending", 0) - qty)
+
+    def _apply_result(self, symbol: str, side: str, qty: int, res, tp: Optional[float] = None):
+        now = int(time.time()*1000)
+        with self._lock:
+            self._release(symbol, side, qty)
+            order = {"type":"order", "order_id":res.order_id, "symbol":symbol, "side":side, "qty":qty,
+                     "price":res.price, "status":res.status, "ts":now}
+            if tp is not None: order["tp"] = tp
+            self.journal.append(order)
+            filled = qty if res.status == "FILLED" and res.filled_qty is None else (res.filled_qty or 0)
+            if filled > 0:
+                self.order_stats["filled" if filled == qty else "partial"] += 1
+                pos = self.positions.get(symbol) or _new_position()
+                signed = filled if side == "BUY" else -filled
+                pnl = _apply_fill(pos, signed, res.price)
+                self.positions[symbol] = pos
+                self.journal.append({"type":"trade", "trade_id":str(uuid.uuid4()), "order_id":res.order_id, "symbol":symbol,
+                                     "qty":signed, "price":res.price, "pnl":pnl, "ts":now})
+            else:
+                self.order_stats["rejected"] += 1
+            self._arm(symbol)
+        log.debug("Order %s %s %s x%s @ %s -> %s", res.order_id, side, symbol, qty, res.price, res.status)  # every order is in the journal
+
+    def apply_stop_loss(self, symbol: str, stop_pct: float, price: Optional[float] = None):
+        with self._lock:  # fills land on the execution thread
+            pos = self.positions.get(symbol)
+            if not pos or self._free_qty(pos) <= 0: return
+            last = self._last_price(symbol) if price is None else price
+            if last is None: return
+            if (last - pos["avg"]) / pos["avg"] * 100.0 <= -abs(stop_pct):
+                self.submit(symbol, "SELL", self._free_qty(pos))
+
+    def apply_trailing_stop(self, symbol: str, trail_pct: float, price: Optional[float] = None):
+        with self._lock:  # fills land on the execution thread
+            pos = self.positions.get(symbol)
+            if not pos or self._free_qty(pos) <= 0: return
+            last = self._last_price(symbol) if price is None else price
+            if last is None: return
+            high = pos.get("trail")
+            if high is None or last > high:
+                pos["trail"] = last
+                logged = pos.get("trail_logged")  # journaled so a restart resumes near this high, not the snapshot's
+                if high is None or logged is None or last >= logged * (1 + TRAIL_JOURNAL_STEP):
+                    self.journal.append({"type":"trail", "symbol":symbol, "price":last, "ts":int(time.time()*1000)})
+                    pos["trail_logged"] = last
+            drawdown = (last - pos["trail"]) / pos["trail"] * 100.0 if pos["trail"] else 0.0
+            if drawdown <= -abs(trail_pct): self.submit(symbol, "SELL", self._free_qty(pos))
+
+    def apply_take_profits(self, symbol: str, price: Optional[float] = None):
+        with self._lock:  # fills land on the execution thread
+            pos = self.positions.get(symbol)
+            if not pos or self._free_qty(pos) <= 0 or not self.take_profits: return
+            last = self._last_price(symbol) if price is None else price
+            if last is None: return
+            gain = (last - pos["avg"]) / pos["avg"] * 100.0
+            for lvl, ratio in self.take_profits:
+                free = self._free_qty(pos)
+                if free > 0 and gain >= lvl and lvl not in pos.get("sold_levels", set()):
+                    qty_to_sell = max(1, int(free * ratio))
+                    self.submit(symbol, "SELL", qty_to_sell, tp=lvl)
+                    pos.setdefault("sold_levels", set()).add(lvl)
 
     def decide(self, human_score: float, ai_score: float, buy_th: int, sell_th: int):
         final = (human_score + ai_score) / 2.0
@@ -0,0 +1,159 @@
+
+import hashlib, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import WF_CACHE_DIR
+from app.core.utils import get_logger
+from app.services.backtester import DEFAULTS, FIELDS, METRICS, _simulate, tp_text
+from app.services.replay_engine import _bars
+
+log = get_logger("walk_forward")
+
+CACHE_VERSION = 1  # bump when backtester results change for the same inputs; old entries are then never addressed
+
+Window = Tuple[int, int, int]  # train start, test start, test end: bar indices into one symbol's series
+
+def windows(n_bars: int, train: int, test: int, step: Optional[int] = None) -> List[Window]:
+    """Rolling train/test windows anchored at the first bar, ``step`` (default ``test``) bars apart.
+    Only complete windows are returned, so appending bars never moves a window, it only adds new ones."""
+    step = step or test
+    return [(lo, lo + train, lo + train + test) for lo in range(0, n_bars - train - test + 1, step)]
+
+def param_key(combo: Dict) -> str:
+    return json.dumps({k: tp_text(combo[k]) if k == "take_profits" else None if combo[k] is None else float(combo[k])
+                       for k in DEFAULTS}, sort_keys=True)
+
+class ResultCache:
+    """Backtest metrics on disk, content-addressed: one JSON file per segment key (symbol, bar range, digest of
+    the bars and scores in it, run options) mapping param_key -> metric row. Entries are never invalidated;
+    changed data or options simply address a different file."""
+
+    def __init__(self, root=WF_CACHE_DIR):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path: return self.root / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Dict[str, Dict]:
+        try: return json.loads(self._path(key).read_text(encoding="utf-8"))
+        except FileNotFoundError: return {}
+
+    def store(self, key: str, rows: Dict[str, Dict]):
+        path = self._path(key); path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(rows, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)  # readers see the old file or the new one, never a torn write
+
+@dataclass
+class WalkForwardResult:
+    windows: pd.DataFrame   # one row per (symbol, window): train/test ts bounds, chosen params, test metrics
+    report: Dict = field(default_factory=dict)
+
+def _pack(bars: pd.DataFrame, n_sym: int):
+    """Each symbol's bars back to back in one shared (field x bars) block; returns (shm, ts, offsets)."""
+    bars = bars.sort_values(["sym", "ts"], kind="stable")
+    counts = np.bincount(bars["sym"].to_numpy(dtype=np.int64), minlength=n_sym)  # an empty column is object dtype
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64).tolist()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(bars)) * len(FIELDS) * 8)
+    try:
+        block = np.ndarray((len(FIELDS), len(bars)), dtype=np.float64, buffer=shm.buf)
+        for i, name in enumerate(FIELDS[:4]): block[i] = bars[name].to_numpy()
+        block[4] = (bars["human"].to_numpy() + bars["ai"].to_numpy()) / 2.0
+        del block
+    except BaseException:
+        shm.close(); shm.unlink(); raise
+    return shm, bars["ts"].to_numpy().astype(np.int64), offsets
+
+def _run_segment(shm_name: str, n_total: int, lo: int, hi: int, combos: List[Dict], qty: int, capital: float,
+                 slippage_bps: float, intrabar: bool) -> List[Dict]:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((len(FIELDS), n_total), dtype=np.float64, buffer=shm.buf)
+        rows = _simulate(block[:, lo:hi, None], combos, qty, capital, slippage_bps, intrabar)
+        del block
+        return [{m: r[m] for m in METRICS} for r in rows]
+    finally:
+        shm.close()
+
+def walk_forward(symbols: Sequence[str], grid: Sequence[Dict], train: int = 3000, test: int = 1000,
+                 step: Optional[int] = None, tf: str = "1m", profile: str = "scalp", mode: str = "Normal",
+                 objective: str = "return_pct", qty: int = 10, capital: float = 10_000_000.0,
+                 slippage_bps: float = 0.0, intrabar: bool = False, workers: Optional[int] = None,
+                 cache: Optional[ResultCache] = None) -> WalkForwardResult:
+    """Walk-forward optimization over stored candles: per symbol and rolling window, every ``grid`` combination
+    is backtested on the train bars, the one with the highest ``objective`` is then backtested on the test bars.
+
+    Each segment result is cached under its content (see ResultCache), so after update_data only windows whose
+    bars changed or are new get computed. Uncached segments of all symbols and windows run across ``workers``
+    processes that share the scored bars read-only.
+    """
+    combos = [dict(DEFAULTS, **g) for g in grid]; keys = [param_key(c) for c in combos]
+    cache = cache or ResultCache()
+    stats = {phase: {"segments": 0, "hits": 0, "misses": 0} for phase in ("train", "test")}
+    run = (qty, capital, slippage_bps, intrabar)
+    t0 = time.perf_counter()
+    bars = _bars(symbols, tf, profile, mode, None, None)
+    shm, ts, offsets = _pack(bars, len(symbols)); del bars
+    block = np.ndarray((len(FIELDS), offsets[-1]), dtype=np.float64, buffer=shm.buf)
+    t_load = time.perf_counter() - t0
+
+    def segment_key(s: int, lo: int, hi: int) -> str:
+        a, b = offsets[s] + lo, offsets[s] + hi
+        data = hashlib.blake2b(ts[a:b].tobytes(), digest_size=16)
+        data.update(block[:, a:b].tobytes())
+        spec = {"v": CACHE_VERSION, "symbol": symbols[s], "tf": tf, "ts": [int(ts[a]), int(ts[b - 1])],
+                "data": data.hexdigest(), "run": list(run)}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+    def evaluate(phase: str, segs: List[Tuple[int, int, int, List[int]]], ex) -> List[Dict[str, Dict]]:
+        """Metric rows per segment (symbol, lo, hi, combo indices), computing only what the cache lacks."""
+        st = stats[phase]; out: List[Dict[str, Dict]] = []; todo = []
+        for s, lo, hi, idx in segs:
+            key = segment_key(s, lo, hi); have = cache.load(key)
+            missing = [i for i in idx if keys[i] not in have]
+            st["segments"] += 1; st["hits"] += len(idx) - len(missing); st["misses"] += len(missing)
+            out.append(have)
+            if missing: todo.append((len(out) - 1, key, missing, (offsets[s] + lo, offsets[s] + hi)))
+        args = [(shm.name, offsets[-1], a, b, [combos[i] for i in missing]) + run for _, _, missing, (a, b) in todo]
+        if not args: results = []
+        else: results = (map if ex is None else ex.map)(_run_segment, *zip(*args))
+        for (pos, key, missing, _), rows in zip(todo, results):
+            out[pos].update(zip((keys[i] for i in missing), rows)); cache.store(key, out[pos])
+        return out
+
+    wins = [(s, n, w) for s in range(len(symbols))
+            for n, w in enumerate(windows(offsets[s + 1] - offsets[s], train, test, step))]
+    workers = workers or os.cpu_count() or 1
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        t1 = time.perf_counter()
+        fitted = evaluate("train", [(s, lo, mid, list(range(len(combos)))) for s, _, (lo, mid, _) in wins], ex)
+        best = [max(range(len(combos)), key=lambda i: (np.nan_to_num(rows[keys[i]][objective], nan=-np.inf), -i))
+                for rows in fitted]
+        tested = evaluate("test", [(s, mid, hi, [b]) for (s, _, (_, mid, hi)), b in zip(wins, best)], ex)
+        t_eval = time.perf_counter() - t1
+        t_of = lambda s, i: int(ts[offsets[s] + i])
+        rows = [dict(symbol=symbols[s], window=n, train_from=t_of(s, lo), train_to=t_of(s, mid - 1),
+                     test_from=t_of(s, mid), test_to=t_of(s, hi - 1),
+                     **{k: tp_text(v) if k == "take_profits" else v for k, v in combos[b].items()},
+                     **{f"train_{objective}": fit[keys[b]][objective]}, **res[keys[b]])
+                for (s, n, (lo, mid, hi)), b, fit, res in zip(wins, best, fitted, tested)]
+    finally:
+        if ex is not None: ex.shutdown()
+        del block
+        shm.close(); shm.unlink()
+
+    df = pd.DataFrame(rows)
+    hits = sum(st["hits"] for st in stats.values()); total = hits + sum(st["misses"] for st in stats.values())
+    report = {"symbols": len(symbols), "windows": len(wins), "combinations": len(combos),
+              "evaluations": total, "hits": hits, "misses": total - hits, "hit_rate": hits / total if total else 0.0,
+              **{f"{phase}_hit_rate": st["hits"] / max(1, st["hits"] + st["misses"]) for phase, st in stats.items()},
+              "load_s": round(t_load, 3), "eval_s": round(t_eval, 3), "workers": workers,
+              "oos_return_pct": float(df["return_pct"].mean()) if len(df) else 0.0}
+    log.info(f"Walk-forward over {len(wins)} windows x {len(combos)} combinations: {report['misses']} computed, "
+             f"cache hit rate {report['hit_rate']:.1%} ({report['eval_s']:.2f}s).")
+    return WalkForwardResult(df, report)
@@ -1,6 +1,6 @@
 
 from PyQt5 import QtWidgets
-from app.services.ai_assessor import ai_score
+from app.services.ai_assessor import ai_score, DEFAULT_FEATURES
 
 class AITab(QtWidgets.QWidget):
     def __init__(self):
@@ -13,6 +13,5 @@ class AITab(QtWidgets.QWidget):
         self.btn_test.clicked.connect(self.calc)
 
     def calc(self):
-        features = {"volatility":0.02, "spread":0.15, "momentum":0.6, "trend":0.55}
-        score = ai_score(features, human_score=75, mode=self.combo.currentText())
+        score = ai_score(DEFAULT_FEATURES, human_score=75, mode=self.combo.currentText())
         self.lbl.setText(f"AI Score: {score}")
@@ -1,6 +1,8 @@
 
 from PyQt5 import QtWidgets
 from app.services.kiwoom_api import KiwoomAPI
+from app.services.condition_dsl import load_presets, save_preset
+from app.services.condition_engine import evaluate, preset_lookback
 
 class ConditionsTab(QtWidgets.QWidget):
     def __init__(self):
@@ -8,13 +10,21 @@ class ConditionsTab(QtWidgets.QWidget):
         self.api = KiwoomAPI()
         v = QtWidgets.QVBoxLayout(self)
 
+        # engine-side presets: condition_dsl expressions from the condition_presets table
         self.grp = QtWidgets.QGroupBox("Presets (engine-side)")
-        h = QtWidgets.QHBoxLayout(self.grp)
-        self.rb_scalp = QtWidgets.QRadioButton("Scalp (1~3m)")
-        self.rb_day   = QtWidgets.QRadioButton("Day Trade (3~15m)")
-        self.rb_mid   = QtWidgets.QRadioButton("Mid Trade (15~60m + Daily)")
-        self.rb_scalp.setChecked(True)
-        for rb in [self.rb_scalp, self.rb_day, self.rb_mid]: h.addWidget(rb)
+        form = QtWidgets.QFormLayout(self.grp)
+        self.cmb_preset = QtWidgets.QComboBox(); self.cmb_preset.setEditable(True)  # a new name saves a new preset
+        self.ed_expr = QtWidgets.QLineEdit()
+        self.ed_expr.setPlaceholderText("e.g. volume_spike(vol, 20, 2) and ema(close, 5) crosses_above ema(close, 20)")
+        self.btn_save_preset = QtWidgets.QPushButton("Save Preset")
+        self.ed_symbol = QtWidgets.QLineEdit("A005930")
+        self.cmb_tf = QtWidgets.QComboBox(); self.cmb_tf.addItems(["1m","3m","15m","60m","1d"])
+        self.btn_eval = QtWidgets.QPushButton("Evaluate Latest Bar")
+        self.lbl_eval = QtWidgets.QLabel("-")
+        h = QtWidgets.QHBoxLayout()
+        for w in [self.ed_symbol, self.cmb_tf, self.btn_eval]: h.addWidget(w)
+        form.addRow("Preset", self.cmb_preset); form.addRow("Expression", self.ed_expr)
+        form.addRow("", self.btn_save_preset); form.addRow("Symbol / TF", h); form.addRow("Result", self.lbl_eval)
         v.addWidget(self.grp)
 
         g2 = QtWidgets.QGroupBox("Kiwoom Conditions")
@@ -29,9 +39,42 @@ class ConditionsTab(QtWidgets.QWidget):
 
         self.btn_fetch.clicked.connect(self.fetch)
         self.btn_sub.clicked.connect(self.subscribe)
+        self.cmb_preset.currentTextChanged.connect(self.show_preset)
+        self.btn_save_preset.clicked.connect(self.save_preset)
+        self.btn_eval.clicked.connect(self.evaluate_preset)
+        self.reload_presets()
 
         self.api.on_real_condition(self._on_real_cond)
 
+    def reload_presets(self, select: str = ""):
+        self.presets = load_presets()
+        self.cmb_preset.blockSignals(True)
+        self.cmb_preset.clear(); self.cmb_preset.addItems(list(self.presets))
+        self.cmb_preset.blockSignals(False)
+        if select: self.cmb_preset.setCurrentText(select)
+        self.show_preset(self.cmb_preset.currentText())
+
+    def show_preset(self, name: str):
+        if name in self.presets: self.ed_expr.setText(self.presets[name])
+
+    def save_preset(self):
+        name, expr = self.cmb_preset.currentText().strip(), self.ed_expr.text().strip()
+        if not name or not expr:
+            QtWidgets.QMessageBox.warning(self, "Warn", "Enter a preset name and an expression."); return
+        try: save_preset(name, expr)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, "Invalid expression", str(e)); return
+        self.reload_presets(select=name)
+
+    def evaluate_preset(self):
+        name, sym, tf = self.cmb_preset.currentText().strip(), self.ed_symbol.text().strip(), self.cmb_tf.currentText()
+        if name not in self.presets:
+            QtWidgets.QMessageBox.warning(self, "Warn", "Save the preset first."); return
+        sig = evaluate(sym, tf, name, latest_only=True)
+        if sig.empty: self.lbl_eval.setText(f"{sym} {tf}: no bars"); return
+        self.lbl_eval.setText(f"{name} on {sym} {tf}: {'SIGNAL' if bool(sig.iloc[-1]) else 'no signal'} "
+                              f"(lookback {preset_lookback(name)} bars)")
+
     def fetch(self):
         self.lst.clear()
         for c in self.api.fetch_condition_list(): self.lst.addItem(c)
@@ -37,6 +37,7 @@ class DataTab(QtWidgets.QWidget):
         symbols = [s.strip() for s in self.ed_symbols.text().split(",") if s.strip()]
         years = int(self.ed_years.value())
         w = Worker(initial_load, symbols, years=years)
+        w.kwargs["progress"] = w.progress.emit  # emitted from the writer thread; Qt queues it to the GUI
         self._attach_worker(w)
 
     def do_update(self):
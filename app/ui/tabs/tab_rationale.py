@@ -2,6 +2,7 @@
 from PyQt5 import QtWidgets, QtCore
 import pandas as pd
 from app.core.db import get_session, RationaleItem, RationaleWeight
+from app.services.rationale_service import invalidate_plans
 from sqlalchemy import delete
 
 class RationaleTab(QtWidgets.QWidget):
@@ -88,4 +89,5 @@ class RationaleTab(QtWidgets.QWidget):
                     w = float(row.get(col, 0.0) or 0.0)
                     s.add(RationaleWeight(profile=prof, item_id=item.id, weight=w))
             s.commit()
+        invalidate_plans()
         QtWidgets.QMessageBox.information(self, "Saved", "Weights saved & normalized per profile.")
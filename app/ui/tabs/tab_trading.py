@@ -1,9 +1,16 @@
 
+import time
 from PyQt5 import QtWidgets, QtCore
 from app.services.trade_engine import TradeEngine
 from app.services.kiwoom_api import KiwoomAPI
-from app.services.ai_assessor import ai_score
+from app.services.ai_assessor import ai_score, DEFAULT_FEATURES
 from app.services.rationale_service import compute_human_score
+from app.services.bar_aggregator import BarAggregator
+from app.core import streaming
+from app.core.config import get
+from app.core.order_book import ASK, DEPTH
+
+TICK_STALE_S = 5.0  # an open position without a tick for this long is checked against its last bar instead
 
 def parse_tp_steps(text: str):
     steps = []
@@ -20,10 +27,13 @@ class TradingTab(QtWidgets.QWidget):
         super().__init__()
         grid = QtWidgets.QGridLayout(self)
 
-        self.buy_view  = QtWidgets.QTableWidget(5, 2)
-        self.sell_view = QtWidgets.QTableWidget(5, 2)
+        self.buy_view  = QtWidgets.QTableWidget(DEPTH, 2)
+        self.sell_view = QtWidgets.QTableWidget(DEPTH, 2)
         self.buy_view.setHorizontalHeaderLabels(["Bid Price","Bid Qty"])
         self.sell_view.setHorizontalHeaderLabels(["Ask Price","Ask Qty"])
+        for view in (self.buy_view, self.sell_view):  # cells are created once; renders only setText
+            for r in range(DEPTH):
+                for c in range(2): view.setItem(r, c, QtWidgets.QTableWidgetItem(""))
 
         grid.addWidget(QtWidgets.QLabel("Buy Realtime"), 0, 0)
         grid.addWidget(QtWidgets.QLabel("Sell Realtime"), 0, 1)
@@ -67,48 +77,91 @@ class TradingTab(QtWidgets.QWidget):
 
         self.api = KiwoomAPI()
         self.engine = TradeEngine(self.api)
+        self.bars = BarAggregator(on_bar=streaming.on_bar)  # closed bars advance the indicator states the score reads
+        self.api.on_real_tick(self.bars.on_tick)
+        self.api.on_real_tick(self.on_tick)
+        self.fed = set()        # symbols registered for real-time ticks
+        self.connected = False  # registrations made before login are replayed once the broker connects
+        self.last_tick = {}     # symbol -> time.monotonic() of its last tick
+        self.feed(self.engine.open_symbols())  # positions restored from the snapshot/journal stream from the start
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.bars.stop)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.engine.close)
 
         self.btn_start.clicked.connect(self.engine.start)
         self.btn_stop.clicked.connect(self.engine.stop)
         self.btn_eval.clicked.connect(self.evaluate_once)
         self.btn_apply_tp.clicked.connect(self.apply_tp_steps)
+        self.dsb_stop.valueChanged.connect(self.sync_risk)
+        self.dsb_trail.valueChanged.connect(self.sync_risk)
+        self.chk_auto_stops.toggled.connect(self.sync_risk)
+        self.sync_risk()
+
+        # depth is pushed into api.books as it arrives; the view redraws changed levels at most orderbook_fps times a second
+        self.book_symbol = None
+        self.ed_symbol.editingFinished.connect(self.watch_book)
+        self.watch_book()
+        self.book_timer = QtCore.QTimer(self)
+        self.book_timer.timeout.connect(self.render_book)
+        self.book_timer.start(int(1000 / max(1, int(get("orderbook_fps", 20)))))
 
         self.timer = QtCore.QTimer(self)
         self.timer.timeout.connect(self.heartbeat)
         self.timer.start(1500)
 
-    def refresh_orderbook(self):
-        ob = self.api.get_orderbook(self.ed_symbol.text().strip())
-        asks = ob.get("asks", []); bids = ob.get("bids", [])
-        self.sell_view.setRowCount(len(asks)); self.buy_view.setRowCount(len(bids))
-        for i,(p,q) in enumerate(asks):
-            self.sell_view.setItem(i,0, QtWidgets.QTableWidgetItem(str(p)))
-            self.sell_view.setItem(i,1, QtWidgets.QTableWidgetItem(str(q)))
-        for i,(p,q) in enumerate(bids):
-            self.buy_view.setItem(i,0, QtWidgets.QTableWidgetItem(str(p)))
-            self.buy_view.setItem(i,1, QtWidgets.QTableWidgetItem(str(q)))
+    def watch_book(self):
+        sym = self.ed_symbol.text().strip()
+        if sym == self.book_symbol: return
+        if self.book_symbol: self.api.unregister_orderbook([self.book_symbol])
+        self.book_symbol = sym or None
+        for view in (self.buy_view, self.sell_view):
+            for r in range(DEPTH):
+                for c in range(2): view.item(r, c).setText("")
+        if sym: self.api.register_orderbook([sym]); self.render_book(full=True)
+
+    def render_book(self, full: bool = False):
+        if not self.book_symbol: return
+        levels = self.api.books.drain([self.book_symbol], full=full).get(self.book_symbol, ())
+        for side, lvl, p, q in levels:
+            view, row = (self.sell_view, DEPTH - 1 - lvl) if side == ASK else (self.buy_view, lvl)
+            view.item(row, 0).setText(f"{p:,.0f}" if p else ""); view.item(row, 1).setText(f"{q:,.0f}" if p else "")
 
     def evaluate_once(self):
         sym = self.ed_symbol.text().strip()
         profile = self.cmb_profile.currentText()
-        human, _ = compute_human_score(sym, "1m", profile=profile)
-        features = {"volatility":0.02, "spread":0.15, "momentum":0.6, "trend":0.55}
-        ai = ai_score(features, human_score=human, mode=self.cmb_ai.currentText())
+        human, _ = compute_human_score(sym, "1m", profile=profile, latest_only=True)
+        ai = ai_score(DEFAULT_FEATURES, human_score=human, mode=self.cmb_ai.currentText())
         action, final = self.engine.decide(human, ai, self.spn_buy_th.value(), self.spn_sell_th.value())
         self.lbl_info.setText(f"Human {human} | AI {ai} -> {action} {final:.2f}")
         if action == "BUY":
-            self.engine.place_order(sym, "BUY", self.spn_qty.value())
+            self.engine.submit(sym, "BUY", self.spn_qty.value())
+            self.feed([sym])
         elif action == "SELL":
-            self.engine.place_order(sym, "SELL", self.spn_qty.value())
+            self.engine.submit(sym, "SELL", self.spn_qty.value())
 
     def apply_tp_steps(self):
         steps = parse_tp_steps(self.ed_tp.text())
         self.engine.set_take_profits(steps)
 
+    def sync_risk(self):
+        self.engine.set_risk(self.dsb_stop.value(), self.dsb_trail.value(), enabled=self.chk_auto_stops.isChecked())
+
+    def on_tick(self, sym, ts, price, vol):
+        self.last_tick[sym] = time.monotonic()
+        self.engine.on_price(sym, price)
+
+    def feed(self, symbols):
+        """Register real-time ticks (they drive stops/trail/TP through engine.on_price) for symbols not yet fed."""
+        new = [s for s in symbols if s not in self.fed]
+        if new: self.api.register_real(new); self.fed.update(new)
+
     def heartbeat(self):
-        self.refresh_orderbook()
-        if not self.chk_auto_stops.isChecked(): return
-        sym = self.ed_symbol.text().strip()
-        self.engine.apply_stop_loss(sym, self.dsb_stop.value())
-        self.engine.apply_trailing_stop(sym, self.dsb_trail.value())
-        self.engine.apply_take_profits(sym)
+        if not self.connected and self.api.is_connected():
+            self.connected = True; self.api.resubscribe()  # default book symbol and positions fed before login
+        # every open position gets ticks, whichever way it was opened; the mock has no feed, and a symbol whose
+        # ticks are not arriving is checked against its last bar so it is never left without risk checks
+        held = self.engine.open_symbols()
+        self.feed(held)
+        now = time.monotonic()
+        stale = held if self.api.mode == "mock" else [s for s in held if now - self.last_tick.get(s, float("-inf")) >= TICK_STALE_S]
+        if stale: self.engine.poll_prices(stale)
+        self.engine.maybe_snapshot()
@@ -0,0 +1,40 @@
+"""Shared bar ring cache: latest-bar reads and latest-only scoring vs uncached loads, plus parity with
+load_arrays while bars keep arriving. Run: python -m bench.bar_cache [symbols] [bars]"""
+import sys, time
+import numpy as np
+from bench.common import T0, seed_candles, seed_rationale, best_of
+from app.services.condition_engine import BAR_CACHE, load_arrays, load_recent, evaluate
+from app.services.data_manager import _gen_dummy_ohlcv, _bulk_upsert_candles, update_data
+from app.services.rationale_service import compute_human_score
+
+def main(n_symbols: int = 50, bars: int = 20_000):
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    seed_candles(symbols, bars); seed_rationale()
+    t_db = best_of(lambda: [load_arrays(s, "1m", last_n=1) for s in symbols])
+    BAR_CACHE.warm(symbols)
+    t_cache = best_of(lambda: [load_recent(s, "1m", 1) for s in symbols])
+    print(f"last bar x{n_symbols}: load_arrays {t_db/n_symbols*1e6:.0f}us, cache {t_cache/n_symbols*1e6:.1f}us per read")
+
+    def score(cached):
+        if not cached: BAR_CACHE.invalidate()
+        for s in symbols: compute_human_score(s, "1m", "mid", latest_only=True); evaluate(s, "1m", "mid", latest_only=True)
+    t_cold = best_of(lambda: score(False), 1); t_warm = best_of(lambda: score(True))
+    print(f"latest-only score+screen x{n_symbols}: reload {t_cold*1000:.0f}ms, cached {t_warm*1000:.0f}ms")
+
+    # parity: new 1m bars, re-sent overlapping bars and rollup rewrites all reach the cached tails
+    BAR_CACHE.warm(symbols, ("1m", "3m", "15m"))
+    update_data(symbols[:10])
+    last = int(load_arrays(symbols[0], "1m", last_n=1)["ts"][-1])
+    _bulk_upsert_candles(_gen_dummy_ohlcv(last - 5 * 60_000, 20, "1m", seed=9), symbols[0], "1m")
+    bad = 0
+    for s in symbols:
+        for tf, n in (("1m", 1024), ("1m", 1), ("3m", 300), ("15m", 50)):
+            got, ref = load_recent(s, tf, n), load_arrays(s, tf, last_n=n)
+            bad += any(not np.array_equal(got[c], ref[c]) for c in ref)
+    small = type(BAR_CACHE)(load_arrays, capacity=256, max_bytes=10 * 256 * 48)
+    small.warm(symbols)
+    print(f"capped cache: {len(small._rings)} rings kept, {small.stats['evictions']} evicted")
+    print(f"parity mismatches: {bad}; stats {BAR_CACHE.stats}; {len(BAR_CACHE._rings)} rings, {BAR_CACHE.nbytes/2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
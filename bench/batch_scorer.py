@@ -0,0 +1,26 @@
+"""Universe batch scoring throughput, 1..N worker processes.  Run: python -m bench.batch_scorer [symbols] [bars] [max_workers]"""
+import os, sys, time
+from bench.common import seed_candles, seed_rationale
+from app.core.db import get_session, Theme, ThemeSymbol
+from app.services.batch_scorer import score_universe
+
+def main(n_symbols: int = 100, bars: int = 20_000, max_workers: int = os.cpu_count() or 1):
+    symbols = [f"B{i:05d}" for i in range(n_symbols)]
+    seed_candles(symbols, bars); seed_rationale()
+    with get_session() as s:
+        for t in range(4):
+            th = Theme(theme_name=f"theme{t}"); s.add(th); s.flush()
+            for sym in symbols[t::4]: s.add(ThemeSymbol(theme_id=th.theme_id, symbol=sym))
+        s.commit()
+    ref = None
+    for latest_only in (False, True):
+        for w in sorted({1, max_workers} | {2 ** k for k in range(1, 6) if 2 ** k < max_workers}):
+            t0 = time.perf_counter(); df = score_universe(workers=w, latest_only=latest_only); dt = time.perf_counter() - t0
+            key = df.sort_values(["symbol", "profile"])[["human"]].to_numpy()
+            if not latest_only:
+                assert ref is None or (key == ref).all(); ref = key
+            print(f"latest_only={latest_only!s:5} workers={w:2d}: {n_symbols/dt:8.1f} symbols/s ({dt:.2f}s, {len(df)} rows)")
+    print(df.head(5).to_string(index=False))
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:4]))
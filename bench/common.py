@@ -0,0 +1,35 @@
+"""Scratch DB/archive setup shared by the bench scripts. Import before any app module."""
+import os, tempfile
+_tmp = tempfile.mkdtemp(prefix="stockbot-bench-")
+os.environ.setdefault("STOCKBOT_DB", os.path.join(_tmp, "bench.sqlite"))
+os.environ.setdefault("STOCKBOT_ARCHIVE", os.path.join(_tmp, "candles"))
+os.environ.setdefault("STOCKBOT_JOURNAL", os.path.join(_tmp, "orders.jsonl"))
+os.environ.setdefault("STOCKBOT_LOG", os.path.join(_tmp, "app.log"))
+os.environ.setdefault("STOCKBOT_WF_CACHE", os.path.join(_tmp, "walkforward"))
+
+import time
+from app.core.db import create_all, get_session, RationaleItem, RationaleWeight
+from app.services.data_manager import _gen_dummy_ohlcv, _bulk_upsert_candles
+
+T0 = 1_599_999_960_000  # minute aligned
+
+def seed_candles(symbols, bars: int, tf: str = "1m"):
+    create_all()
+    for i, sym in enumerate(symbols):
+        _bulk_upsert_candles(_gen_dummy_ohlcv(T0, bars, tf, seed=i), sym, tf)
+
+def seed_rationale(profiles=("scalp", "day", "mid")):
+    from app.services.rationale_service import EVAL_MAP
+    create_all()
+    with get_session() as s:
+        for i, name in enumerate(EVAL_MAP):
+            item = RationaleItem(name=name, note="", idx=i + 1); s.add(item); s.flush()
+            for p, prof in enumerate(profiles):
+                s.add(RationaleWeight(profile=prof, item_id=item.id, weight=float((i + p) % 5 + 1)))
+        s.commit()
+
+def best_of(fn, n: int = 3) -> float:
+    best = float("inf")
+    for _ in range(n):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
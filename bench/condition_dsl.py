@@ -0,0 +1,47 @@
+"""DSL presets (stored in the DB, run by condition_engine.evaluate) vs the hand-written pandas screens they
+replaced. Run: python -m bench.condition_dsl [bars] [symbols]"""
+import sys
+from bench.common import seed_candles, best_of
+from app.core.indicators import ema, golden_cross, macd, sma, volume_spike
+from app.services import condition_engine as ce
+from app.services import condition_dsl as dsl
+
+HAND = {  # the former Python presets, ANDed like the old evaluate()
+    "scalp": lambda df: volume_spike(df["vol"], 20, 2.0).fillna(False) & golden_cross(ema(df["close"], 5), ema(df["close"], 20)).fillna(False),
+    "day":   lambda df: golden_cross(sma(df["close"], 10), sma(df["close"], 60)).fillna(False),
+    "mid":   lambda df: (lambda m, s, _: m > s)(*macd(df["close"])).fillna(False),
+}
+
+def main(bars: int = 200_000, n_symbols: int = 20):
+    symbols = [f"P{i:03d}" for i in range(n_symbols)]
+    seed_candles(symbols, bars)
+    presets = dsl.seed_presets()
+    df = ce.load_df(symbols[0], "1m")
+    prog = dsl.compile_exprs(presets)
+    print(f"{len(presets)} presets -> {len(prog.steps)} DAG nodes (lookback {prog.lookback} bars)")
+    for name, expr in presets.items():
+        hand = HAND[name](df)
+        mine = ce.evaluate(symbols[0], "1m", name)
+        assert (hand.to_numpy() == mine.to_numpy()).all(), name
+        latest = ce.evaluate(symbols[0], "1m", name, latest_only=True)
+        assert bool(latest.iloc[-1]) == bool(mine.iloc[-1]), name
+        t_hand = best_of(lambda: HAND[name](ce.load_df(symbols[0], "1m")))
+        t_dsl = best_of(lambda: ce.evaluate(symbols[0], "1m", name))
+        print(f"{name:6s} hand={t_hand*1000:6.1f}ms  dsl={t_dsl*1000:6.1f}ms  [{expr}]")
+    separate = [dsl.Program({n: e}) for n, e in presets.items()]
+    t_all = best_of(lambda: prog.run(df)); t_each = best_of(lambda: [p.run(df) for p in separate])
+    print(f"all presets on one frame: shared DAG={t_all*1000:.1f}ms  separately={t_each*1000:.1f}ms")
+    expr = presets["scalp"]
+    panel = dsl.evaluate_panel(symbols, "1m", expr)
+    loop = {s: dsl.evaluate_expr(s, "1m", expr) for s in symbols}
+    assert all((panel[s].to_numpy() == loop[s].to_numpy()).all() for s in symbols)
+    t_panel = best_of(lambda: dsl.evaluate_panel(symbols, "1m", expr))
+    t_loop = best_of(lambda: [ce.evaluate(s, "1m", "scalp") for s in symbols])
+    print(f"{n_symbols} symbols: panel={t_panel*1000:.1f}ms  per-symbol evaluate loop={t_loop*1000:.1f}ms")
+
+    dsl.save_preset("scalp", "volume_spike(vol, 20, 3)")  # an edited preset is what evaluate runs from then on
+    assert (ce.evaluate(symbols[0], "1m", "scalp").to_numpy() == volume_spike(df["vol"], 20, 3.0).fillna(False).to_numpy()).all()
+    print(f"edited preset picked up by evaluate (lookback {ce.preset_lookback('scalp')})")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
@@ -0,0 +1,65 @@
+"""Engine restart: snapshot + journal-tail replay vs full journal replay, and state equality (qty, avg, trailing
+high, TP levels) between the live engine, the restored engine and a full replay; journal size before and after
+the compacting snapshot. Run: python -m bench.engine_snapshot [ticks] [symbols]"""
+import os, sys, time
+import numpy as np
+from bench.common import best_of  # noqa: F401  (temp DB/journal)
+from app.core.config import JOURNAL_PATH
+from app.core.db import create_all
+from app.services.kiwoom_api import OrderResult
+from app.services.order_journal import read_records
+from app.services.trade_engine import TRAIL_JOURNAL_STEP, TradeEngine, replay
+
+class TapeBroker:
+    def __init__(self): self.price = {}; self.n = 0
+    def place_order(self, symbol, side, qty, price=None):
+        self.n += 1
+        return OrderResult(order_id=f"o{self.n}", status="FILLED", price=self.price[symbol])
+
+def state(positions):
+    return {s: (p["qty"], p["avg"], p["trail"], tuple(sorted(p["sold_levels"]))) for s, p in positions.items() if p["qty"] > 0}
+
+def same(a, b) -> bool:
+    """Equal states, except that a trailing high may be below the other by less than one journal step."""
+    near = lambda x, y: x == y or (x and y and abs(x - y) < max(x, y) * TRAIL_JOURNAL_STEP)
+    return a.keys() == b.keys() and all(a[s][:2] == b[s][:2] and a[s][3] == b[s][3] and near(a[s][2], b[s][2]) for s in a)
+
+def trade(eng, broker, symbols, rng, n_ticks):
+    paths = {s: 100.0 for s in symbols}
+    for i in range(n_ticks):
+        s = symbols[rng.randint(len(symbols))]
+        paths[s] *= float(np.exp(rng.normal(0, 0.002))); broker.price[s] = paths[s]
+        pos = eng.positions.get(s)
+        if (pos is None or pos["qty"] == 0) and rng.rand() < 0.05: eng.place_order(s, "BUY", int(rng.randint(1, 20)) * 10)
+        eng.on_price(s, paths[s])
+        if i % 2000 == 0: eng.flush()  # keep fills roughly in step with the tape
+
+def main(n_ticks: int = 400_000, n_symbols: int = 200):
+    create_all()
+    rng = np.random.RandomState(1); symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    broker = TapeBroker(); eng = TradeEngine(broker, compact_journal=False)  # kept whole for the full replay
+    eng.set_take_profits([(1.0, 0.3), (2.0, 0.3), (3.0, 0.4)]); eng.set_risk(3.0, 2.0)
+    trade(eng, broker, symbols, rng, n_ticks)
+    eng.flush(); eng.snapshot()                      # periodic snapshot ...
+    trade(eng, broker, symbols, rng, n_ticks // 20)  # ... then more trading before the "crash"
+    eng.flush(); live = state(eng.positions)
+    eng._orders.put(None); eng._exec.join(); eng.journal.close()  # exit without the closing snapshot
+
+    t0 = time.perf_counter(); full = replay({}, read_records(JOURNAL_PATH)[0]); t_full = time.perf_counter() - t0
+    restored = TradeEngine(TapeBroker())
+    st = restored.restore_stats
+    print(f"journal: {restored.journal.seq:,} records; full replay {t_full*1000:.0f}ms; "
+          f"snapshot restore {st['ms']:.1f}ms (snapshot seq {st['snapshot_seq']:,}, replayed {st['replayed']:,} after it)")
+    print("restored == live:", same(state(restored.positions), live),
+          "| restored == full replay:", same(state(restored.positions), state(full)),
+          f"| open positions {len(live)}")
+    size = os.path.getsize(JOURNAL_PATH)
+    restored.close()  # flush + closing snapshot, which compacts the journal
+    print(f"journal file {size/1e6:.1f} MB -> {os.path.getsize(JOURNAL_PATH)} bytes after the compacting snapshot")
+    again = TradeEngine(TapeBroker(), restore=True)
+    print("clean restart (closing snapshot) equal:", state(again.positions) == state(restored.positions),
+          f"replayed {again.restore_stats['replayed']} records in {again.restore_stats['ms']:.1f}ms")
+    again.close()
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,32 @@
+"""Indicator computations per compute_human_score: independent evaluators vs shared FeatureFrame.
+Run: python -m bench.features [bars]"""
+import sys
+from bench.common import seed_candles, seed_rationale, best_of
+from app.services import features
+from app.services.condition_engine import load_df
+from app.services.features import FeatureFrame
+from app.services.rationale_service import EVAL_MAP, compute_human_score
+
+def independent(df):
+    computed = 0; out = {}
+    for name, fn in EVAL_MAP.items():
+        ff = FeatureFrame(df); out[name] = fn(ff); computed += ff.computed
+    return computed, out
+
+def main(bars: int = 50_000):
+    seed_candles(["BENCH"], bars); seed_rationale()
+    df = load_df("BENCH", "1m")
+    n_ind, ref = independent(df)
+    shared = FeatureFrame(df)
+    for name, fn in EVAL_MAP.items():
+        assert fn(shared).equals(ref[name]), name
+    features.STATS.update(computed=0, hits=0)
+    for prof in ("scalp", "day", "mid"): compute_human_score("BENCH", "1m", prof)
+    print(f"indicator computations: independent={n_ind} per profile, shared={shared.computed} per frame, "
+          f"3 profiles via compute_human_score={features.STATS['computed']}")
+    t_ind = best_of(lambda: independent(df))
+    t_sh = best_of(lambda: [fn(f) for f in [FeatureFrame(df)] for fn in EVAL_MAP.values()])
+    print(f"all evaluators on {bars} bars: independent={t_ind*1000:.1f}ms shared={t_sh*1000:.1f}ms ({t_ind/t_sh:.1f}x)")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
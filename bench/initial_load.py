@@ -0,0 +1,21 @@
+"""initial_load: serial generation vs process-pool generation feeding the single writer thread.
+Run: python -m bench.initial_load [symbols] [years] [workers]"""
+import os, sys, time
+import bench.common  # noqa: F401  (temp DB/archive)
+from app.core.db import create_all
+from app.services.data_manager import initial_load, check_rollups
+
+def main(n_symbols: int = 8, years: int = 1, workers: int = None):
+    create_all()
+    workers = workers or os.cpu_count() or 1
+    for label, w in (("serial", 1), (f"pool x{workers}", workers)):
+        syms = [f"{label[0].upper()}{i:05d}" for i in range(n_symbols)]
+        msgs = []
+        t0 = time.perf_counter(); initial_load(syms, years=years, workers=w, progress=msgs.append)
+        dt = time.perf_counter() - t0
+        print(f"{label:>10}: {n_symbols} symbols x {years}y in {dt:.2f}s ({n_symbols/dt:.2f} symbols/s), "
+              f"{len(msgs)} progress events, last={msgs[-1] if msgs else None}")
+    print("consistency", syms[0], check_rollups(syms[0]))
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
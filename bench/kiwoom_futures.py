@@ -0,0 +1,72 @@
+"""_RealKiwoom request/response correlation against a fake OCX event source: round-trip latency vs the old
+50 ms polling loop, concurrent condition searches, timeouts and cancellation.
+Run: python -m bench.kiwoom_futures [latency_ms] [concurrent]"""
+import random, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.kiwoom_api import _RealKiwoom
+
+class Signal:
+    def __init__(self): self.slots = []
+    def connect(self, fn): self.slots.append(fn)
+    def emit(self, *args):
+        for fn in self.slots: fn(*args)
+
+class FakeOCX:
+    """Answers dynamicCall requests with the matching OCX event after `latency` seconds, from a timer thread."""
+    CONDS = ["Scalp_VolSpike", "Day_Cross", "Mid_Trend"] + [f"Cond{i:02d}" for i in range(40)]
+
+    def __init__(self, latency: float):
+        self.latency = latency; self.drop = set()
+        for name in ("OnEventConnect", "OnReceiveConditionVer", "OnReceiveTrCondition", "OnReceiveRealCondition", "OnReceiveRealData"):
+            setattr(self, name, Signal())
+
+    def _later(self, signal, *args):
+        t = threading.Timer(self.latency * random.uniform(0.5, 1.5), signal.emit, args); t.daemon = True; t.start()
+
+    def dynamicCall(self, sig, *args):
+        if sig.startswith("CommConnect"): self._later(self.OnEventConnect, 0)
+        elif sig.startswith("GetConditionLoad"): self._later(self.OnReceiveConditionVer, 1, "")
+        elif sig.startswith("GetConditionNameList"): return ";".join(f"{i:03d}^{n}" for i, n in enumerate(self.CONDS))
+        elif sig.startswith("SendCondition"):
+            scr, name, idx, _ = args
+            if name not in self.drop:  # the answer's codes encode which condition it belongs to
+                self._later(self.OnReceiveTrCondition, scr, f"{idx:03d}A;{idx:03d}B;", name, str(idx), 0)
+            return 1
+        return ""
+
+def polled_round_trip(latency: float) -> float:
+    """The previous pattern: fire, then sleep in 50 ms steps until the handler set an attribute."""
+    box = {}; t0 = time.perf_counter()
+    threading.Timer(latency, box.setdefault, ("codes", [])).start()
+    while "codes" not in box: time.sleep(0.05)
+    return time.perf_counter() - t0
+
+def main(latency_ms: int = 20, concurrent: int = 40):
+    lat = latency_ms / 1000.0
+    ocx = FakeOCX(lat); k = _RealKiwoom(ocx=ocx)
+    assert k.login() and k.fetch_condition_list()[:3] == FakeOCX.CONDS[:3]
+
+    t_fut = []; t_poll = []
+    for name in FakeOCX.CONDS[:20]:
+        t0 = time.perf_counter(); k.subscribe_condition(name); t_fut.append(time.perf_counter() - t0)
+        t_poll.append(polled_round_trip(lat * random.uniform(0.5, 1.5)))
+    avg = lambda xs: sum(xs) / len(xs) * 1000.0
+    print(f"round trip at ~{latency_ms}ms broker latency: futures {avg(t_fut):.1f}ms, 50ms polling {avg(t_poll):.1f}ms")
+
+    names = FakeOCX.CONDS[:concurrent]
+    t0 = time.perf_counter()
+    futs = {n: k.subscribe_condition_async(n) for n in names}  # all in flight at once, one screen each
+    results = {n: f.result(5) for n, f in futs.items()}
+    dt = time.perf_counter() - t0
+    wrong = sum(r != [f"{k._cond_index[n]:03d}A", f"{k._cond_index[n]:03d}B"] for n, r in results.items())
+    print(f"{len(names)} concurrent condition searches: {dt*1000:.1f}ms total, {wrong} answered with another request's codes")
+
+    ocx.drop.add("Day_Cross")
+    t0 = time.perf_counter(); codes = k.subscribe_condition("Day_Cross", timeout=0.2)
+    print(f"dropped answer: returned {codes} after {(time.perf_counter()-t0)*1000:.0f}ms (timeout 200ms)")
+    f = k.subscribe_condition_async("Mid_Trend"); f.cancel()
+    time.sleep(lat * 2)
+    print("cancelled request: future cancelled =", f.cancelled(), "| stats", k.requests.stats)
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,32 @@
+"""Latest-only scoring (declared lookback tail) vs full history.  Run: python -m bench.latest [bars]"""
+import sys
+import numpy as np
+from bench.common import seed_candles, seed_rationale, best_of
+from app.services.condition_engine import load_df, evaluate, preset_lookback
+from app.services.features import FeatureFrame, required_lookback
+from app.services.rationale_service import EVAL_MAP, compute_human_score
+
+def main(bars: int = 200_000):
+    seed_candles(["BENCH"], bars); seed_rationale()
+    df = load_df("BENCH", "1m"); full = FeatureFrame(df)
+    n = required_lookback(EVAL_MAP.values())
+    ends = np.random.RandomState(0).randint(n, len(df), size=200)
+    agree = total = 0
+    for name, fn in EVAL_MAP.items():
+        ref = fn(full).to_numpy()
+        for e in ends:
+            tail = FeatureFrame(df.iloc[e - fn.lookback + 1:e + 1].reset_index(drop=True))
+            agree += bool(fn(tail).iloc[-1]) == bool(ref[e]); total += 1
+    print(f"max lookback={n}  last-bar agreement on {len(ends)} cut points x {len(EVAL_MAP)} items: {agree}/{total}")
+    for prof in ("scalp", "day", "mid"):
+        assert compute_human_score("BENCH", "1m", prof)[0] == compute_human_score("BENCH", "1m", prof, latest_only=True)[0]
+    t_full = best_of(lambda: compute_human_score("BENCH", "1m", "scalp"))
+    t_last = best_of(lambda: compute_human_score("BENCH", "1m", "scalp", latest_only=True))
+    print(f"compute_human_score on {bars} bars: full={t_full*1000:.1f}ms latest_only={t_last*1000:.1f}ms ({t_full/t_last:.1f}x)")
+    for preset in ("scalp", "day", "mid"):
+        t_full = best_of(lambda: evaluate("BENCH", "1m", preset))
+        t_last = best_of(lambda: evaluate("BENCH", "1m", preset, latest_only=True))
+        print(f"evaluate[{preset}] lookback={preset_lookback(preset)}: full={t_full*1000:.1f}ms latest_only={t_last*1000:.1f}ms")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
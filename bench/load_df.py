@@ -0,0 +1,32 @@
+"""ORM `_to_df` path vs columnar SQLite read vs memmapped archive.  Run: python -m bench.load_df [bars]"""
+import sys
+from bench.common import best_of, T0
+import pandas as pd
+from sqlalchemy import select
+from app.core.db import create_all, get_session, Candle
+from app.services import data_manager
+from app.services.data_manager import _gen_dummy_ohlcv, _bulk_upsert_candles
+from app.services.condition_engine import load_df, _load_sqlite, CANDLE_COLS
+
+def orm_load_df(symbol, tf):
+    with get_session() as s:
+        rows = s.execute(select(Candle).where(Candle.symbol==symbol, Candle.tf==tf).order_by(Candle.ts)).scalars().all()
+    return pd.DataFrame([{
+        "ts": r.ts, "open": r.open, "high": r.high, "low": r.low, "close": r.close, "vol": r.vol
+    } for r in rows]).sort_values("ts").reset_index(drop=True)
+
+def main(bars: int = 200_000):
+    create_all()
+    data_manager.SQLITE_RECENT_BARS = 0  # keep full history in SQLite so all three paths see the same bars
+    _bulk_upsert_candles(_gen_dummy_ohlcv(T0, bars, "1m"), "BENCH", "1m")
+    a = orm_load_df("BENCH", "1m"); b = load_df("BENCH", "1m")
+    assert a.shape == b.shape and (a["close"].values == b["close"].values).all()
+    t_orm = best_of(lambda: orm_load_df("BENCH", "1m"))
+    t_col = best_of(lambda: pd.DataFrame(_load_sqlite("BENCH", "1m"), columns=list(CANDLE_COLS)))
+    t_arc = best_of(lambda: load_df("BENCH", "1m"))
+    t_tail = best_of(lambda: load_df("BENCH", "1m", last_n=400))
+    print(f"bars={bars}  orm={t_orm*1000:.1f}ms  sqlite-columnar={t_col*1000:.1f}ms ({t_orm/t_col:.1f}x)  "
+          f"archive={t_arc*1000:.1f}ms ({t_orm/t_arc:.1f}x)  last_n=400: {t_tail*1000:.2f}ms")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
@@ -0,0 +1,55 @@
+"""Event-driven risk monitor: ticks/s over many open positions, tick->SELL latency, and parity with
+running apply_stop_loss/trailing/take_profits on every tick. Run: python -m bench.risk_monitor [symbols] [ticks]"""
+import sys, time
+import numpy as np
+from bench.common import best_of  # noqa: F401  (temp DB)
+from app.core.db import create_all
+from app.services.kiwoom_api import OrderResult
+from app.services.trade_engine import TradeEngine
+
+class TapeBroker:
+    """Fills every order at the symbol's current tape price and records it."""
+    def __init__(self): self.price = {}; self.orders = []; self.n = 0
+    def place_order(self, symbol, side, qty, price=None):
+        self.n += 1; fill = self.price[symbol]
+        self.orders.append((symbol, side, qty, fill))
+        return OrderResult(order_id=f"o{self.n}", status="FILLED", price=fill)
+
+def run(event_driven: bool, symbols, ticks):
+    broker = TapeBroker(); eng = TradeEngine(broker, restore=False)  # both runs share the journal
+    eng.set_take_profits([(2.0, 0.3), (4.0, 0.3), (6.0, 0.4)])
+    for sym in symbols: broker.price[sym] = 100.0; eng.place_order(sym, "BUY", 100)
+    broker.orders.clear()
+    if event_driven: eng.set_risk(3.0, 2.0)
+    t0 = time.perf_counter()
+    for sym, px in ticks:
+        broker.price[sym] = px
+        if event_driven:
+            eng.on_price(sym, px)
+        else:
+            eng.apply_stop_loss(sym, 3.0, price=px); eng.apply_trailing_stop(sym, 2.0, price=px); eng.apply_take_profits(sym, price=px)
+    dt = time.perf_counter() - t0
+    eng.close()
+    return eng, broker, dt
+
+def main(n_symbols: int = 500, n_ticks: int = 500_000):
+    create_all()
+    rng = np.random.RandomState(0)
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    sym_idx = rng.randint(0, n_symbols, size=n_ticks)
+    paths = {s: iter(100.0 * np.exp(np.cumsum(rng.normal(0, 0.001, size=n_ticks)))) for s in symbols}
+    ticks = [(symbols[i], float(next(paths[symbols[i]]))) for i in sym_idx]
+
+    ref, ref_b, t_ref = run(False, symbols, ticks)
+    eng, b, t_ev = run(True, symbols, ticks)
+    decisions = lambda br: [o[:3] for o in br.orders]  # fills happen on the execution thread, prices may differ
+    same = decisions(ref_b) == decisions(b) and {s: (p["qty"], p["avg"]) for s, p in ref.positions.items()} == \
+        {s: (p["qty"], p["avg"]) for s, p in eng.positions.items()}
+    print(f"{n_ticks:,} ticks over {n_symbols} positions: check-every-tick {n_ticks/t_ref:,.0f} ticks/s, "
+          f"triggered {n_ticks/t_ev:,.0f} ticks/s ({eng.risk_stats['checks']:,} evaluations, {len(b.orders)} sells)")
+    print(f"tick -> SELL submitted: {eng.latency_summary()}  (was up to 1500ms on the heartbeat)")
+    print(f"submit -> fill applied: {eng.latency_summary('ack')}")
+    print("orders and positions identical to the per-tick reference:", same)
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
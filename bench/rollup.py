@@ -0,0 +1,33 @@
+"""1m -> higher-tf rollups: full and incremental materialization vs per-tf generate+upsert.
+Run: python -m bench.rollup [bars_1m]"""
+import sys, time
+from bench.common import T0
+from app.core.db import create_all
+from app.services.data_manager import (_gen_dummy_ohlcv, _bulk_upsert_candles, materialize_rollups, check_rollups,
+                                       resample_ohlcv, ROLLUP_TFS, TF_MINUTES)
+from app.services.condition_engine import load_arrays
+
+def main(bars: int = 200_000):
+    create_all()
+    t0 = time.perf_counter()
+    for tf in ROLLUP_TFS:  # the old path: every tf generated and upserted on its own
+        _bulk_upsert_candles(_gen_dummy_ohlcv(T0, max(200, bars // TF_MINUTES[tf]), tf), "OLD", tf)
+    t_old = time.perf_counter() - t0
+
+    _bulk_upsert_candles(_gen_dummy_ohlcv(T0, bars, "1m"), "NEW", "1m")
+    cols = load_arrays("NEW", "1m")
+    t0 = time.perf_counter()
+    for tf in ROLLUP_TFS: resample_ohlcv(cols, tf)
+    t_resample = time.perf_counter() - t0
+    t0 = time.perf_counter(); counts = materialize_rollups("NEW"); t_full = time.perf_counter() - t0
+    print(f"derived tfs {ROLLUP_TFS}: per-tf generate+upsert={t_old:.2f}s  rollup from {bars:,} 1m bars={t_full:.2f}s "
+          f"(resample only {t_resample*1000:.1f}ms = {bars*len(ROLLUP_TFS)/t_resample/1e6:.1f}M bars/s) -> {counts}")
+
+    new = _gen_dummy_ohlcv(int(cols["ts"][-1]) + 60_000, 300, "1m", seed=7)
+    _bulk_upsert_candles(new, "NEW", "1m")
+    t0 = time.perf_counter(); counts = materialize_rollups("NEW", since_ts=int(new["ts"].iloc[0])); t_inc = time.perf_counter() - t0
+    print(f"incremental +300 1m bars: {t_inc*1000:.1f}ms, buckets rewritten {counts}")
+    print("consistency:", check_rollups("NEW"))
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
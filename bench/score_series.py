@@ -0,0 +1,28 @@
+"""Vectorized per-bar human score vs re-calling the scorer per bar.  Run: python -m bench.score_series [bars]"""
+import sys, time
+from bench.common import seed_candles, seed_rationale, best_of
+from app.services.condition_engine import load_df
+from app.services import features
+from app.services.features import FeatureFrame
+from app.services.rationale_service import get_plan, human_score_series
+
+def per_bar(df, profile, n_bars):
+    plan = get_plan(profile); rows = list(zip(plan.funcs, plan.weights)); out = []
+    for e in range(len(df) - n_bars, len(df)):
+        ff = FeatureFrame(df.iloc[max(0, e - plan.lookback + 1):e + 1].reset_index(drop=True))
+        out.append(round(sum(w for fn, w in rows if bool(fn(ff).iloc[-1])) * 100.0, 2))
+    return out
+
+def main(bars: int = 200_000):
+    seed_candles(["BENCH"], bars); seed_rationale()
+    df = load_df("BENCH", "1m")
+    series = human_score_series("BENCH", "1m", "scalp", df=df)
+    sample = 300
+    t0 = time.perf_counter(); ref = per_bar(df, "scalp", sample); t_loop = (time.perf_counter() - t0) / sample
+    mism = sum(abs(a - b) > 1e-6 for a, b in zip(ref, series.iloc[-sample:].tolist()))
+    t_vec = best_of(lambda: (features._FRAMES.clear(), human_score_series("BENCH", "1m", "scalp", df=df)))
+    print(f"last {sample} bars mismatches vs per-bar scorer: {mism}")
+    print(f"{bars} bars: vectorized={t_vec*1000:.1f}ms  per-bar loop~{t_loop*bars:.1f}s (extrapolated, {t_loop*1000:.1f}ms/bar)")
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
@@ -0,0 +1,49 @@
+"""Streaming indicators: parity with app.core.indicators and per-bar update cost.  Run: python -m bench.streaming [bars]"""
+import sys, time
+import numpy as np
+from app.core import indicators as ind, streaming as st
+from app.services.data_manager import _gen_dummy_ohlcv
+
+def run(factory, *inputs):
+    obj = factory(); return np.array([obj.update(*xs) for xs in zip(*(x.tolist() for x in inputs))], dtype=float)
+
+def main(bars: int = 20_000):
+    df = _gen_dummy_ohlcv(1_600_000_000_000, bars, "1m").astype({"vol": float})
+    ok = parity(df, "clean")
+    holes = df.copy(); rng = np.random.RandomState(0)  # missing prints, and a halt longer than every window
+    for col in ("close", "vol", "high", "low"): holes.loc[rng.choice(bars, bars // 100, replace=False), col] = np.nan
+    holes.loc[bars // 2: bars // 2 + 400, ["close", "high", "low"]] = np.nan
+    ok &= parity(holes, "with NaN")
+    state = st.IndicatorState(); rows = list(zip(*(df[k].tolist() for k in ("ts","open","high","low","close","vol"))))
+    t0 = time.perf_counter()
+    for r in rows: state.update(*r)
+    dt = time.perf_counter() - t0
+    print(f"IndicatorState: {len(rows)/dt:,.0f} bars/s ({dt/len(rows)*1e6:.1f}us per bar)")
+    if not ok: sys.exit(1)
+
+def parity(df, label: str) -> bool:
+    c, v, h, l = df["close"], df["vol"], df["high"], df["low"]
+    m, s, _ = ind.macd(c); ms = np.array(_macd(c))
+    checks = {
+        "ema20": (ind.ema(c, 20), run(lambda: st.EMA(20), c)),
+        "sma20": (ind.sma(c, 20), run(lambda: st.RollingMean(20, 1), c)),
+        "rsi14": (ind.rsi(c), run(lambda: st.RSI(14), c)),
+        "macd": (m, ms[:, 0]),
+        "macd_signal": (s, ms[:, 1]),
+        "obv": (ind.obv(c, v), run(st.OBV, c, v)),
+        "std20": (v.rolling(20).std(), run(lambda: st.RollingStd(20), v)),
+        "max390": (h.rolling(390).max(), run(lambda: st.RollingMax(390), h)),
+        "min390": (l.rolling(390).min(), run(lambda: st.RollingMin(390), l)),
+        "volume_spike": (ind.volume_spike(v).astype(float), run(lambda: st.VolumeSpike(), v)),
+    }
+    all_ok = True
+    for name, (batch, stream) in checks.items():
+        ok = np.allclose(batch.to_numpy(dtype=float), stream, rtol=1e-9, atol=1e-7, equal_nan=True)
+        print(f"{label:9s} {name:13s} {'OK' if ok else 'MISMATCH'}"); all_ok &= ok
+    return all_ok
+
+def _macd(c):
+    obj = st.MACD(); return [obj.update(x) for x in c.tolist()]
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:2]))
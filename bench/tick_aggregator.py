@@ -0,0 +1,45 @@
+"""Tick -> bar aggregation throughput and write-behind batching.  Run: python -m bench.tick_aggregator [symbols] [bars]"""
+import sys, time
+import numpy as np
+from bench.common import T0
+from app.core.db import create_all
+from app.services.data_manager import _gen_dummy_ohlcv, bucket_start
+from app.services.condition_engine import load_df
+from app.services.bar_aggregator import BarAggregator, CandleWriter, replay_ticks
+
+def main(n_symbols: int = 50, bars: int = 2_000):
+    create_all()
+    src = {f"T{i:03d}": _gen_dummy_ohlcv(T0, bars, "1m", seed=i) for i in range(n_symbols)}
+    feeds = [list(replay_ticks(sym, {c: df[c].to_numpy() for c in df}, 4)) for sym, df in src.items()]
+    ticks = [t for group in zip(*feeds) for t in group]  # interleave symbols in time order
+    agg = BarAggregator(writer=CandleWriter(max_batch=20_000, maxsize=0))  # a replay burst outruns any live-sized queue
+    t0 = time.perf_counter()
+    for t in ticks: agg.on_tick(*t)
+    t_ticks = time.perf_counter() - t0
+    agg.stop(); t_all = time.perf_counter() - t0
+    w = agg.writer.stats
+    print(f"{len(ticks):,} ticks, {n_symbols} symbols: on_tick {len(ticks)/t_ticks:,.0f} ticks/s; "
+          f"incl. persistence {len(ticks)/t_all:,.0f} ticks/s; {w['rows']:,} bars in {w['batches']} batches "
+          f"(max queue {w['max_depth']}, dropped {w['dropped']}, errors {w['errors']})")
+    sym, df = next(iter(src.items()))
+    got = load_df(sym, "1m")
+    assert np.allclose(got[["open","high","low","close","vol"]].to_numpy(), df[["open","high","low","close","vol"]].to_numpy())
+    b = bucket_start(df["ts"].to_numpy(), "15m")
+    ref = df.groupby(b).agg(open=("open","first"), high=("high","max"), low=("low","min"), close=("close","last"), vol=("vol","sum"))
+    if b[0] < df["ts"].iloc[0]: ref = ref.iloc[1:]  # the replay starts mid-bucket: that first 15m bar is not written
+    got = load_df(sym, "15m").set_index("ts")
+    assert np.allclose(got.to_numpy(), ref.to_numpy()), "15m mismatch"
+    print(f"1m bars match the source candles; 15m bars match a direct resample "
+          f"({agg.stats['partial']} partial first buckets not written)")
+
+    # a stalled sink: the tick thread keeps its pace and the overflow is counted instead of blocking it
+    stall = CandleWriter(maxsize=1_000, sink=lambda rows: time.sleep(1.0) or len(rows))
+    agg = BarAggregator(writer=stall); t0 = time.perf_counter()
+    for t in ticks[:100_000]: agg.on_tick(*t)
+    t_ticks = time.perf_counter() - t0; agg.close_all()
+    print(f"stalled writer: on_tick {100_000/t_ticks:,.0f} ticks/s, {stall.stats['dropped']:,} bars dropped "
+          f"(queue {stall.q.maxsize:,}), late ticks {agg.stats['late']}")
+    stall.stop()
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:3]))
@@ -0,0 +1,32 @@
+"""update_data planning: one watermark query vs a last-ts lookup per symbol.
+Run: python -m bench.update_data [symbols] [bars]"""
+import sys, time
+from bench.common import seed_candles
+from sqlalchemy import select
+from app.core.db import get_session, Candle
+from app.services.data_manager import plan_updates, update_data, watermarks
+from app.services.condition_engine import load_arrays
+
+def per_symbol_plan(symbols, tf="1m"):
+    """The previous planning: one ORDER BY ts DESC query per symbol."""
+    out = []
+    for sym in symbols:
+        with get_session() as s:
+            last_ts = s.execute(select(Candle.ts).where(Candle.symbol==sym, Candle.tf==tf).order_by(Candle.ts.desc())).scalars().first()
+        if last_ts: out.append((sym, last_ts))
+    return out
+
+def main(n_symbols: int = 500, bars: int = 2000):
+    symbols = [f"S{i:05d}" for i in range(n_symbols)]
+    seed_candles(symbols, bars)
+    t0 = time.perf_counter(); old = per_symbol_plan(symbols); t_old = time.perf_counter() - t0
+    t0 = time.perf_counter(); new = plan_updates(symbols); t_new = time.perf_counter() - t0
+    assert old == new, "watermarks disagree with the candles table"
+    t0 = time.perf_counter(); update_data(symbols); t_upd = time.perf_counter() - t0
+    marks = watermarks("1m")
+    stale = sum(marks[(s, "1m")] != int(load_arrays(s, "1m", last_n=1)["ts"][-1]) for s in symbols)
+    print(f"{n_symbols} symbols: per-symbol planning {t_old*1000:.1f}ms, watermark planning {t_new*1000:.1f}ms; "
+          f"update_data total {t_upd:.2f}s; stale watermarks after update: {stale}")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
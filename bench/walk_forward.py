@@ -0,0 +1,38 @@
+"""Walk-forward runner with the on-disk result cache: cold run, warm rerun, then update_data and a run that should
+compute only the new windows. Run: python -m bench.walk_forward [symbols] [bars] [workers]"""
+import os, sys, time
+from bench.common import seed_candles, seed_rationale
+from app.services.backtester import param_grid
+from app.services.data_manager import update_data
+from app.services.walk_forward import walk_forward
+
+WF = dict(train=2000, test=300)  # test = update_data's 300 bars: each update adds one window per symbol
+
+def main(n_symbols: int = 8, bars: int = 8_000, workers: int = os.cpu_count() or 1):
+    symbols = [f"W{i:05d}" for i in range(n_symbols)]
+    seed_candles(symbols, bars); seed_rationale()
+    grid = param_grid(buy_th=[52, 55, 58], sell_th=[42], stop_pct=[1.0, 3.0], trail_pct=[1.0, None],
+                      take_profits=[(), ((1.0, 0.5), (2.0, 0.5))])
+
+    def go(label):
+        t0 = time.perf_counter(); res = walk_forward(symbols, grid, workers=workers, **WF); dt = time.perf_counter() - t0
+        r = res.report
+        print(f"{label:14} {r['windows']:3d} windows x {r['combinations']} combinations: {r['misses']:5d} computed, "
+              f"{r['hits']:5d} cached, hit rate {r['hit_rate']:6.1%} (train {r['train_hit_rate']:.1%}, "
+              f"test {r['test_hit_rate']:.1%}) in {dt:.2f}s (eval {r['eval_s']:.2f}s)")
+        return res
+
+    cold = go("cold")
+    warm = go("warm")
+    print(f"   warm rerun identical: {warm.windows.equals(cold.windows)}")
+    update_data(symbols, tfs=["1m"])
+    upd = go("after update")
+    old = upd.windows.merge(cold.windows[["symbol", "window"]], on=["symbol", "window"])
+    print(f"   {len(upd.windows) - len(cold.windows)} new windows; earlier windows unchanged: "
+          f"{old.reset_index(drop=True).equals(cold.windows)}")
+    r = upd.report
+    print(f"   out-of-sample mean return per window {r['oos_return_pct']:.4f}%")
+    print(upd.windows.tail(4).to_string(index=False))
+
+if __name__ == "__main__":
+    main(*(int(x) for x in sys.argv[1:4]))
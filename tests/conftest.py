@@ -0,0 +1,27 @@
+"""Scratch DB/journal for the tests, set before any app module reads its config."""
+import os, tempfile
+_tmp = tempfile.mkdtemp(prefix="stockbot-test-")
+os.environ.setdefault("STOCKBOT_DB", os.path.join(_tmp, "test.sqlite"))
+os.environ.setdefault("STOCKBOT_ARCHIVE", os.path.join(_tmp, "candles"))
+os.environ.setdefault("STOCKBOT_JOURNAL", os.path.join(_tmp, "orders.jsonl"))
+os.environ.setdefault("STOCKBOT_LOG", os.path.join(_tmp, "app.log"))
+os.environ.setdefault("STOCKBOT_WF_CACHE", os.path.join(_tmp, "walkforward"))
+
+import pytest
+
+@pytest.fixture(scope="session")
+def rationale():
+    """Every rationale item weighted (1-5) for the batch scorer's profiles."""
+    from app.core.db import create_all, get_session, raw_transaction, RationaleItem, RationaleWeight
+    from app.services.batch_scorer import PROFILES
+    from app.services.rationale_service import EVAL_MAP, invalidate_plans
+    create_all()
+    with raw_transaction() as cur:
+        for table in ("rationale_weights", "rationale_items"): cur.execute(f"DELETE FROM {table}")
+    with get_session() as s:
+        for i, name in enumerate(EVAL_MAP):
+            item = RationaleItem(name=name, note="", idx=i + 1); s.add(item); s.flush()
+            for prof in PROFILES: s.add(RationaleWeight(profile=prof, item_id=item.id, weight=float(i % 5 + 1)))
+        s.commit()
+    invalidate_plans()
+    return PROFILES
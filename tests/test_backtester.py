@@ -0,0 +1,13 @@
+"""backtest_grid over symbols without stored bars."""
+import os
+from app.core.db import create_all
+from app.services.backtester import backtest_grid, param_grid
+
+def _shm():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+def test_no_bars_returns_empty_frame():
+    create_all(); before = _shm()
+    df = backtest_grid(["ZZZ", "YYY"], param_grid(buy_th=[60, 70]), workers=1)
+    assert df.empty and "return_pct" in df.columns
+    assert _shm() == before
@@ -0,0 +1,25 @@
+"""Tick aggregation after a mid-session start."""
+from app.services.bar_aggregator import BarAggregator, CandleWriter
+
+T0 = 1_599_999_960_000  # minute aligned
+
+def _aggregator(tfs):
+    written, seen = [], []
+    agg = BarAggregator(tfs, writer=CandleWriter(sink=written.extend), on_bar=seen.append)
+    return agg, written, seen
+
+def test_first_partial_bucket_is_not_written():
+    agg, written, seen = _aggregator(("1m", "3m"))
+    for i in range(6):  # from 30s into a minute that is itself 2 minutes into its 3m bucket
+        agg.on_tick("AAA", T0 + 30_000 + i * 30_000, 100.0 + i, 1.0)
+    agg.stop()
+    bars = sorted((b[1], b[2] - T0) for b in written)
+    assert bars == [("1m", 60_000), ("1m", 120_000), ("1m", 180_000), ("3m", 60_000)]
+    assert sorted((b[1], b[2] - T0) for b in seen) == bars
+    assert agg.stats["partial"] == 2  # the first 1m bar (from 30s) and the first 3m bar (from 2m30s)
+
+def test_bucket_aligned_start_is_written():
+    agg, written, _ = _aggregator(("1m",))
+    agg.on_tick("AAA", T0, 100.0, 1.0); agg.on_tick("AAA", T0 + 60_000, 101.0, 1.0)
+    agg.stop()
+    assert [b[2] for b in written] == [T0, T0 + 60_000] and agg.stats["partial"] == 0
@@ -0,0 +1,20 @@
+"""Universe scoring with symbols that have no stored candles."""
+import pytest
+from app.services.batch_scorer import PROFILES, score_universe
+from app.services.data_manager import _bulk_upsert_candles, _gen_dummy_ohlcv
+
+T0 = 1_599_999_960_000  # minute aligned
+
+@pytest.fixture(scope="module", autouse=True)
+def universe(rationale):
+    _bulk_upsert_candles(_gen_dummy_ohlcv(T0, 500, "1m", seed=1), "AAA", "1m")
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_symbol_without_bars_is_skipped(workers):
+    df = score_universe(["AAA", "ZZZ"], workers=workers)
+    assert set(df["symbol"]) == {"AAA"} and len(df) == len(PROFILES)
+    assert list(df["rank"]) == list(range(1, len(df) + 1))
+
+def test_universe_without_any_bars_is_empty():
+    df = score_universe(["ZZZ", "YYY"], workers=1)
+    assert df.empty and "rank" in df.columns
@@ -0,0 +1,11 @@
+"""initial_load's timeframe selection."""
+from app.core.db import create_all
+from app.services.condition_engine import load_df
+from app.services.data_manager import initial_load
+
+def test_initial_load_writes_1m_base_and_requested_rollups():
+    create_all(); msgs = []
+    initial_load(["DM1"], tfs=["1d", "1d"], years=1, workers=1, progress=msgs.append)
+    assert msgs == ["[1/1] DM1 written (1m, 1d)"]
+    assert not load_df("DM1", "1m", last_n=1).empty and not load_df("DM1", "1d", last_n=1).empty
+    assert load_df("DM1", "3m", last_n=1).empty
@@ -0,0 +1,110 @@
+"""Restart state: positions restored from the snapshot plus the journal tail must equal the live engine's."""
+import json
+import numpy as np
+import pytest
+from app.core.db import create_all, raw_transaction
+from app.services.kiwoom_api import OrderResult
+from app.services.order_journal import OrderJournal, journal_size, read_records
+from app.services.trade_engine import SNAPSHOT_KEY, TRAIL_JOURNAL_STEP, TradeEngine
+
+SYMBOLS = [f"S{i:02d}" for i in range(12)]
+
+class TapeBroker:
+    def __init__(self): self.price = {}; self.n = 0
+    def place_order(self, symbol, side, qty, price=None):
+        self.n += 1
+        return OrderResult(order_id=f"o{self.n}", status="FILLED", price=self.price[symbol])
+
+def state(positions):
+    return {s: (p["qty"], p["avg"], p["trail"], sorted(p["sold_levels"])) for s, p in positions.items() if p["qty"] > 0}
+
+def assert_restored(positions, live):
+    """Same qty/avg/TP levels; the trailing high may trail the live one by less than a journal step."""
+    got = state(positions)
+    assert got.keys() == live.keys()
+    for s, (qty, avg, trail, levels) in live.items():
+        r_qty, r_avg, r_trail, r_levels = got[s]
+        assert (r_qty, r_avg, r_levels) == (qty, avg, levels)
+        assert r_trail == trail or trail / (1 + TRAIL_JOURNAL_STEP) <= r_trail <= trail
+
+def trade(eng, broker, rng, paths, n_ticks):
+    for _ in range(n_ticks):
+        s = SYMBOLS[rng.randint(len(SYMBOLS))]
+        paths[s] *= float(np.exp(rng.normal(0, 0.004))); broker.price[s] = paths[s]
+        pos = eng.positions.get(s)
+        if (pos is None or pos["qty"] == 0) and rng.rand() < 0.1: eng.place_order(s, "BUY", int(rng.randint(1, 20)) * 10)
+        eng.on_price(s, paths[s])
+        eng.settle()
+
+@pytest.fixture
+def journal_path(tmp_path):
+    create_all()
+    with raw_transaction() as cur:
+        for table in ("settings", "orders", "trades"): cur.execute(f"DELETE FROM {table}")
+    return tmp_path / "orders.jsonl"
+
+def crashed_engine(journal_path, compact_journal=True):
+    """Trade, snapshot, trade on, then stop without the closing snapshot; returns the live positions' state."""
+    rng = np.random.RandomState(7); paths = {s: 100.0 for s in SYMBOLS}
+    broker = TapeBroker()
+    eng = TradeEngine(broker, journal=OrderJournal(journal_path), threaded=False, compact_journal=compact_journal)
+    eng.set_take_profits([(1.0, 0.3), (2.0, 0.3), (3.0, 0.4)]); eng.set_risk(3.0, 2.0)
+    trade(eng, broker, rng, paths, 3000)
+    snap = eng.snapshot()
+    trade(eng, broker, rng, paths, 600)
+    live = state(eng.positions)
+    eng.close(snapshot=False)
+    assert eng.journal.seq > snap["seq"]  # the restore has a tail to replay
+    return live, snap
+
+def restart(journal_path):
+    return TradeEngine(TapeBroker(), journal=OrderJournal(journal_path), threaded=False)
+
+def test_snapshot_plus_tail_matches_live(journal_path):
+    live, snap = crashed_engine(journal_path)
+    eng = restart(journal_path)
+    assert eng.restore_stats["snapshot_seq"] == snap["seq"] and eng.restore_stats["replayed"] > 0
+    assert live; assert_restored(eng.positions, live)
+    eng.close()
+
+def test_torn_last_record_is_ignored(journal_path):
+    live, _ = crashed_engine(journal_path)
+    size = journal_path.stat().st_size
+    with open(journal_path, "ab") as f: f.write(b'{"type":"trade","symbol":"S00","qty":-10')  # crash mid-append
+    eng = restart(journal_path)
+    assert_restored(eng.positions, live)
+    assert journal_path.stat().st_size == size
+    eng.close()
+
+def test_journal_not_continuing_snapshot_replays_whole(journal_path):
+    live, snap = crashed_engine(journal_path, compact_journal=False)  # a whole-journal replay needs the full history
+    stale = dict(snap, seq=snap["seq"] + 5, positions={})  # snapshot taken against another journal
+    with raw_transaction() as cur:
+        cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?,?)", (SNAPSHOT_KEY, json.dumps(stale)))
+    eng = restart(journal_path)
+    assert eng.restore_stats["replayed"] == eng.journal.seq
+    assert_restored(eng.positions, live)
+    eng.close()
+
+def test_snapshot_compacts_journal(journal_path):
+    live, snap = crashed_engine(journal_path)
+    recs, _ = read_records(journal_path)
+    # committed records before the snapshot are gone (the rest go with the next snapshot)
+    assert 1 < recs[0]["seq"] <= snap["seq"] + 1 and journal_path.stat().st_size < journal_size(journal_path)
+    eng = restart(journal_path)
+    assert eng.restore_stats["replayed"] == recs[-1]["seq"] - snap["seq"]
+    assert_restored(eng.positions, live)
+    eng.close()  # flushed, then the closing snapshot: the file is down to its base line
+    assert read_records(journal_path)[0] == [] and journal_size(journal_path) == eng.journal.offset
+    again = restart(journal_path)
+    assert again.restore_stats["replayed"] == 0 and state(again.positions) == state(eng.positions)
+    again.close()
+
+def test_trail_is_journaled_per_step(journal_path):
+    eng = TradeEngine(TapeBroker(), journal=OrderJournal(journal_path), threaded=False)
+    eng.broker.price["S00"] = 100.0; eng.place_order("S00", "BUY", 10); eng.settle(); eng.set_risk(None, 5.0)
+    for i in range(1, 201): eng.on_price("S00", 100.0 + i * 0.001)  # 200 new highs, 0.2% in all
+    trails = [r["price"] for r in read_records(journal_path)[0] if r["type"] == "trail"]
+    assert eng.positions["S00"]["trail"] == pytest.approx(100.2)
+    assert 2 <= len(trails) <= 1 + 0.2 / (TRAIL_JOURNAL_STEP * 100) + 1
+    eng.close()
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from app.services import features
+
+
+def _frame(n: int) -> pd.DataFrame:
+    px = np.linspace(100.0, 200.0, n)
+    return pd.DataFrame({"ts": np.arange(n, dtype=np.int64) * 60_000, "open": px, "high": px + 1,
+                         "low": px - 1, "close": px, "vol": np.ones(n)})
+
+
+def test_frames_are_evicted_by_bytes(monkeypatch):
+    monkeypatch.setattr(features, "MAX_FRAME_BYTES", 1 << 20)
+    features._FRAMES.clear()
+    df = _frame(20_000)  # ~1 MB of candles per frame
+    for i in range(4):
+        features.feature_frame(f"S{i}", "1m", df).prefetch(["ema20", "sma20"])
+    assert len(features._FRAMES) == 1
+    assert next(iter(features._FRAMES))[0] == "S3"  # the newest frame is kept even when it alone is over the cap
+
+    monkeypatch.setattr(features, "MAX_FRAME_BYTES", 64 << 20)
+    features._FRAMES.clear()
+    for i in range(4):
+        features.feature_frame(f"S{i}", "1m", df)
+    assert len(features._FRAMES) == 4
+    assert sum(f.nbytes for f in features._FRAMES.values()) <= features.MAX_FRAME_BYTES
+    features._FRAMES.clear()
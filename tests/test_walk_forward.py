@@ -0,0 +1,10 @@
+"""walk_forward over symbols without stored bars."""
+from app.core.db import create_all
+from app.services.backtester import param_grid
+from app.services.walk_forward import ResultCache, walk_forward
+
+def test_no_bars_gives_no_windows(tmp_path):
+    create_all()
+    res = walk_forward(["ZZZ"], param_grid(buy_th=[60, 70]), workers=1, cache=ResultCache(str(tmp_path)))
+    assert res.windows.empty
+    assert res.report["windows"] == 0 and res.report["evaluations"] == 0 and res.report["oos_return_pct"] == 0.0